@@ -0,0 +1,132 @@
+"""
+实时拥挤度更新
+/paths/congestion 一次接收多条路径的 crowdedness / average_wait_time：
+1. 在共享图快照上原地合并边属性，只重算已编译代价表中受影响的条目，递增图版本号（路径结果缓存随之失效）
+2. 待写回的属性记在 graph_registry 中，由后台线程定时（或积压较多时）分批写回 Path 表，每批一个事务
+"""
+
+import threading
+import time
+from typing import Dict, List
+
+from app.core.config import CONGESTION_FIELDS, CONGESTION_FLUSH_INTERVAL, CONGESTION_BATCH_SIZE
+from app.core.graph import HospitalGraph, graph_registry
+from app.algorithms.cost_tables import patch_cost_tables
+from app.algorithms.contraction import reuse_hierarchy
+
+
+class CongestionWriter:
+    """后台写回线程：首次有更新时启动，按间隔或积压量触发，每批 batch_size 条一个事务"""
+
+    def __init__(self, interval: float = CONGESTION_FLUSH_INTERVAL,
+                 batch_size: int = CONGESTION_BATCH_SIZE, session_factory=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.session_factory = session_factory  # 为空时使用 app.database.SessionLocal
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_at = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="congestion-writer", daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """有新的待写回属性；积压达到一批时立即唤醒写回"""
+        self.start()
+        if graph_registry.pending_count >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """把当前积压全部写回，返回写回的路径数"""
+        from app.models import Path
+        if self.session_factory is None:
+            from app.database import SessionLocal
+            self.session_factory = SessionLocal
+
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch = graph_registry.take_pending(self.batch_size)
+                if not batch:
+                    break
+                db = self.session_factory()
+                try:
+                    db.bulk_update_mappings(Path, [{"id": path_id, "attributes": attributes}
+                                                   for path_id, attributes in batch.items()])
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    graph_registry.finish_pending(batch, written=False)
+                    self.failures += 1
+                    print(f"❌ 拥挤度写回失败：{e}")
+                    break
+                finally:
+                    db.close()
+                graph_registry.finish_pending(batch, written=True)
+                total += len(batch)
+                self.written += len(batch)
+                self.batches += 1
+            self.last_flush_at = time.time()
+        return total
+
+    def stop(self):
+        """停止后台线程并写回剩余积压（进程退出时调用）"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "pending": graph_registry.pending_count,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_at": self.last_flush_at
+        }
+
+
+congestion_writer = CongestionWriter()
+
+
+def apply_congestion_updates(db_session, updates: Dict[int, Dict]) -> Dict:
+    """
+    批量应用拥挤度更新：updates 为 {Path.id: {crowdedness/average_wait_time: 值}}
+    返回更新条数、未知的路径ID和新的图版本号
+    """
+    updates = {path_id: {k: v for k, v in attrs.items() if k in CONGESTION_FIELDS and v is not None}
+               for path_id, attrs in updates.items()}
+    updates = {path_id: attrs for path_id, attrs in updates.items() if attrs}
+
+    patched = set()
+
+    def on_patched(graph: HospitalGraph, changed: List[int], old_fingerprint: str):
+        patch_cost_tables(graph, changed)
+        reuse_hierarchy(graph, old_fingerprint)
+        patched.update(graph.edges[i].path_id for i in changed)
+
+    version, changed = graph_registry.patch_attributes(db_session, updates, on_patched)
+    if changed:
+        congestion_writer.notify()
+
+    return {
+        "updated": len(patched),
+        "unknown_path_ids": sorted(set(updates) - patched),
+        "graph_version": version,
+        "pending_writes": graph_registry.pending_count
+    }
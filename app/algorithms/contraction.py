@@ -0,0 +1,296 @@
+"""
+可定制的收缩层次（Customizable Contraction Hierarchy）
+多栋楼导入后图会达到数万个节点，单次A*/Dijkstra在高峰期太慢。
+预处理分两步：
+1. 节点排序与收缩（与用户画像无关）：按几何嵌套剖分确定顺序，在无向图上依次收缩节点，
+   被收缩节点的所有更高层邻居两两相连（不做见证搜索），得到与边权无关的上行弧拓扑
+2. 定制（每个用户画像一次）：原始边代价写入对应的上行弧，再按层次从低到高处理下三角
+   (v, u, w)：u-w 的代价取 min(原值, u->v->w)，并记下中间点供路径展开
+轮椅/老人等画像复用同一个节点顺序和弧拓扑，只需重新定制一遍边权。
+查询时起终点各自沿消去树向上松弛（两侧都只上行），在公共祖先处相遇，再沿中间点展开捷径得到原图路径
+"""
+
+import math
+from typing import Dict, List, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import CH_CACHE_SIZE, CH_METRIC_CACHE_SIZE, CH_LEAF_SIZE
+from app.core.graph import HospitalGraph
+from app.algorithms.cost_tables import profile_key
+
+
+class CHMetric:
+    """
+    某个用户画像定制后的上行弧代价
+    up[arc]: 低层端点 -> 高层端点 的代价，down[arc]: 高层端点 -> 低层端点 的代价
+    middle_up / middle_down: 捷径的中间节点，-1 表示原图中的边
+    """
+
+    __slots__ = ("up", "down", "middle_up", "middle_down")
+
+    def __init__(self, n_arcs: int):
+        self.up = [math.inf] * n_arcs
+        self.down = [math.inf] * n_arcs
+        self.middle_up = [-1] * n_arcs
+        self.middle_down = [-1] * n_arcs
+
+
+class ContractionHierarchy:
+    """
+    节点用 graph.to_csr() 的稠密下标；rank[v] 为收缩顺序，
+    节点 v 的上行弧（连向更高层邻居）位于 arc_targets 的 [arc_offsets[v], arc_offsets[v+1]) 区间，
+    同一节点的上行弧按层次从低到高排列
+    """
+
+    def __init__(self, graph: HospitalGraph):
+        self.csr = graph.to_csr()
+        n = len(self.csr)
+        self.rank, upward = self._contract(n)
+
+        self.arc_offsets = [0] * (n + 1)
+        self.arc_targets: List[int] = []
+        self.arc_of: Dict[int, int] = {}  # 低层端点 * n + 高层端点 -> 弧下标
+        rank = self.rank
+        for v in range(n):
+            for u in sorted(upward[v], key=rank.__getitem__):
+                self.arc_of[v * n + u] = len(self.arc_targets)
+                self.arc_targets.append(u)
+            self.arc_offsets[v + 1] = len(self.arc_targets)
+        self.order = sorted(range(n), key=rank.__getitem__)
+        # 消去树：父节点为层次最低的上行邻居；上行弧的另一端都是该节点在消去树上的祖先
+        self.parent = [self.arc_targets[self.arc_offsets[v]] if self.arc_offsets[v] < self.arc_offsets[v + 1]
+                       else -1 for v in range(n)]
+        self.metrics = LRUCache(CH_METRIC_CACHE_SIZE)
+
+    def _undirected_neighbors(self, n: int) -> List[set]:
+        offsets, targets = self.csr.offsets, self.csr.targets
+        neighbors = [set() for _ in range(n)]
+        for v in range(n):
+            for pos in range(offsets[v], offsets[v + 1]):
+                u = targets[pos]
+                if u != v:
+                    neighbors[v].add(u)
+                    neighbors[u].add(v)
+        return neighbors
+
+    def _dissection_order(self, neighbors: List[set]) -> List[int]:
+        """
+        几何嵌套剖分：沿 x / y / 楼层 中分隔点最少的方向把节点按中位数一分为二，
+        割边一侧的端点作为分隔点排在最后（层次最高），两半递归排序。
+        楼层之间只靠少量楼梯/电梯相连，走廊网格的直线切口也很短，分隔点少则收缩后的填充边少
+        """
+        csr = self.csr
+        keys = (csr.xs, csr.ys, [f * 1e6 for f in csr.floors])
+        side = [0] * len(neighbors)
+        order: List[int] = []
+        stack = [(list(range(len(neighbors))), False)]
+        while stack:
+            nodes, emit = stack.pop()
+            if emit or len(nodes) <= CH_LEAF_SIZE:
+                order.extend(nodes)
+                continue
+            best = None
+            for key in keys:
+                ranked = sorted(nodes, key=lambda v: (key[v], v))
+                half = len(ranked) // 2
+                for v in ranked[:half]:
+                    side[v] = 1
+                for v in ranked[half:]:
+                    side[v] = 2
+                left_cut = {v for v in ranked[:half] if any(side[u] == 2 for u in neighbors[v])}
+                right_cut = {v for v in ranked[half:] if any(side[u] == 1 for u in neighbors[v])}
+                separator = left_cut if len(left_cut) <= len(right_cut) else right_cut
+                if best is None or len(separator) < len(best[0]):
+                    best = (separator, ranked[:half], ranked[half:])
+                for v in nodes:
+                    side[v] = 0
+            separator, left, right = best
+            # 先入栈的后处理：分隔点最后输出，左右两半先递归
+            stack.append((sorted(separator), True))
+            stack.append(([v for v in right if v not in separator], False))
+            stack.append(([v for v in left if v not in separator], False))
+        return order
+
+    def _contract(self, n: int) -> Tuple[List[int], List[List[int]]]:
+        """按嵌套剖分顺序收缩（忽略边方向），返回 (rank, 每个节点收缩时剩余的邻居)"""
+        neighbors = self._undirected_neighbors(n)
+        order = self._dissection_order([set(s) for s in neighbors])
+        rank = [0] * n
+        for r, v in enumerate(order):
+            rank[v] = r
+        upward: List[List[int]] = [[] for _ in range(n)]
+        for v in order:
+            remaining = neighbors[v]
+            upward[v] = list(remaining)
+            # 剩余邻居两两相连（填充边）
+            for u in remaining:
+                neighbors_u = neighbors[u]
+                neighbors_u.discard(v)
+                neighbors_u.update(remaining)
+                neighbors_u.discard(u)
+            neighbors[v] = set()
+        return rank, upward
+
+    def __len__(self) -> int:
+        return len(self.arc_targets)
+
+    def customise(self, costs: List[float]) -> CHMetric:
+        """按边代价表（按边序号排列）定制上行弧代价"""
+        csr, rank, arc_of = self.csr, self.rank, self.arc_of
+        n = len(csr)
+        metric = CHMetric(len(self.arc_targets))
+        up, down = metric.up, metric.down
+        middle_up, middle_down = metric.middle_up, metric.middle_down
+
+        # 原始边（同一对节点有多条边时取最小代价）
+        offsets, targets, edge_ids = csr.offsets, csr.targets, csr.edge_ids
+        for a in range(n):
+            for pos in range(offsets[a], offsets[a + 1]):
+                b = targets[pos]
+                edge_index = edge_ids[pos]
+                if a == b or edge_index < 0:
+                    continue
+                cost = costs[edge_index]
+                if rank[a] < rank[b]:
+                    arc = arc_of[a * n + b]
+                    if cost < up[arc]:
+                        up[arc] = cost
+                else:
+                    arc = arc_of[b * n + a]
+                    if cost < down[arc]:
+                        down[arc] = cost
+
+        # 下三角：按层次从低到高，v 的两条上行弧 (v,lo)、(v,hi) 更新弧 (lo,hi)
+        arc_offsets, arc_targets = self.arc_offsets, self.arc_targets
+        for v in self.order:
+            first, last = arc_offsets[v], arc_offsets[v + 1]
+            for i in range(first, last):
+                lo = arc_targets[i]
+                lo_up, lo_down = up[i], down[i]  # v->lo, lo->v
+                base = lo * n
+                for j in range(i + 1, last):
+                    hi = arc_targets[j]
+                    arc = arc_of[base + hi]
+                    cost = lo_down + up[j]  # lo->v->hi
+                    if cost < up[arc]:
+                        up[arc] = cost
+                        middle_up[arc] = v
+                    cost = down[j] + lo_up  # hi->v->lo
+                    if cost < down[arc]:
+                        down[arc] = cost
+                        middle_down[arc] = v
+        return metric
+
+    def metric(self, user_type: str, preferences, costs: List[float]) -> CHMetric:
+        """获取（必要时定制）该用户画像的弧代价"""
+        return self.metrics.get_or_create(profile_key(user_type, preferences),
+                                          lambda: self.customise(costs))
+
+    def _unpack(self, metric: CHMetric, a: int, b: int, path: List[int]):
+        """把弧 a->b 展开为原图节点序列（不含 a），追加到 path"""
+        n = len(self.csr)
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            if self.rank[a] < self.rank[b]:
+                arc = self.arc_of[a * n + b]
+                middle = metric.middle_up[arc]
+            else:
+                arc = self.arc_of[b * n + a]
+                middle = metric.middle_down[arc]
+            if middle < 0:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def _upward(self, weights: List[float], source: int) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        沿消去树从 source 向上走，按层次顺序松弛每个祖先的上行弧（不需要优先队列）
+        返回 (祖先 -> 代价, 祖先 -> 前驱)
+        """
+        arc_offsets, arc_targets, parent = self.arc_offsets, self.arc_targets, self.parent
+        dist = {source: 0.0}
+        pred: Dict[int, int] = {}
+        node = source
+        while node >= 0:
+            d = dist.get(node, math.inf)
+            if d < math.inf:
+                for arc in range(arc_offsets[node], arc_offsets[node + 1]):
+                    nd = d + weights[arc]
+                    u = arc_targets[arc]
+                    if nd < dist.get(u, math.inf):
+                        dist[u] = nd
+                        pred[u] = node
+            node = parent[node]
+        return dist, pred
+
+    def query(self, metric: CHMetric, start_id: int, end_id: int) -> Tuple[List[int], float, int]:
+        """
+        双向只上行搜索：正向用 up 代价、反向用 down 代价，
+        两侧都只访问起点/终点在消去树上的祖先，最短路的最高点是两者的公共祖先
+        返回 (节点ID列表, 总代价, 访问的节点数)；不可达时返回 ([], inf, 访问的节点数)
+        """
+        index_of = self.csr.index_of
+        if start_id not in index_of or end_id not in index_of:
+            return [], math.inf, 0
+        source, target = index_of[start_id], index_of[end_id]
+
+        forward, forward_pred = self._upward(metric.up, source)
+        backward, backward_pred = self._upward(metric.down, target)
+        best, meeting = math.inf, -1
+        for node, d in forward.items():
+            other = backward.get(node)
+            if other is not None and d + other < best:
+                best, meeting = d + other, node
+
+        visited = len(forward) + len(backward)
+        if meeting < 0:
+            return [], math.inf, visited
+
+        # 正向：起点 -> 相遇点的上行弧链；反向：相遇点 -> 终点
+        chain = [meeting]
+        while chain[-1] in forward_pred:
+            chain.append(forward_pred[chain[-1]])
+        chain.reverse()
+        node = meeting
+        while node in backward_pred:
+            node = backward_pred[node]
+            chain.append(node)
+
+        path = [chain[0]]
+        for a, b in zip(chain, chain[1:]):
+            self._unpack(metric, a, b, path)
+        node_ids = self.csr.node_ids
+        return [node_ids[v] for v in path], best, visited
+
+
+# 键为图指纹：地图数据变化后指纹改变，重新排序收缩
+_hierarchies = LRUCache(CH_CACHE_SIZE)
+
+
+def get_contraction_hierarchy(graph: HospitalGraph) -> ContractionHierarchy:
+    """获取（必要时构建）当前图的收缩层次"""
+    return _hierarchies.get_or_create(graph.fingerprint(), lambda: ContractionHierarchy(graph))
+
+
+def reuse_hierarchy(graph: HospitalGraph, old_fingerprint: str):
+    """
+    边代价原地修补后图指纹会变，但拓扑不变：把已有的节点顺序和上行弧挂到新指纹下，
+    只清空各画像的定制结果（下次查询时按新的代价表重新定制）
+    """
+    ch = _hierarchies.get(old_fingerprint)
+    if ch is not None:
+        ch.metrics.clear()
+        _hierarchies.put(graph.fingerprint(), ch)
+
+
+def precompute_contraction_hierarchy(graph: HospitalGraph, profiles=None) -> ContractionHierarchy:
+    """启动时构建收缩层次，并为常用用户画像完成定制"""
+    from app.algorithms.cost_tables import get_cost_table
+    from app.algorithms.route_table import DEFAULT_PROFILES
+
+    ch = get_contraction_hierarchy(graph)
+    for user_type, preferences in profiles or DEFAULT_PROFILES:
+        ch.metric(user_type, preferences, get_cost_table(graph, user_type, preferences))
+    return ch
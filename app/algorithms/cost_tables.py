@@ -0,0 +1,107 @@
+"""
+边代价表预编译
+按 (用户类型, 偏好组合) 把每条边的代价一次性算成扁平数组，A*内循环只需按边序号取值
+"""
+
+from typing import List, Optional, Tuple
+
+from app.core.config import USER_WEIGHTS, PATH_TYPE_COSTS
+from app.core.graph import HospitalGraph
+
+# 会影响边代价的偏好，其余偏好（如 fastest_route）不参与编译，避免缓存碎片
+COST_PREFERENCES = {"avoid_crowds", "avoid_stairs", "use_stairs", "use_elevator", "avoid_elevator"}
+
+# 有专门代价规则的用户类型，其余类型（如 staff）与 normal 的代价完全一致
+SPECIAL_USER_TYPES = {"wheelchair", "emergency", "elderly"}
+
+
+def compute_edge_cost(path_obj, user_type: str, preferences) -> float:
+    """计算单条边的实际代价"""
+    if path_obj is None:
+        return float('inf')
+    
+    attributes = path_obj.attributes or {}
+    
+    # 基础距离
+    cost = path_obj.distance
+    
+    # 获取用户配置
+    user_config = USER_WEIGHTS.get(user_type, USER_WEIGHTS["normal"])
+    weights = user_config["weights"]
+    
+    # 根据路径类型调整代价
+    path_type = path_obj.type.lower()
+    
+    # 轮椅用户特殊处理
+    if user_type == "wheelchair":
+        if path_type == "stairs":
+            return float('inf')  # 完全不可用
+        if not attributes.get("wheelchair_accessible", True):
+            return float('inf')
+        if attributes.get("slope", 0) > 8.0:  # 坡度大于8%
+            cost *= weights.get("slope", 2.0)
+    
+    # 急诊患者
+    elif user_type == "emergency":
+        if path_type == "elevator":
+            wait_time = attributes.get("average_wait_time", 0)
+            cost += wait_time * weights.get("waiting", 2.0)
+    
+    # 老年人
+    elif user_type == "elderly":
+        if path_type == "stairs":
+            cost *= weights.get("stairs", 3.0)
+    
+    # 所有用户通用的拥挤度处理
+    crowdedness = attributes.get("crowdedness", 0)
+    if crowdedness > 0.5 and "avoid_crowds" in preferences:
+        cost *= (1 + crowdedness * 2)
+    
+    # 楼梯偏好处理
+    if path_type == "stairs":
+        if "avoid_stairs" in preferences:
+            cost *= 5.0
+        elif "use_stairs" in preferences:
+            cost *= 0.8  # 偏好楼梯的用户
+    
+    # 电梯偏好处理
+    if path_type == "elevator":
+        if "use_elevator" in preferences:
+            cost *= 0.7
+        elif "avoid_elevator" in preferences:
+            cost *= 1.5
+    
+    # 路径类型基础代价
+    type_cost = PATH_TYPE_COSTS.get(path_type, 1.0)
+    cost *= type_cost
+    
+    return cost
+
+
+def profile_key(user_type: str, preferences: Optional[List[str]]) -> Tuple[str, Tuple[str, ...]]:
+    """把用户类型和偏好归一化为缓存键"""
+    if user_type not in SPECIAL_USER_TYPES:
+        user_type = "normal"
+    prefs = tuple(sorted(set(preferences or []) & COST_PREFERENCES))
+    return user_type, prefs
+
+
+def compile_cost_table(graph: HospitalGraph, user_type: str, preferences) -> List[float]:
+    """为图中每条边计算代价，返回按边序号索引的数组（禁行边为 inf）"""
+    return [compute_edge_cost(edge, user_type, preferences) for edge in graph.edges]
+
+
+def get_cost_table(graph: HospitalGraph, user_type: str,
+                   preferences: Optional[List[str]] = None) -> List[float]:
+    """获取（必要时编译）当前图版本下该用户画像的边代价表"""
+    key = profile_key(user_type, preferences)
+    return graph.cost_tables.get_or_create(
+        key, lambda: compile_cost_table(graph, key[0], key[1])
+    )
+
+
+def patch_cost_tables(graph: HospitalGraph, edge_indices: List[int]):
+    """边属性原地修补后，只重算已编译代价表中受影响的条目（不重新编译整张表）"""
+    for (user_type, prefs), table in graph.cost_tables.items():
+        for edge_index in edge_indices:
+            table[edge_index] = compute_edge_cost(graph.edges[edge_index], user_type, prefs)
@@ -0,0 +1,63 @@
+"""
+热门目的地的距离场缓存
+大部分 /plan 请求去往少数几个目的地（挂号收费、药房、厕所、电梯）。
+为这些目的地保存整层的反向距离场（NumPy数组），到热门目的地的路线从起点沿距离场下降即可得到，
+复杂度 O(路径长度)，不需要再做网格搜索。
+距离场在第一次使用时构建，在内存预算内按LRU淘汰
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Hashable
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import (
+    HOT_DESTINATION_TYPES, HOT_DESTINATION_KEYWORDS, HOT_DESTINATION_TOP_N,
+    DISTANCE_FIELD_CACHE_SIZE, DISTANCE_FIELD_BUDGET_MB
+)
+from app.models import Location
+from app.algorithms.grid_search import PaddedGrid, distance_field
+
+# 键为 (楼层, 网格大小, 目的地格子的补边下标)
+distance_fields = LRUCache(DISTANCE_FIELD_CACHE_SIZE,
+                           max_bytes=DISTANCE_FIELD_BUDGET_MB * 1024 * 1024,
+                           sizeof=lambda field: field.nbytes)
+
+# 各楼层目的地的请求次数，用于挑出每层前 N 名
+_request_counts: Dict[int, Counter] = {}
+_counts_lock = threading.Lock()
+
+
+def is_hot_destination(loc: Location) -> bool:
+    """记录一次到 loc 的请求，并判断它是否为热门目的地"""
+    with _counts_lock:
+        counts = _request_counts.setdefault(loc.floor, Counter())
+        counts[loc.id] += 1
+        if loc.type in HOT_DESTINATION_TYPES:
+            return True
+        if any(keyword in (loc.name or "") for keyword in HOT_DESTINATION_KEYWORDS):
+            return True
+        # 至少被请求过两次才算，避免冷启动时每个目的地都建距离场
+        return counts[loc.id] > 1 and loc.id in {
+            loc_id for loc_id, _ in counts.most_common(HOT_DESTINATION_TOP_N)
+        }
+
+
+def get_destination_field(padded: PaddedGrid, floor: int, cell_size: float,
+                          target: int) -> np.ndarray:
+    """获取（必要时构建）到目的地格子 target 的距离场，未命中即构建一次"""
+    key: Hashable = (floor, cell_size, target)
+    return distance_fields.get_or_create(key, lambda: distance_field(padded, target))
+
+
+def field_stats() -> Dict:
+    """距离场缓存指标：命中/未命中（即构建次数）/淘汰、占用字节、各层请求最多的目的地"""
+    stats = distance_fields.stats()
+    with _counts_lock:
+        stats["top_destinations"] = {
+            floor: counts.most_common(HOT_DESTINATION_TOP_N)
+            for floor, counts in sorted(_request_counts.items())
+        }
+    return stats
@@ -1,50 +1,35 @@
-import json
 import heapq
+import math
 import numpy as np
 from typing import List, Tuple, Optional
 from sqlalchemy.orm import Session
 from app.models import Location
+from app.core.config import GRID_CELL_SIZE
+from app.algorithms.navigation_grid import get_floor_grid
+from app.algorithms.grid_search import PaddedGrid, get_padded_grid, octile, descend_field
+from app.algorithms.portal_graph import PortalGraph, get_portal_graph
+from app.algorithms.distance_fields import is_hot_destination, get_destination_field
+
+# 同层网格搜索算法：astar 为通用8邻域A*，jps 为跳点搜索
+# 不指定算法时，热门目的地沿缓存的距离场下降，其余目的地用 astar
+GRID_ALGORITHMS = ("astar", "jps")
+
 
 class GridPathFinder:
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, cell_size: float = GRID_CELL_SIZE,
+                 use_distance_fields: bool = True):
         self.db = db_session
+        self.cell_size = cell_size
+        self.use_distance_fields = use_distance_fields
         self.grids = {}
         self.origins = {}
+        self.expanded = 0  # 最近一次搜索扩展的格子数
     
     def load_grid(self, floor: int):
-        json_file = f"hospital_floor_data/m{floor}F_paths.json"
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        boundary = data["walkable_area"]["boundary"]
-        holes = data["walkable_area"]["holes"]
-        
-        x_min, y_min = boundary[0]
-        x_max, y_max = boundary[2]
-        
-        cell_size = 0.5
-        nx = int((x_max - x_min) / cell_size) + 1
-        ny = int((y_max - y_min) / cell_size) + 1
-        
-        grid = np.ones((ny, nx), dtype=int)
-        
-        # 标记墙体为不可走（暂时禁用）
-        # for hole in holes:
-        #     xs = [p[0] for p in hole]
-        #     ys = [p[1] for p in hole]
-        #     hx_min, hx_max = min(xs), max(xs)
-        #     hy_min, hy_max = min(ys), max(ys)
-        #     
-        #     gx_min = max(0, int((hx_min - x_min) / cell_size))
-        #     gx_max = min(nx-1, int((hx_max - x_min) / cell_size))
-        #     gy_min = max(0, int((hy_min - y_min) / cell_size))
-        #     gy_max = min(ny-1, int((hy_max - y_min) / cell_size))
-        #     
-        #     grid[gy_min:gy_max+1, gx_min:gx_max+1] = 0
-        
+        """获取楼层网格（进程共享的只读内存映射，不再每次请求解析JSON）"""
+        grid, origin = get_floor_grid(floor, self.cell_size)
         self.grids[floor] = grid
-        self.origins[floor] = (x_min, y_min, cell_size)
-        print(f"✅ 加载 {floor}楼网格：{grid.shape}，可走比例 {grid.sum()/grid.size:.1%}")
+        self.origins[floor] = origin
     
     def _world_to_grid(self, x: float, y: float, floor: int):
         x_min, y_min, cell_size = self.origins[floor]
@@ -58,148 +43,327 @@ class GridPathFinder:
         y = y_min + (gy + 0.5) * cell_size
         return x, y
     
-    def _find_path_same_floor(self, start_id: int, end_id: int):
-        start_loc = self.db.query(Location).filter(Location.id == start_id).first()
-        end_loc = self.db.query(Location).filter(Location.id == end_id).first()
-        floor = start_loc.floor
-        
-        if floor not in self.grids:
-            self.load_grid(floor)
-        
-        grid = self.grids[floor]
-        gx1, gy1 = self._world_to_grid(start_loc.x, start_loc.y, floor)
-        gx2, gy2 = self._world_to_grid(end_loc.x, end_loc.y, floor)
-        
-        grid[gy1, gx1] = 1
-        grid[gy2, gx2] = 1
-        
-        start = (gx1, gy1)
-        end = (gx2, gy2)
+    def _padded_grid(self, floor: int) -> PaddedGrid:
+        return get_padded_grid(self.grids[floor])
+    
+    def _clamp_cell(self, gx: int, gy: int, floor: int):
+        rows, cols = self.grids[floor].shape
+        return min(max(gx, 0), cols - 1), min(max(gy, 0), rows - 1)
+    
+    def _astar(self, floor: int, start: Tuple[int, int], end: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        8邻域A*（八方向距离启发式），格子用展平后的整数下标表示
+        g值/父节点存放在按格子数预分配的数组中；对角移动要求两侧的直行格子都可走（不能穿墙角）
+        返回格子坐标列表 [(gx, gy), ...]，不可达时返回 None
+        """
+        padded = self._padded_grid(floor)
+        walkable, width = padded.walkable, padded.width
+        n = len(walkable)
+        start_idx = (start[1] + 1) * width + start[0] + 1
+        end_idx = (end[1] + 1) * width + end[0] + 1
+        ex, ey = end[0] + 1, end[1] + 1
+        
+        # 用NumPy按格子数一次性分配，再转成list：解释器里逐个读写list元素比读写ndarray标量快
+        g_score = np.full(n, np.inf).tolist()
+        parent = np.full(n, -1, dtype=np.int64).tolist()
+        closed = bytearray(n)
+        
+        moves = padded.moves
+        
+        g_score[start_idx] = 0.0
+        open_set = [(octile(start_idx % width - ex, start_idx // width - ey), start_idx)]
+        expanded = 0
         
-        open_set = []
-        heapq.heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {start: 0}
-        f_score = {start: abs(gx1-gx2) + abs(gy1-gy2)}
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if closed[current]:
+                continue
+            closed[current] = 1
+            expanded += 1
+            if current == end_idx:
+                break
+            
+            g_current = g_score[current]
+            for offset, cost, side_a, side_b in moves:
+                neighbor = current + offset
+                if closed[neighbor]:
+                    continue
+                # 起终点所在格子在搜索时视为可走
+                if not walkable[neighbor] and neighbor != end_idx:
+                    continue
+                if side_a and not (walkable[current + side_a] and walkable[current + side_b]):
+                    continue
+                tentative_g = g_current + cost
+                if tentative_g < g_score[neighbor]:
+                    g_score[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    y, x = divmod(neighbor, width)
+                    heapq.heappush(open_set, (tentative_g + octile(x - ex, y - ey), neighbor))
+        
+        self.expanded = expanded
+        if not closed[end_idx]:
+            return None
         
-        dirs = [(0,1), (1,0), (0,-1), (-1,0)]
+        cells = []
+        current = end_idx
+        while current != start_idx:
+            y, x = divmod(current, width)
+            cells.append((x - 1, y - 1))
+            current = parent[current]
+        cells.append(start)
+        cells.reverse()
+        return cells
+    
+    def _jps(self, floor: int, start: Tuple[int, int], end: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        跳点搜索（Jump Point Search），适用于楼层网格这种代价均匀的占用栅格
+        规则与 _astar 相同（8邻域、不能穿墙角），沿直线/对角线“跳跃”到有强制邻居的格子才入堆，
+        直线跳跃查 PaddedGrid.jump_tables()，对角跳跃逐格前进；
+        入堆的跳点很少，所以g值/父节点用字典而不是按格子数预分配
+        返回与 _astar 等价的最短格子路径
+        """
+        padded = self._padded_grid(floor)
+        walkable, width = padded.walkable, padded.width
+        start_idx = (start[1] + 1) * width + start[0] + 1
+        end_idx = (end[1] + 1) * width + end[0] + 1
+        ex, ey = end[0] + 1, end[1] + 1
+        if not walkable[end_idx]:
+            # 跳跃表按原网格计算，终点在墙内时强制邻居会变化，退回A*
+            return self._astar(floor, start, end)
+        jumps = padded.jump_tables()
+        
+        def jump_straight(idx, step):
+            """沿直线前进，返回跳点下标，撞墙返回 -1"""
+            stop = jumps[step][idx + step]
+            # 终点恰好在这段直线上时停在终点
+            offset = end_idx - idx
+            if offset * step > 0 and (stop - end_idx) * step >= 0:
+                if (step == 1 or step == -1) and idx // width == ey:
+                    return end_idx
+                if step != 1 and step != -1 and offset % width == 0:
+                    return end_idx
+            return stop if walkable[stop] else -1
+        
+        def jump_diagonal(idx, step_x, step_y):
+            """沿对角线前进，途中任一直线方向能跳到跳点，则当前格子就是跳点"""
+            while True:
+                idx += step_x + step_y
+                if not walkable[idx]:
+                    return -1
+                if idx == end_idx:
+                    return idx
+                if jump_straight(idx, step_x) >= 0 or jump_straight(idx, step_y) >= 0:
+                    return idx
+                # 继续对角前进同样不能穿墙角
+                if not (walkable[idx + step_x] and walkable[idx + step_y]):
+                    return -1
+        
+        def successors(idx, dx, dy):
+            """按前进方向 (dx, dy) 剪枝后的搜索方向；起点 (0, 0) 时考虑全部8个方向"""
+            dirs = []
+            if dx and dy:
+                side_x = walkable[idx + dx]
+                side_y = walkable[idx + dy * width]
+                if side_y:
+                    dirs.append((0, dy))
+                if side_x:
+                    dirs.append((dx, 0))
+                if side_x and side_y:
+                    dirs.append((dx, dy))
+            elif dx:
+                up = walkable[idx + width]
+                down = walkable[idx - width]
+                if walkable[idx + dx]:
+                    dirs.append((dx, 0))
+                    if up:
+                        dirs.append((dx, 1))
+                    if down:
+                        dirs.append((dx, -1))
+                if up:
+                    dirs.append((0, 1))
+                if down:
+                    dirs.append((0, -1))
+            elif dy:
+                right = walkable[idx + 1]
+                left = walkable[idx - 1]
+                if walkable[idx + dy * width]:
+                    dirs.append((0, dy))
+                    if right:
+                        dirs.append((1, dy))
+                    if left:
+                        dirs.append((-1, dy))
+                if right:
+                    dirs.append((1, 0))
+                if left:
+                    dirs.append((-1, 0))
+            else:
+                for ddx, ddy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                    if walkable[idx + ddx + ddy * width]:
+                        dirs.append((ddx, ddy))
+                for ddx, ddy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+                    if walkable[idx + ddx] and walkable[idx + ddy * width]:
+                        dirs.append((ddx, ddy))
+            return dirs
+        
+        g_score = {start_idx: 0.0}
+        parent = {start_idx: -1}
+        closed = set()
+        open_set = [(octile(start_idx % width - ex, start_idx // width - ey), start_idx)]
+        expanded = 0
         
         while open_set:
             _, current = heapq.heappop(open_set)
-            if current == end:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start)
-                path.reverse()
-                
-                world_path = []
-                for gx, gy in path:
-                    x, y = self._grid_to_world(gx, gy, floor)
-                    world_path.append((x, y, floor))
-                
-                # 简化路径
-                if len(world_path) > 2:
-                    simplified = [world_path[0]]
-                    for i in range(1, len(world_path)-1):
-                        x1, y1, _ = world_path[i-1]
-                        x2, y2, _ = world_path[i]
-                        x3, y3, _ = world_path[i+1]
-                        if not ((abs(x1 - x2) < 0.01 and abs(x2 - x3) < 0.01) or (abs(y1 - y2) < 0.01 and abs(y2 - y3) < 0.01)):
-                            simplified.append(world_path[i])
-                    simplified.append(world_path[-1])
-                    world_path = simplified
-                return world_path
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
+            if current == end_idx:
+                break
+            
+            cy, cx = divmod(current, width)
+            dx = dy = 0
+            if parent[current] >= 0:
+                py, px = divmod(parent[current], width)
+                dx = (cx > px) - (cx < px)
+                dy = (cy > py) - (cy < py)
             
-            cx, cy = current
-            for dx, dy in dirs:
-                nx, ny = cx + dx, cy + dy
-                if 0 <= nx < grid.shape[1] and 0 <= ny < grid.shape[0]:
-                    if grid[ny, nx] == 0:
-                        continue
-                    neighbor = (nx, ny)
-                    tentative_g = g_score[current] + 1
-                    if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                        came_from[neighbor] = current
-                        g_score[neighbor] = tentative_g
-                        f = tentative_g + abs(nx-gx2) + abs(ny-gy2)
-                        heapq.heappush(open_set, (f, neighbor))
-        
-        return None
+            for ddx, ddy in successors(current, dx, dy):
+                if ddx and ddy:
+                    jump_point = jump_diagonal(current, ddx, ddy * width)
+                elif ddx:
+                    jump_point = jump_straight(current, ddx)
+                else:
+                    jump_point = jump_straight(current, ddy * width)
+                if jump_point < 0 or jump_point in closed:
+                    continue
+                jy, jx = divmod(jump_point, width)
+                tentative_g = g_score[current] + octile(jx - cx, jy - cy)
+                if tentative_g < g_score.get(jump_point, math.inf):
+                    g_score[jump_point] = tentative_g
+                    parent[jump_point] = current
+                    heapq.heappush(open_set, (tentative_g + octile(jx - ex, jy - ey), jump_point))
+        
+        self.expanded = expanded
+        if end_idx not in closed:
+            return None
+        
+        # 相邻跳点之间是直线或45°对角线，逐格展开成与A*相同形式的格子路径
+        jump_points = []
+        current = end_idx
+        while current >= 0:
+            jump_points.append(divmod(current, width))
+            current = parent[current]
+        jump_points.reverse()
+        
+        cells = [start]
+        for (y1, x1), (y2, x2) in zip(jump_points, jump_points[1:]):
+            step_x = (x2 > x1) - (x2 < x1)
+            step_y = (y2 > y1) - (y2 < y1)
+            for i in range(1, max(abs(x2 - x1), abs(y2 - y1)) + 1):
+                cells.append((x1 + i * step_x - 1, y1 + i * step_y - 1))
+        return cells
     
-    def _find_path_cross_floor(self, start_id: int, end_id: int):
-        stairs = self.db.query(Location).filter(
-            Location.type.in_(['stairs', 'elevator'])
-        ).all()
+    def _cells_to_world(self, cells: List[Tuple[int, int]], floor: int):
+        """格子路径转世界坐标，并去掉同一方向直线上的中间点"""
+        if len(cells) > 2:
+            simplified = [cells[0]]
+            for i in range(1, len(cells) - 1):
+                (x1, y1), (x2, y2), (x3, y3) = cells[i - 1], cells[i], cells[i + 1]
+                if (x2 - x1, y2 - y1) != (x3 - x2, y3 - y2):
+                    simplified.append(cells[i])
+            simplified.append(cells[-1])
+            cells = simplified
+        
+        world_path = []
+        for gx, gy in cells:
+            x, y = self._grid_to_world(gx, gy, floor)
+            world_path.append((x, y, floor))
+        return world_path
+    
+    def _find_path_same_floor(self, start_loc: Location, end_loc: Location,
+                              algorithm: Optional[str] = None):
+        floor = start_loc.floor
         
-        start_loc = self.db.query(Location).filter(Location.id == start_id).first()
-        end_loc = self.db.query(Location).filter(Location.id == end_id).first()
+        if floor not in self.grids:
+            self.load_grid(floor)
         
-        if not start_loc or not end_loc:
+        start = self._clamp_cell(*self._world_to_grid(start_loc.x, start_loc.y, floor), floor)
+        end = self._clamp_cell(*self._world_to_grid(end_loc.x, end_loc.y, floor), floor)
+        
+        # 热门目的地：沿缓存的距离场下降，不做搜索；调用方指定了算法时照常搜索
+        hot = self.use_distance_fields and is_hot_destination(end_loc)
+        if hot and algorithm is None:
+            padded = self._padded_grid(floor)
+            field = get_destination_field(padded, floor, self.cell_size, padded.index(end))
+            indices = descend_field(padded, field, padded.index(start))
+            self.expanded = 0
+            if indices is None:
+                return None
+            return self._cells_to_world([padded.cell(i) for i in indices], floor)
+        
+        search = self._jps if algorithm == "jps" else self._astar
+        cells = search(floor, start, end)
+        if cells is None:
             return None
-        
-        # 找到起点层最近的楼梯
-        nearest_stair_start = None
-        min_dist = float('inf')
-        for stair in stairs:
-            if stair.floor == start_loc.floor:
-                dist = abs(stair.x - start_loc.x) + abs(stair.y - start_loc.y)
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest_stair_start = stair
-        
-        if not nearest_stair_start:
+        return self._cells_to_world(cells, floor)
+    
+    def locate(self, loc: Location) -> int:
+        """位置所在格子的补边展平下标（按需加载楼层网格）"""
+        if loc.floor not in self.grids:
+            self.load_grid(loc.floor)
+        cell = self._clamp_cell(*self._world_to_grid(loc.x, loc.y, loc.floor), loc.floor)
+        return self._padded_grid(loc.floor).index(cell)
+    
+    def _descend_to_world(self, portal_graph: PortalGraph, portal_id: int,
+                          floor: int, start_index: int):
+        """沿通道口的距离场从 start_index 走到通道口，返回世界坐标路径（已简化）"""
+        if floor not in self.grids:
+            self.load_grid(floor)
+        padded = portal_graph.padded[floor]
+        indices = descend_field(padded, portal_graph.fields[portal_id], start_index)
+        if indices is None:
             return None
-        
-        # 找到终点层对应的楼梯（同一部）
-        nearest_stair_end = None
-        for stair in stairs:
-            if stair.floor == end_loc.floor:
-                if abs(stair.x - nearest_stair_start.x) < 1.0 and \
-                abs(stair.y - nearest_stair_start.y) < 1.0:
-                    nearest_stair_end = stair
-                    break
-        
-        if not nearest_stair_end:
-            min_dist_end = float('inf')
-            for stair in stairs:
-                if stair.floor == end_loc.floor:
-                    dist = abs(stair.x - end_loc.x) + abs(stair.y - end_loc.y)
-                    if dist < min_dist_end:
-                        min_dist_end = dist
-                        nearest_stair_end = stair
-        
-        if not nearest_stair_end:
+        return self._cells_to_world([padded.cell(i) for i in indices], floor)
+    
+    def _find_path_cross_floor(self, start_loc: Location, end_loc: Location):
+        """
+        分层规划：在楼梯/电梯抽象图上选出全局最优的通道口序列，
+        各段局部路径沿通道口距离场下降得到（与同层搜索算法无关）
+        """
+        portal_graph = get_portal_graph(self)
+        start_index = self.locate(start_loc)
+        end_index = self.locate(end_loc)
+        route = portal_graph.route(start_loc.floor, start_index, end_loc.floor, end_index)
+        if route is None:
             return None
+        _, sequence = route
         
-        # 起点到楼梯
-        start_path = self._find_path_same_floor(start_id, nearest_stair_start.id)
-        # 楼梯到终点
-        end_path = self._find_path_same_floor(nearest_stair_end.id, end_id)
-        
-        if not start_path or not end_path:
+        # 起点到第一个通道口（去掉最后一个格子中心，改用通道口的实际坐标）
+        first = portal_graph.portals[sequence[0]]
+        start_path = self._descend_to_world(portal_graph, first.id, start_loc.floor, start_index)
+        if not start_path:
             return None
-        
-        # 合并：起点路径（不含最后一点）+ 起点楼梯 + 终点楼梯 + 终点路径（不含第一点）
-        full_path = []
-        
-        # 起点路径（去掉最后一个点，避免重复）
-        if len(start_path) > 1:
-            full_path.extend(start_path[:-1])
-        else:
-            full_path.extend(start_path)
-        
-        # 起点楼梯点
-        full_path.append((nearest_stair_start.x, nearest_stair_start.y, nearest_stair_start.floor))
-        # 终点楼梯点（垂直移动）
-        full_path.append((nearest_stair_end.x, nearest_stair_end.y, nearest_stair_end.floor))
-        
-        # 终点路径（去掉第一个点）
-        if len(end_path) > 1:
-            full_path.extend(end_path[1:])
-        else:
-            full_path.extend(end_path)
+        full_path = start_path[:-1] if len(start_path) > 1 else list(start_path)
+        full_path.append((first.x, first.y, first.floor))
+        
+        for prev_id, portal_id in zip(sequence, sequence[1:]):
+            prev = portal_graph.portals[prev_id]
+            portal = portal_graph.portals[portal_id]
+            if portal.floor == prev.floor:
+                # 中间楼层换乘另一部楼梯/电梯：沿目标通道口的距离场走过去
+                segment = self._descend_to_world(portal_graph, portal.id, portal.floor, prev.index)
+                if not segment:
+                    return None
+                full_path.extend(segment[1:-1])
+            full_path.append((portal.x, portal.y, portal.floor))
+        
+        # 最后一个通道口到终点：终点沿该通道口的距离场下降，再反过来
+        last = portal_graph.portals[sequence[-1]]
+        end_path = self._descend_to_world(portal_graph, last.id, end_loc.floor, end_index)
+        if not end_path:
+            return None
+        end_path.reverse()
+        full_path.extend(end_path[1:] if len(end_path) > 1 else end_path)
         
         # 去重
         unique_path = []
@@ -209,7 +373,10 @@ class GridPathFinder:
         
         return unique_path
         
-    def find_path(self, start_id: int, end_id: int):
+    def find_path(self, start_id: int, end_id: int, algorithm: Optional[str] = None):
+        if algorithm is not None and algorithm not in GRID_ALGORITHMS:
+            raise ValueError(f"未知的网格搜索算法: {algorithm}")
+        
         start_loc = self.db.query(Location).filter(Location.id == start_id).first()
         end_loc = self.db.query(Location).filter(Location.id == end_id).first()
         
@@ -217,6 +384,6 @@ class GridPathFinder:
             return None
         
         if start_loc.floor == end_loc.floor:
-            return self._find_path_same_floor(start_id, end_id)
+            return self._find_path_same_floor(start_loc, end_loc, algorithm)
         
-        return self._find_path_cross_floor(start_id, end_id)
\ No newline at end of file
+        return self._find_path_cross_floor(start_loc, end_loc)
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+网格搜索的公共结构
+补边展平的楼层网格、8邻域移动规则（不能穿墙角）、JPS跳跃表，以及整张楼层的距离场：
+从某个格子做一次Dijkstra得到到所有格子的最短距离，之后任意格子到它的路径沿距离场下降即可得到；
+一组格子两两之间的距离（建路网用）每个格子只做一次Dijkstra
+"""
+
+import heapq
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+
+SQRT2 = 2 ** 0.5
+PADDED_GRID_CACHE_SIZE = 16
+
+
+def octile(dx: int, dy: int) -> float:
+    """八方向距离：直行代价1，对角代价√2"""
+    dx = abs(dx)
+    dy = abs(dy)
+    return dx + dy + (SQRT2 - 2) * min(dx, dy)
+
+
+def _shift(mask: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    """out[y, x] = mask[y + dy, x + dx]，越界处为 False"""
+    rows, cols = mask.shape
+    out = np.zeros_like(mask)
+    out[max(0, -dy):rows - max(0, dy), max(0, -dx):cols - max(0, dx)] = \
+        mask[max(0, dy):rows + min(0, dy), max(0, dx):cols + min(0, dx)]
+    return out
+
+
+class PaddedGrid:
+    """
+    四周补一圈障碍后展平的楼层网格 (bytearray)
+    补边后邻居下标不会越界，搜索循环里不需要做边界判断
+    """
+
+    def __init__(self, grid: np.ndarray):
+        self.grid = grid
+        padded = np.pad(np.asarray(grid, dtype=np.uint8), 1)
+        self.shape = padded.shape
+        self.width = padded.shape[1]
+        self.walkable = bytearray(padded.tobytes())
+        width = self.width
+        # 邻居偏移：(下标偏移, 代价, 对角时需检查的两个直行偏移)
+        self.moves = [(1, 1.0, 0, 0), (-1, 1.0, 0, 0), (width, 1.0, 0, 0), (-width, 1.0, 0, 0),
+                      (width + 1, SQRT2, 1, width), (width - 1, SQRT2, -1, width),
+                      (-width + 1, SQRT2, 1, -width), (-width - 1, SQRT2, -1, -width)]
+        self._jump_tables = None
+        self._neighbors = None
+
+    def index(self, cell: Tuple[int, int]) -> int:
+        """原网格坐标 (gx, gy) -> 补边后的展平下标"""
+        return (cell[1] + 1) * self.width + cell[0] + 1
+
+    def cell(self, index: int) -> Tuple[int, int]:
+        """补边后的展平下标 -> 原网格坐标 (gx, gy)"""
+        y, x = divmod(index, self.width)
+        return x - 1, y - 1
+
+    def jump_tables(self) -> Dict[int, List[int]]:
+        """
+        JPS直线跳跃表：{下标偏移: 表}，表[i] 为从格子 i 起沿该方向（含 i）第一个需要停下的格子，
+        即墙或有强制邻居的跳点。直线跳跃由逐格扫描变成一次查表
+        """
+        if self._jump_tables is None:
+            walk = np.frombuffer(bytes(self.walkable), dtype=np.uint8).reshape(self.shape).astype(bool)
+            rows, cols = self.shape
+            index = np.arange(rows * cols).reshape(self.shape)
+            n = rows * cols
+
+            def forced(side_dy, side_dx, back_dy, back_dx):
+                # 两侧之一可走而其侧后方被挡
+                return ((_shift(walk, side_dy, side_dx) & ~_shift(walk, side_dy + back_dy, side_dx + back_dx)) |
+                        (_shift(walk, -side_dy, -side_dx) & ~_shift(walk, -side_dy + back_dy, -side_dx + back_dx)))
+
+            stop_east = ~walk | forced(1, 0, 0, -1)
+            stop_west = ~walk | forced(1, 0, 0, 1)
+            stop_north = ~walk | forced(0, 1, -1, 0)
+            stop_south = ~walk | forced(0, 1, 1, 0)
+
+            # 补边的墙保证每行/每列的扫描都会在边界停下
+            east = np.minimum.accumulate(np.where(stop_east, index, n)[:, ::-1], axis=1)[:, ::-1]
+            west = np.maximum.accumulate(np.where(stop_west, index, -1), axis=1)
+            north = np.minimum.accumulate(np.where(stop_north, index, n)[::-1, :], axis=0)[::-1, :]
+            south = np.maximum.accumulate(np.where(stop_south, index, -1), axis=0)
+            width = self.width
+            self._jump_tables = {1: east.ravel().tolist(), -1: west.ravel().tolist(),
+                                 width: north.ravel().tolist(), -width: south.ravel().tolist()}
+        return self._jump_tables
+
+    def neighbors(self) -> Tuple[List[Tuple[int, ...]], List[Tuple[int, ...]]]:
+        """
+        邻接表 (直行, 对角)：表[i] 为可走格子 i 一步能走到的邻居下标，墙和会穿墙角的对角已排除
+        搜索循环里只需遍历邻接表，不再逐个方向检查
+        """
+        if self._neighbors is None:
+            walkable = self.walkable
+            straight = [()] * len(walkable)
+            diagonal = [()] * len(walkable)
+            for i in range(len(walkable)):
+                if walkable[i]:
+                    straight[i] = tuple(i + offset for offset, _, side_a, _ in self.moves
+                                        if not side_a and walkable[i + offset])
+                    diagonal[i] = tuple(i + offset for offset, _, side_a, side_b in self.moves
+                                        if side_a and walkable[i + offset] and
+                                        walkable[i + side_a] and walkable[i + side_b])
+            self._neighbors = (straight, diagonal)
+        return self._neighbors
+
+
+# 补边网格按网格对象缓存（楼层网格是进程共享的，各请求的 GridPathFinder 复用同一份）
+_padded_grids = LRUCache(PADDED_GRID_CACHE_SIZE)
+
+
+def get_padded_grid(grid: np.ndarray) -> PaddedGrid:
+    padded = _padded_grids.get(id(grid))
+    # 缓存里持有网格对象本身，id 不会被复用；仍校验一次以防万一
+    if padded is None or padded.grid is not grid:
+        padded = PaddedGrid(grid)
+        _padded_grids.put(id(grid), padded)
+    return padded
+
+
+def distance_field(padded: PaddedGrid, source: int,
+                   targets: Optional[Iterable[int]] = None) -> np.ndarray:
+    """
+    从 source（补边下标）出发的Dijkstra距离场，单位为格子，不可达为 inf
+    移动规则与A*相同，网格上的移动是对称的，所以它同时也是“到 source 的距离”
+    source 本身在墙内也可以出发；targets 中的格子在墙内也可以到达（但不从它继续扩展），
+    给定 targets 时全部确定后提前结束
+    返回补边后展平的 float32 数组
+    """
+    walkable = padded.walkable
+    moves = padded.moves
+    dist = [math.inf] * len(walkable)
+    dist[source] = 0.0
+    done = bytearray(len(walkable))
+    remaining = set(targets) if targets is not None else None
+    if remaining is not None:
+        remaining.discard(source)
+    open_set = [(0.0, source)]
+
+    while open_set:
+        d, current = heapq.heappop(open_set)
+        if done[current]:
+            continue
+        done[current] = 1
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        if not walkable[current] and current != source:
+            continue
+        for offset, cost, side_a, side_b in moves:
+            neighbor = current + offset
+            if done[neighbor]:
+                continue
+            if not walkable[neighbor] and (remaining is None or neighbor not in remaining):
+                continue
+            if side_a and not (walkable[current + side_a] and walkable[current + side_b]):
+                continue
+            nd = d + cost
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                heapq.heappush(open_set, (nd, neighbor))
+
+    return np.array(dist, dtype=np.float32)
+
+
+def pairwise_distances(padded: PaddedGrid, cells: List[int],
+                       max_offset: Optional[int] = None) -> np.ndarray:
+    """
+    一组可走格子（补边下标）两两之间的最短距离，单位为格子，返回 n×n 的对称矩阵，
+    不可达或坐标相差超过 max_offset 格的为 inf
+    每个格子只做一次Dijkstra，目标为排在它后面的格子（前面的已由对方求出），
+    扩展时把所有目标格子的距离一并记下，目标全部确定后提前结束。
+    移动代价只有 1 和 √2 两种，而出队距离单调不减，所以同一代价入队的距离也单调不减：
+    每种代价各用一个先进先出队列，取两个队首中较小的即可，不需要二叉堆
+    """
+    straight_neighbors, diagonal_neighbors = padded.neighbors()
+    width = padded.width
+    size = len(straight_neighbors)
+    n = len(cells)
+    result = np.full((n, n), np.inf)
+    np.fill_diagonal(result, 0.0)
+    coords = [divmod(cell, width) for cell in cells]
+
+    for i, source in enumerate(cells):
+        sy, sx = coords[i]
+        # 目标格子 -> 它在 cells 中的位置（同一格子出现多次时都要记录）
+        remaining: Dict[int, List[int]] = {}
+        for j in range(i + 1, n):
+            ty, tx = coords[j]
+            if max_offset is None or (abs(sx - tx) <= max_offset and abs(sy - ty) <= max_offset):
+                remaining.setdefault(cells[j], []).append(j)
+        if not remaining:
+            continue
+
+        dist = [math.inf] * size
+        dist[source] = 0.0
+        done = bytearray(size)
+        straight = deque([(0.0, source)])
+        diagonal = deque()
+        while straight or diagonal:
+            if not diagonal or (straight and straight[0][0] <= diagonal[0][0]):
+                d, current = straight.popleft()
+            else:
+                d, current = diagonal.popleft()
+            if done[current]:
+                continue
+            done[current] = 1
+            found = remaining.pop(current, None)
+            if found is not None:
+                result[i, found] = d
+                result[found, i] = d
+                if not remaining:
+                    break
+            nd = d + 1.0
+            for neighbor in straight_neighbors[current]:
+                if nd < dist[neighbor]:
+                    dist[neighbor] = nd
+                    straight.append((nd, neighbor))
+            nd = d + SQRT2
+            for neighbor in diagonal_neighbors[current]:
+                if nd < dist[neighbor]:
+                    dist[neighbor] = nd
+                    diagonal.append((nd, neighbor))
+
+    return result
+
+
+def field_value(padded: PaddedGrid, field: np.ndarray, index: int) -> float:
+    """格子到距离场源点的距离；格子在墙内时取从它走一步到可走邻居的最小值"""
+    if padded.walkable[index] or field[index] == 0:
+        return float(field[index])
+    walkable = padded.walkable
+    best = math.inf
+    for offset, cost, side_a, side_b in padded.moves:
+        neighbor = index + offset
+        if side_a and not (walkable[index + side_a] and walkable[index + side_b]):
+            continue
+        best = min(best, float(field[neighbor]) + cost)
+    return best
+
+
+def descend_field(padded: PaddedGrid, field: np.ndarray, start: int) -> Optional[List[int]]:
+    """
+    沿距离场下降，得到从 start 到源点的最短格子路径（补边下标列表），复杂度 O(路径长度)
+    不可达时返回 None
+    """
+    walkable = padded.walkable
+    moves = padded.moves
+    # 通过 memoryview 逐个读取比索引 ndarray 标量快
+    field = memoryview(np.ascontiguousarray(field, dtype=np.float32))
+    path = [start]
+    current = start
+    for _ in range(len(walkable)):
+        if field[current] == 0:
+            return path
+        best, best_value = -1, math.inf
+        for offset, cost, side_a, side_b in moves:
+            neighbor = current + offset
+            if not walkable[neighbor] and field[neighbor] != 0:
+                continue
+            if side_a and not (walkable[current + side_a] and walkable[current + side_b]):
+                continue
+            value = field[neighbor] + cost
+            if value < best_value:
+                best, best_value = neighbor, value
+        if best < 0 or best_value == math.inf:
+            return None
+        path.append(best)
+        current = best
+    return None
@@ -0,0 +1,325 @@
+"""
+楼层导航网格的构建与持久化
+网格由 hospital_floor_data/m{floor}F_paths.json 栅格化得到，保存为 .npy 文件，
+运行时以只读内存映射方式加载：同一进程内所有请求共享，多个worker进程共享同一份页缓存
+
+预先生成全部楼层网格：
+    python -m app.algorithms.navigation_grid
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, IO, Tuple
+
+import numpy as np
+
+from app.core.config import FLOOR_DATA_DIR, GRID_CACHE_DIR, GRID_CELL_SIZE
+
+# 栅格化时每批中间矩阵的元素上限，控制 0.1m 等细网格下的内存占用
+RASTER_BATCH_CELLS = 4_000_000
+
+FLOORS = [1, 2, 3, 4]
+
+# 栅格化规则的版本，变化后已持久化的网格失效（2：多边形的边经过的格子也标记）
+RASTER_VERSION = 2
+
+# (楼层, 网格大小) -> (网格, (x_min, y_min, cell_size))
+_grid_store: Dict[Tuple[int, float], Tuple[np.ndarray, Tuple[float, float, float]]] = {}
+_store_lock = threading.Lock()
+
+
+def load_floor_data(json_file):
+    """加载楼层数据"""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def floor_json_path(floor: int) -> str:
+    return os.path.join(FLOOR_DATA_DIR, f"m{floor}F_paths.json")
+
+
+def _is_department(obstacle) -> bool:
+    """科室/诊室障碍物内部可进入（注意处理乱码）"""
+    material = obstacle.get("material", "")
+    return "科室" in material or "诊室" in material or "绉戝" in material
+
+
+def _is_axis_aligned_rect(polygon) -> bool:
+    return (len(polygon) == 4
+            and len({v[0] for v in polygon}) == 2
+            and len({v[1] for v in polygon}) == 2)
+
+
+def _cell_range(polygon, x_min: float, y_min: float, grid_size: float):
+    """多边形包围盒覆盖的格子下标范围 (gx0, gx1, gy0, gy1)，闭区间"""
+    xs = [v[0] for v in polygon]
+    ys = [v[1] for v in polygon]
+    return (int(np.floor((min(xs) - x_min) / grid_size)),
+            int(np.floor((max(xs) - x_min) / grid_size)),
+            int(np.floor((min(ys) - y_min) / grid_size)),
+            int(np.floor((max(ys) - y_min) / grid_size)))
+
+
+def rasterise_polygons(polygons, x_min: float, y_min: float,
+                       shape: Tuple[int, int], grid_size: float) -> np.ndarray:
+    """
+    向量化栅格化一组任意多边形，返回形状为 shape 的布尔矩阵（与任一多边形有重叠的格子为 True）
+
+    每个格子取中心点在多边形包围盒内的投影作为采样点，用奇偶规则射线法判断是否在多边形内，
+    与包围盒不相交的格子直接排除；再把多边形的每条边按经过的格子标记（_mark_edges），
+    单个采样点会漏掉的细长斜墙也能得到连续的一串不可走格子。
+    多边形按批处理，每批 (多边形数, 行, 列) 的中间矩阵不超过 RASTER_BATCH_CELLS 个元素
+    """
+    rows, cols = shape
+    mask = np.zeros(shape, dtype=bool)
+
+    # 轴对齐矩形（科室、大部分墙体）的结果就是包围盒覆盖的格子，直接切片赋值
+    general = []
+    for poly in polygons:
+        if _is_axis_aligned_rect(poly):
+            gx0, gx1, gy0, gy1 = _cell_range(poly, x_min, y_min, grid_size)
+            mask[max(gy0, 0):max(gy1 + 1, 0), max(gx0, 0):max(gx1 + 1, 0)] = True
+        else:
+            general.append(poly)
+    polygons = general
+    if not polygons:
+        return mask
+
+    gx = np.arange(cols)
+    gy = np.arange(rows)
+    centre_x = x_min + (gx + 0.5) * grid_size
+    centre_y = y_min + (gy + 0.5) * grid_size
+    eps = grid_size * 1e-6
+    batch = max(1, RASTER_BATCH_CELLS // (rows * cols))
+
+    for start in range(0, len(polygons), batch):
+        chunk = polygons[start:start + batch]
+        # 顶点数不同的多边形用最后一个顶点补齐，补出来的是零长度边，不影响奇偶性
+        n_vertices = max(len(poly) for poly in chunk)
+        verts = np.array([[list(v[:2]) for v in poly] + [list(poly[-1][:2])] * (n_vertices - len(poly))
+                          for poly in chunk], dtype=float)
+        p_min = verts.min(axis=1)
+        p_max = verts.max(axis=1)
+
+        # 采样点：格子中心投影到各多边形的包围盒内，形状 (P,1,W) / (P,H,1)
+        px = np.clip(centre_x[None, :], p_min[:, 0:1] + eps, p_max[:, 0:1] - eps)[:, None, :]
+        py = np.clip(centre_y[None, :], p_min[:, 1:2] + eps, p_max[:, 1:2] - eps)[:, :, None]
+
+        inside = np.zeros((len(chunk), rows, cols), dtype=bool)
+        for i in range(n_vertices):
+            x1 = verts[:, i, 0, None, None]
+            y1 = verts[:, i, 1, None, None]
+            x2 = verts[:, (i + 1) % n_vertices, 0, None, None]
+            y2 = verts[:, (i + 1) % n_vertices, 1, None, None]
+            crosses = (y1 > py) != (y2 > py)
+            # 水平边 crosses 恒为 False，除零结果会被屏蔽
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (px < x_cross)
+
+        # 只保留与包围盒相交的格子
+        ix0 = np.floor((p_min[:, 0] - x_min) / grid_size)[:, None]
+        ix1 = np.floor((p_max[:, 0] - x_min) / grid_size)[:, None]
+        iy0 = np.floor((p_min[:, 1] - y_min) / grid_size)[:, None]
+        iy1 = np.floor((p_max[:, 1] - y_min) / grid_size)[:, None]
+        in_x = (gx[None, :] >= ix0) & (gx[None, :] <= ix1)
+        in_y = (gy[None, :] >= iy0) & (gy[None, :] <= iy1)
+        inside &= in_x[:, None, :] & in_y[:, :, None]
+        mask |= inside.any(axis=0)
+
+    _mark_edges(mask, polygons, x_min, y_min, grid_size)
+    return mask
+
+
+def _mark_edges(mask: np.ndarray, polygons, x_min: float, y_min: float, grid_size: float):
+    """
+    把多边形每条边经过的格子标记为 True（超覆盖：线段与格子正方形相交即标记）
+    分离轴判断：包围盒范围内的格子，中心到线段所在直线的距离不超过格子在法向上的半投影即相交
+    """
+    rows, cols = mask.shape
+    half = grid_size / 2
+    for poly in polygons:
+        for (x1, y1), (x2, y2) in zip([v[:2] for v in poly], [v[:2] for v in poly[1:] + poly[:1]]):
+            gx0 = max(int(np.floor((min(x1, x2) - x_min) / grid_size)), 0)
+            gx1 = min(int(np.floor((max(x1, x2) - x_min) / grid_size)), cols - 1)
+            gy0 = max(int(np.floor((min(y1, y2) - y_min) / grid_size)), 0)
+            gy1 = min(int(np.floor((max(y1, y2) - y_min) / grid_size)), rows - 1)
+            if gx0 > gx1 or gy0 > gy1:
+                continue
+            cx = x_min + (np.arange(gx0, gx1 + 1) + 0.5) * grid_size
+            cy = y_min + (np.arange(gy0, gy1 + 1) + 0.5) * grid_size
+            # 直线法向 (nx, ny)，格子中心到直线的有向距离（未归一化）
+            nx, ny = y2 - y1, x1 - x2
+            offset = nx * (cx[None, :] - x1) + ny * (cy[:, None] - y1)
+            mask[gy0:gy1 + 1, gx0:gx1 + 1] |= np.abs(offset) <= half * (abs(nx) + abs(ny))
+
+
+def create_navigation_grid(boundary, holes, obstacles, grid_size=0.5):
+    """
+    创建导航网格
+    boundary: 楼层边界多边形 [ [x,y], ... ]（一般为矩形）
+    holes: 墙体区域列表，每个区域是任意多边形
+    obstacles: 原始障碍物数据，用于区分墙体和科室
+    grid_size: 网格大小（米），可低至 0.1
+    """
+    x_min = min(p[0] for p in boundary)
+    y_min = min(p[1] for p in boundary)
+    x_max = max(p[0] for p in boundary)
+    y_max = max(p[1] for p in boundary)
+    
+    # 计算网格维度
+    x_cells = int((x_max - x_min) / grid_size) + 1
+    y_cells = int((y_max - y_min) / grid_size) + 1
+    
+    print(f"    网格范围: x[{x_min:.2f}, {x_max:.2f}], y[{y_min:.2f}, {y_max:.2f}]")
+    print(f"    网格大小: {x_cells} x {y_cells}")
+    
+    # 边界多边形内部标记为可走
+    shape = (y_cells, x_cells)
+    grid = rasterise_polygons([boundary], x_min, y_min, shape, grid_size).astype(np.uint8)
+    
+    # 1. 先标记所有holes为不可走（真正的墙体）
+    grid[rasterise_polygons(holes, x_min, y_min, shape, grid_size)] = 0
+    print(f"    标记了 {len(holes)} 个墙体区域为不可走")
+    
+    # 2. 把科室位置重新标记为可走（因为科室内部是可以进入的）
+    departments = []
+    for obs in obstacles:
+        bounds = obs.get("bounds", {})
+        if _is_department(obs) and bounds:
+            departments.append([
+                [bounds.get("x_min", 0), bounds.get("z_min", 0)],
+                [bounds.get("x_max", 0), bounds.get("z_min", 0)],
+                [bounds.get("x_max", 0), bounds.get("z_max", 0)],
+                [bounds.get("x_min", 0), bounds.get("z_max", 0)],
+            ])
+    grid[rasterise_polygons(departments, x_min, y_min, shape, grid_size)] = 1
+    dept_count = len(departments)
+    
+    print(f"    恢复了 {dept_count} 个科室区域为可走")
+    print(f"    最终可走网格比例: {np.sum(grid)}/{grid.size} ({np.sum(grid)/grid.size*100:.1f}%)")
+    
+    return grid, x_min, y_min
+
+
+def _grid_files(floor: int, cell_size: float) -> Tuple[str, str]:
+    stem = os.path.join(GRID_CACHE_DIR, f"m{floor}F_grid_{cell_size:g}")
+    return stem + ".npy", stem + ".json"
+
+
+def _source_digest(json_file: str) -> str:
+    with open(json_file, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def rasterise_floor(floor: int, cell_size: float = GRID_CELL_SIZE):
+    """栅格化楼层JSON，返回 (网格, (x_min, y_min, cell_size))"""
+    data = load_floor_data(floor_json_path(floor))
+    grid, x_min, y_min = create_navigation_grid(
+        data["walkable_area"]["boundary"],
+        data["walkable_area"]["holes"],
+        data.get("obstacles", []),
+        cell_size
+    )
+    return grid, (x_min, y_min, cell_size)
+
+
+def _write_atomically(path: str, write: Callable[[IO], None], mode: str = 'wb', **kwargs):
+    """
+    先写到同目录下本次独占的临时文件再替换，避免其他进程映射到写了一半的文件；
+    多个进程同时构建同一楼层时各写各的临时文件，后替换的为准
+    """
+    with tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False, **kwargs) as f:
+        tmp_file = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_file)
+            raise
+    os.chmod(tmp_file, 0o644)  # NamedTemporaryFile 默认只有属主可读
+    os.replace(tmp_file, path)
+
+
+def build_floor_grid(floor: int, cell_size: float = GRID_CELL_SIZE):
+    """栅格化楼层JSON并写入 .npy 文件，返回 (网格, 原点信息)"""
+    json_file = floor_json_path(floor)
+    grid, (x_min, y_min, _) = rasterise_floor(floor, cell_size)
+
+    npy_file, meta_file = _grid_files(floor, cell_size)
+    os.makedirs(GRID_CACHE_DIR, exist_ok=True)
+    meta = {
+        "floor": floor,
+        "x_min": x_min,
+        "y_min": y_min,
+        "cell_size": cell_size,
+        "shape": list(grid.shape),
+        "source_sha1": _source_digest(json_file),
+        "raster_version": RASTER_VERSION
+    }
+    _write_atomically(npy_file, lambda f: np.save(f, grid))
+    _write_atomically(meta_file, lambda f: json.dump(meta, f, ensure_ascii=False, indent=2),
+                      mode='w', encoding='utf-8')
+    return grid, (x_min, y_min, cell_size)
+
+
+def _load_persisted_grid(floor: int, cell_size: float):
+    """读取已持久化的网格，源JSON或栅格化规则变化、文件缺失时返回 None"""
+    npy_file, meta_file = _grid_files(floor, cell_size)
+    if not (os.path.exists(npy_file) and os.path.exists(meta_file)):
+        return None
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get("source_sha1") != _source_digest(floor_json_path(floor)):
+        return None
+    if meta.get("raster_version") != RASTER_VERSION:
+        return None
+    grid = np.load(npy_file, mmap_mode='r')
+    return grid, (meta["x_min"], meta["y_min"], meta["cell_size"])
+
+
+def get_floor_grid(floor: int, cell_size: float = GRID_CELL_SIZE):
+    """
+    获取楼层网格（只读内存映射），进程内只加载一次
+    返回 (网格, (x_min, y_min, cell_size))
+    """
+    key = (floor, cell_size)
+    entry = _grid_store.get(key)
+    if entry is not None:
+        return entry
+
+    with _store_lock:
+        entry = _grid_store.get(key)
+        if entry is None:
+            entry = _load_persisted_grid(floor, cell_size)
+            if entry is None:
+                try:
+                    build_floor_grid(floor, cell_size)
+                    entry = _load_persisted_grid(floor, cell_size)
+                except OSError as e:
+                    # 目录不可写时退化为仅在本进程内存中使用
+                    print(f"⚠️ {floor}楼网格无法落盘：{e}")
+                    grid, origin = rasterise_floor(floor, cell_size)
+                    grid.flags.writeable = False
+                    entry = (grid, origin)
+            _grid_store[key] = entry
+    return entry
+
+
+def preload_floor_grids(cell_size: float = GRID_CELL_SIZE):
+    """启动时预加载所有楼层网格"""
+    for floor in FLOORS:
+        if os.path.exists(floor_json_path(floor)):
+            grid, _ = get_floor_grid(floor, cell_size)
+            print(f"✅ 加载 {floor}楼网格：{grid.shape}，可走比例 {grid.sum()/grid.size:.1%}")
+
+
+if __name__ == "__main__":
+    for floor in FLOORS:
+        print(f"\n构建 {floor}楼网格...")
+        grid, origin = build_floor_grid(floor)
+        print(f"  ✅ 已保存：{_grid_files(floor, GRID_CELL_SIZE)[0]}")
@@ -9,8 +9,13 @@ import math
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
 
-from app.core.config import USER_WEIGHTS, PATH_TYPE_COSTS
-from app.core.graph import HospitalGraph, build_graph_from_db
+from app.core.config import USER_WEIGHTS, CH_ENABLED
+from app.core.graph import EdgeInfo, get_shared_graph
+from app.algorithms.cost_tables import compute_edge_cost, get_cost_table
+from app.algorithms.route_table import get_route_table
+from app.algorithms.route_cache import route_cache, route_cache_key
+from app.algorithms.landmarks import get_landmark_table
+from app.algorithms.contraction import get_contraction_hierarchy
 from app.models import Location, Path
 
 @dataclass
@@ -26,79 +31,38 @@ class PathResult:
 class PathFinder:
     """智能路径查找器"""
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, use_csr: bool = False,
+                 use_route_table: bool = True, use_landmarks: bool = False,
+                 use_ch: bool = False):
         self.db = db_session
         self.graph = None
+        # 小图优先查全源路径表；查表时不做搜索，下面几个搜索选项只在不查表时生效
+        # （use_route_table=False、图超过路径表规模，或 find_path 显式指定 bidirectional）
+        self.use_csr = use_csr  # 是否在紧凑的CSR表示上搜索
+        self.use_route_table = use_route_table
+        self.use_landmarks = use_landmarks  # 用ALT地标下界代替直线距离启发式
+        self.use_ch = use_ch  # 大图上用收缩层次查询（路径表之后优先）
+        self.expanded = 0  # 最近一次字典图搜索扩展的节点数（基准测试用）
         print("🔥 PathFinder 初始化，准备构建图")
     def initialize_graph(self):
-        """初始化图结构（懒加载）"""
+        """初始化图结构（使用进程共享的只读快照，不再每次请求全表扫描）"""
         if self.graph is None:
-            self.graph = build_graph_from_db(self.db)
+            self.graph = get_shared_graph(self.db)
     
     def calculate_edge_cost(self, edge, path_obj: Path, 
                            user_type: str, preferences: List[str]) -> float:
         """计算单条边的实际代价"""
-        if path_obj is None:
-            return float('inf')
-        
-        # 基础距离
-        cost = path_obj.distance
-        
-        # 获取用户配置
-        user_config = USER_WEIGHTS.get(user_type, USER_WEIGHTS["normal"])
-        weights = user_config["weights"]
-        
-        # 根据路径类型调整代价
-        path_type = path_obj.type.lower()
-        
-        # 轮椅用户特殊处理
-        if user_type == "wheelchair":
-            if path_type == "stairs":
-                return float('inf')  # 完全不可用
-            if not path_obj.attributes.get("wheelchair_accessible", True):
-                return float('inf')
-            if path_obj.attributes.get("slope", 0) > 8.0:  # 坡度大于8%
-                cost *= weights.get("slope", 2.0)
-        
-        # 急诊患者
-        elif user_type == "emergency":
-            if path_type == "elevator":
-                wait_time = path_obj.attributes.get("average_wait_time", 0)
-                cost += wait_time * weights.get("waiting", 2.0)
-        
-        # 老年人
-        elif user_type == "elderly":
-            if path_type == "stairs":
-                cost *= weights.get("stairs", 3.0)
-        
-        # 所有用户通用的拥挤度处理
-        crowdedness = path_obj.attributes.get("crowdedness", 0)
-        if crowdedness > 0.5 and "avoid_crowds" in preferences:
-            cost *= (1 + crowdedness * 2)
-        
-        # 楼梯偏好处理
-        if path_type == "stairs":
-            if "avoid_stairs" in preferences:
-                cost *= 5.0
-            elif "use_stairs" in preferences:
-                cost *= 0.8  # 偏好楼梯的用户
-        
-        # 电梯偏好处理
-        if path_type == "elevator":
-            if "use_elevator" in preferences:
-                cost *= 0.7
-            elif "avoid_elevator" in preferences:
-                cost *= 1.5
-        
-        # 路径类型基础代价
-        type_cost = PATH_TYPE_COSTS.get(path_type, 1.0)
-        cost *= type_cost
-        
-        return cost
+        return compute_edge_cost(path_obj, user_type, preferences)
+    
+    def get_cost_table(self, user_type: str, preferences: List[str]) -> List[float]:
+        """获取当前图版本下该用户画像的预编译边代价表"""
+        self.initialize_graph()
+        return get_cost_table(self.graph, user_type, preferences)
     
     def find_path(self, start_id: int, end_id: int, 
                   user_type: str = "normal",
-                  preferences: Optional[List[str]] = None) -> PathResult:
+                  preferences: Optional[List[str]] = None,
+                  bidirectional: bool = False) -> PathResult:
         """
         使用A*算法查找最优路径
         
@@ -107,6 +71,7 @@ class PathFinder:
             end_id: 终点位置ID
             user_type: 用户类型 (wheelchair, emergency, elderly, normal, staff)
             preferences: 用户偏好列表
+            bidirectional: 使用双向A*（跨多层的长路径扩展节点更少），显式指定时不查全源路径表
             
         Returns:
             PathResult: 路径规划结果
@@ -115,93 +80,310 @@ class PathFinder:
             preferences = []
         
         self.initialize_graph()
+        locations = self.graph.locations
+        adjacency = self.graph.adjacency
+        costs = self.get_cost_table(user_type, preferences)
         
-        # 验证起点终点存在
-        start_loc = self.db.query(Location).filter(Location.id == start_id).first()
-        end_loc = self.db.query(Location).filter(Location.id == end_id).first()
+        # 验证起点终点存在（直接使用图中的位置信息，搜索过程不访问数据库）
+        start_loc = locations.get(start_id)
+        end_loc = locations.get(end_id)
         
         if not start_loc or not end_loc:
             raise ValueError("起点或终点不存在")
         
-        # 初始化数据结构
+        # 地点数较少时直接查预计算的全源路径表，O(路径长度)；显式要求双向搜索时跳过
+        if self.use_route_table and not bidirectional:
+            table = get_route_table(self.graph, user_type, preferences)
+            if table is not None:
+                path_ids, total_cost = table.lookup(start_id, end_id)
+                if not path_ids:
+                    return PathResult([], 0.0, 0, float('inf'), 0)
+                return self._build_path_result(path_ids, total_cost, user_type)
+        
+        if self.use_ch:
+            return self._find_path_ch(start_id, end_id, user_type, preferences, costs)
+        
+        landmarks = (get_landmark_table(self.graph, user_type, preferences, costs)
+                     if self.use_landmarks else None)
+        
+        if bidirectional:
+            return self._find_path_bidirectional(start_id, end_id, user_type, costs, landmarks)
+        
+        if self.use_csr:
+            return self._find_path_csr(start_id, end_id, user_type, costs, landmarks)
+        
+        # 地标下界按CSR稠密下标排列
+        bounds = landmarks.bounds_to(end_id) if landmarks else None
+        index_of = landmarks.index_of if landmarks else None
+        
+        # 初始化数据结构（堆中只放节点，路径通过 came_from 在终点处一次性回溯）
         open_set = []
-        heapq.heappush(open_set, (0, start_id, 0, [start_id]))  # (f, node, g, path)
+        heapq.heappush(open_set, (0, start_id, 0))  # (f, node, g)
         
         g_score = {start_id: 0}  # 从起点到当前节点的实际代价
-        f_score = {start_id: self._heuristic(start_loc, end_loc)}  # 总估计代价
+        came_from: Dict[int, int] = {}  # 父节点指针
         
         visited = set()
         
         while open_set:
-            current_f, current_id, current_g, current_path = heapq.heappop(open_set)
+            current_f, current_id, current_g = heapq.heappop(open_set)
             
             # 找到终点
             if current_id == end_id:
-                return self._build_path_result(current_path, current_g, user_type)
+                self.expanded = len(visited)
+                path_ids = self._reconstruct_path(came_from, end_id)
+                return self._build_path_result(path_ids, current_g, user_type)
             
             if current_id in visited:
                 continue
             visited.add(current_id)
             
-            # 获取当前节点位置信息
-            current_loc = self.db.query(Location).filter(Location.id == current_id).first()
-            if not current_loc:
-                continue
-            
-            # 遍历邻居
-            for edge in self.graph.get_neighbors(current_id):
-                if edge.get("to_id") in visited:
-                    continue
-                
-                # 获取路径详情
-                path_obj = self._get_path_between(current_id, edge.get("to_id"))
-                if not path_obj:
+            # 遍历邻居（边代价已按用户画像预编译，按边序号直接取值）
+            for to_id, _, edge_index in adjacency.get(current_id, ()):
+                if to_id in visited or edge_index < 0:
                     continue
                 
-                # 计算到邻居的实际代价
-                edge_cost = self.calculate_edge_cost(edge, path_obj, user_type, preferences)
-                if edge_cost == float('inf'):
+                edge_cost = costs[edge_index]
+                if edge_cost == math.inf:
                     continue  # 不可达
                 
                 tentative_g = current_g + edge_cost
                 
                 # 如果找到更优路径
-                if edge.get("to_id") not in g_score or tentative_g < g_score[edge.get("to_id")]:
-                    g_score[edge.get("to_id")] = tentative_g
+                if to_id not in g_score or tentative_g < g_score[to_id]:
+                    g_score[to_id] = tentative_g
+                    came_from[to_id] = current_id
                     
                     # 计算启发式代价
-                    neighbor_loc = self.db.query(Location).filter(Location.id == edge.get("to_id")).first()
-                    if neighbor_loc:
-                        h_cost = self._heuristic(neighbor_loc, end_loc)
-                        f_cost = tentative_g + h_cost
+                    if bounds is not None:
+                        f_cost = tentative_g + bounds[index_of[to_id]]
                     else:
-                        f_cost = tentative_g
+                        neighbor_loc = locations.get(to_id)
+                        if neighbor_loc:
+                            h_cost = self._heuristic(neighbor_loc, end_loc)
+                            f_cost = tentative_g + h_cost
+                        else:
+                            f_cost = tentative_g
                     
-                    f_score[edge.get("to_id")] = f_cost
-                    
-                    # 新路径
-                    new_path = current_path + [edge.get("to_id")]
-                    heapq.heappush(open_set, (f_cost, edge.get("to_id"), tentative_g, new_path))
+                    heapq.heappush(open_set, (f_cost, to_id, tentative_g))
         
         # 未找到路径
+        self.expanded = len(visited)
+        return PathResult([], 0.0, 0, float('inf'), 0)
+    
+    def planner_name(self, user_type: str = "normal", preferences: Optional[List[str]] = None,
+                     bidirectional: bool = False) -> str:
+        """find_path 按当前选项实际使用的规划器（与 find_path 中的分支顺序一致）"""
+        self.initialize_graph()
+        if (self.use_route_table and not bidirectional
+                and get_route_table(self.graph, user_type, preferences or []) is not None):
+            return "table"
+        if self.use_ch:
+            return "ch"
+        if bidirectional:
+            name = "bidirectional"
+        else:
+            name = "csr" if self.use_csr else "astar"
+        return name + "_alt" if self.use_landmarks else name
+    
+    def plan_route(self, start_id: int, end_id: int,
+                   user_type: str = "normal",
+                   preferences: Optional[List[str]] = None,
+                   bidirectional: bool = False) -> Tuple[PathResult, List[Dict]]:
+        """
+        带缓存的路径规划，返回 (PathResult, get_path_details 结果)
+        返回值可能被多个请求共享，调用方不要原地修改
+        """
+        self.initialize_graph()
+        # 键中包含实际运行的规划器：等代价路线可能不止一条，不同搜索方式返回的路线可能不同
+        planner = self.planner_name(user_type, preferences, bidirectional)
+        key = route_cache_key(f"graph_{planner}", self.graph.version, start_id, end_id,
+                              user_type, preferences)
+        cached = route_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = self.find_path(start_id, end_id, user_type, preferences, bidirectional)
+        details = self.get_path_details(result.path_ids)
+        route_cache.put(key, (result, details))
+        return result, details
+    
+    def _find_path_csr(self, start_id: int, end_id: int, user_type: str,
+                       costs: List[float], landmarks=None) -> PathResult:
+        """在CSR表示上执行A*，节点用稠密下标，g值/父指针用定长数组"""
+        csr = self.graph.to_csr()
+        index_of = csr.index_of
+        if start_id not in index_of or end_id not in index_of:
+            return PathResult([], 0.0, 0, float('inf'), 0)
+        
+        source = index_of[start_id]
+        target = index_of[end_id]
+        offsets, targets, edge_ids = csr.offsets, csr.targets, csr.edge_ids
+        xs, ys, floors = csr.xs, csr.ys, csr.floors
+        tx, ty, tf = xs[target], ys[target], floors[target]
+        bounds = landmarks.bounds_to(end_id) if landmarks else None
+        
+        n = len(csr)
+        g_score = [math.inf] * n
+        came_from = [-1] * n
+        closed = bytearray(n)
+        g_score[source] = 0
+        open_set = [(0, source, 0)]  # (f, node, g)
+        
+        while open_set:
+            _, node, current_g = heapq.heappop(open_set)
+            
+            if node == target:
+                path_ids = []
+                while node != -1:
+                    path_ids.append(csr.node_ids[node])
+                    node = came_from[node]
+                path_ids.reverse()
+                return self._build_path_result(path_ids, current_g, user_type)
+            
+            if closed[node]:
+                continue
+            closed[node] = 1
+            
+            for pos in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[pos]
+                if closed[neighbor]:
+                    continue
+                edge_index = edge_ids[pos]
+                if edge_index < 0:
+                    continue
+                edge_cost = costs[edge_index]
+                if edge_cost == math.inf:
+                    continue
+                
+                tentative_g = current_g + edge_cost
+                if tentative_g < g_score[neighbor]:
+                    g_score[neighbor] = tentative_g
+                    came_from[neighbor] = node
+                    if bounds is not None:
+                        h_cost = bounds[neighbor]
+                    else:
+                        # 与 _heuristic 相同：平面直线距离 + 每层10米
+                        dx = xs[neighbor] - tx
+                        dy = ys[neighbor] - ty
+                        h_cost = math.sqrt(dx*dx + dy*dy) + abs(floors[neighbor] - tf) * 10.0
+                    heapq.heappush(open_set, (tentative_g + h_cost, neighbor, tentative_g))
+        
         return PathResult([], 0.0, 0, float('inf'), 0)
     
-    def _get_path_between(self, start_id: int, end_id: int) -> Optional[Path]:
-        """获取两个位置之间的路径对象"""
-        return self.db.query(Path).filter(
-            ((Path.start_id == start_id) & (Path.end_id == end_id)) |
-            ((Path.start_id == end_id) & (Path.end_id == start_id))
-        ).first()
+    def _find_path_ch(self, start_id: int, end_id: int, user_type: str,
+                      preferences: List[str], costs: List[float]) -> PathResult:
+        """在收缩层次上查询：节点顺序与画像无关，首次查询某画像时定制一次边权"""
+        ch = get_contraction_hierarchy(self.graph)
+        metric = ch.metric(user_type, preferences, costs)
+        path_ids, total_cost, self.expanded = ch.query(metric, start_id, end_id)
+        if not path_ids:
+            return PathResult([], 0.0, 0, float('inf'), 0)
+        return self._build_path_result(path_ids, total_cost, user_type)
+    
+    def _find_path_bidirectional(self, start_id: int, end_id: int, user_type: str,
+                                 costs: List[float], landmarks=None) -> PathResult:
+        """
+        双向A*：正向沿出边、反向沿入边（反向邻接表）同时搜索，单向边只在各自方向上可走
+        使用平均势函数 p(v) = (h(v,终点) - h(v,起点)) / 2，正向键为 g + p，反向键为 g - p，
+        两侧都相当于在非负的约化代价上做Dijkstra，当两侧堆顶键之和 >= 当前最优相遇代价时停止；
+        每次扩展开放表较小的一侧
+        """
+        locations = self.graph.locations
+        start_loc = locations[start_id]
+        end_loc = locations[end_id]
+        if start_id == end_id:
+            return self._build_path_result([start_id], 0.0, user_type)
+        
+        potentials: Dict[int, float] = {}
+        to_end = landmarks.bounds_to(end_id) if landmarks else None
+        from_start = landmarks.bounds_from(start_id) if landmarks else None
+        
+        def potential(node_id: int) -> float:
+            p = potentials.get(node_id)
+            if p is None:
+                if to_end is not None:
+                    i = landmarks.index_of[node_id]
+                    p = (to_end[i] - from_start[i]) / 2
+                else:
+                    loc = locations.get(node_id)
+                    p = (self._heuristic(loc, end_loc) - self._heuristic(loc, start_loc)) / 2 if loc else 0.0
+                potentials[node_id] = p
+            return p
+        
+        adjacency = (self.graph.adjacency, self.graph.reverse_adjacency())
+        sign = (1.0, -1.0)
+        g_score: Tuple[Dict[int, float], Dict[int, float]] = ({start_id: 0.0}, {end_id: 0.0})
+        came_from: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        closed: Tuple[Set[int], Set[int]] = (set(), set())
+        open_sets = ([(potential(start_id), start_id)], [(-potential(end_id), end_id)])
+        best_cost, meeting = math.inf, None
+        
+        while open_sets[0] and open_sets[1]:
+            if open_sets[0][0][0] + open_sets[1][0][0] >= best_cost:
+                break
+            side = 0 if len(open_sets[0]) <= len(open_sets[1]) else 1
+            _, current_id = heapq.heappop(open_sets[side])
+            if current_id in closed[side]:
+                continue
+            closed[side].add(current_id)
+            
+            g_side, g_other = g_score[side], g_score[1 - side]
+            current_g = g_side[current_id]
+            for to_id, _, edge_index in adjacency[side].get(current_id, ()):
+                if to_id in closed[side] or edge_index < 0:
+                    continue
+                edge_cost = costs[edge_index]
+                if edge_cost == math.inf:
+                    continue
+                
+                tentative_g = current_g + edge_cost
+                if tentative_g < g_side.get(to_id, math.inf):
+                    g_side[to_id] = tentative_g
+                    came_from[side][to_id] = current_id
+                    heapq.heappush(open_sets[side], (tentative_g + sign[side] * potential(to_id), to_id))
+                    # 另一侧已到达过该节点：得到一条经过它的完整路径
+                    if to_id in g_other and tentative_g + g_other[to_id] < best_cost:
+                        best_cost = tentative_g + g_other[to_id]
+                        meeting = to_id
+        
+        self.expanded = len(closed[0]) + len(closed[1])
+        if meeting is None:
+            return PathResult([], 0.0, 0, float('inf'), 0)
+        
+        path_ids = self._reconstruct_path(came_from[0], meeting)
+        node = meeting
+        while node in came_from[1]:
+            node = came_from[1][node]
+            path_ids.append(node)
+        return self._build_path_result(path_ids, best_cost, user_type)
+    
+    @staticmethod
+    def _reconstruct_path(came_from: Dict[int, int], end_id: int) -> List[int]:
+        """沿父节点指针从终点回溯出完整路径"""
+        path_ids = [end_id]
+        while path_ids[-1] in came_from:
+            path_ids.append(came_from[path_ids[-1]])
+        path_ids.reverse()
+        return path_ids
     
-    def _heuristic(self, loc1: Location, loc2: Location) -> float:
+    def _get_path_between(self, start_id: int, end_id: int) -> Optional[EdgeInfo]:
+        """获取两个位置之间的路径边（从内存图中查找）"""
+        self.initialize_graph()
+        edge = self.graph.get_edge(start_id, end_id)
+        if edge is None:
+            edge = self.graph.get_edge(end_id, start_id)
+        return edge
+    
+    def _heuristic(self, loc1: Dict, loc2: Dict) -> float:
         """A*算法的启发式函数（三维直线距离）"""
         # 平面距离
-        dx = loc1.x - loc2.x
-        dy = loc1.y - loc2.y
+        dx = loc1["x"] - loc2["x"]
+        dy = loc1["y"] - loc2["y"]
         plane_distance = math.sqrt(dx*dx + dy*dy)
         
         # 楼层转换代价（每层按10米计算）
-        floor_diff = abs(loc1.floor - loc2.floor)
+        floor_diff = abs(loc1["floor"] - loc2["floor"])
         vertical_cost = floor_diff * 10.0
         
         return plane_distance + vertical_cost
@@ -216,14 +398,15 @@ class PathFinder:
         total_distance = 0.0
         floor_changes = 0
         
+        locations = self.graph.locations
         for i in range(len(path_ids) - 1):
             path = self._get_path_between(path_ids[i], path_ids[i+1])
             if path:
                 total_distance += path.distance
                 # 检查楼层变化
-                start_loc = self.db.query(Location).filter(Location.id == path_ids[i]).first()
-                end_loc = self.db.query(Location).filter(Location.id == path_ids[i+1]).first()
-                if start_loc and end_loc and start_loc.floor != end_loc.floor:
+                start_loc = locations.get(path_ids[i])
+                end_loc = locations.get(path_ids[i+1])
+                if start_loc and end_loc and start_loc["floor"] != end_loc["floor"]:
                     floor_changes += 1
         
         # 计算预计时间
@@ -250,68 +433,71 @@ class PathFinder:
         if not path_ids:
             return details
         
-        last_loc = self.db.query(Location).filter(Location.id == path_ids[-1]).first()
-        target_floor = last_loc.floor if last_loc else 0
+        self.initialize_graph()
+        locations = self.graph.locations
+        
+        last_loc = locations.get(path_ids[-1])
+        target_floor = last_loc["floor"] if last_loc else 0
         transfer_added = False
         
         for i, loc_id in enumerate(path_ids):
             
-            location = self.db.query(Location).filter(Location.id == loc_id).first()
+            location = locations.get(loc_id)
             if not location:
                 continue
                 
             if i == 0:
                 details.append({
-                    "x": location.x,
-                    "y": location.y,
-                    "floor": location.floor,
+                    "x": location["x"],
+                    "y": location["y"],
+                    "floor": location["floor"],
                     "type": "start",
-                    "description": f"从{getattr(location, 'name', '未知')}出发"
+                    "description": f"从{location.get('name', '未知')}出发"
                 })
             elif i == len(path_ids) - 1:
                 details.append({
-                    "x": location.x,
-                    "y": location.y,
-                    "floor": location.floor,
+                    "x": location["x"],
+                    "y": location["y"],
+                    "floor": location["floor"],
                     "type": "end",
-                    "description": f"到达{getattr(location, 'name', '未知')}"
+                    "description": f"到达{location.get('name', '未知')}"
                 })
             else:
-                prev_loc = self.db.query(Location).filter(Location.id == path_ids[i-1]).first()
-                if prev_loc and prev_loc.floor != location.floor:
-                    if location.type in ["elevator", "stairs"] and not transfer_added:
+                prev_loc = locations.get(path_ids[i-1])
+                if prev_loc and prev_loc["floor"] != location["floor"]:
+                    if location["type"] in ["elevator", "stairs"] and not transfer_added:
                         details.append({
-                            "x": prev_loc.x,
-                            "y": prev_loc.y,
-                            "floor": prev_loc.floor,
+                            "x": prev_loc["x"],
+                            "y": prev_loc["y"],
+                            "floor": prev_loc["floor"],
                             "type": "transfer",
-                            "description": f"乘坐{location.type}到{target_floor}楼"
+                            "description": f"乘坐{location['type']}到{target_floor}楼"
                         })
                         transfer_added = True
-                    elif location.type not in ["elevator", "stairs"] and location.floor == target_floor:
+                    elif location["type"] not in ["elevator", "stairs"] and location["floor"] == target_floor:
                         details.append({
-                            "x": location.x,
-                            "y": location.y,
-                            "floor": location.floor,
+                            "x": location["x"],
+                            "y": location["y"],
+                            "floor": location["floor"],
                             "type": "transfer",
-                            "description": f"到达{location.floor}楼"
+                            "description": f"到达{location['floor']}楼"
                         })
                         details.append({
-                            "x": location.x,
-                            "y": location.y,
-                            "floor": location.floor,
+                            "x": location["x"],
+                            "y": location["y"],
+                            "floor": location["floor"],
                             "type": "waypoint",
-                            "description": f"经过{getattr(location, 'name', '未知')}"
+                            "description": f"经过{location.get('name', '未知')}"
                         })
-                elif location.type not in ["elevator", "stairs"]:
+                elif location["type"] not in ["elevator", "stairs"]:
                     last_point = details[-1] if details else None
-                    if not last_point or last_point.get("description") != f"经过{location.name}":
+                    if not last_point or last_point.get("description") != f"经过{location['name']}":
                         details.append({
-                            "x": location.x,
-                            "y": location.y,
-                            "floor": location.floor,
+                            "x": location["x"],
+                            "y": location["y"],
+                            "floor": location["floor"],
                             "type": "waypoint",
-                            "description": f"经过{location.name}"
+                            "description": f"经过{location['name']}"
                         })
         
           
@@ -373,4 +559,4 @@ class PathFinder:
 # 工具函数
 def create_path_finder(db_session: Session) -> PathFinder:
     """创建路径查找器实例"""
-    return PathFinder(db_session)
\ No newline at end of file
+    return PathFinder(db_session, use_ch=CH_ENABLED)
\ No newline at end of file
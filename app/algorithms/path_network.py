@@ -0,0 +1,110 @@
+"""
+路网构建的公共部分（build_navigation_grid / build_correct_paths / build_network 共用）
+楼层计算只依赖地点快照（LocationRecord），不访问数据库，可以放到子进程中执行，结果是边列表；
+写入方用内存中的已有边集合去重，批量插入 Path 行，垂直连接最后添加
+"""
+
+from collections import namedtuple
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.models import Location, Path
+
+# 地点快照：可以在进程间传递
+LocationRecord = namedtuple("LocationRecord", ["id", "name", "type", "x", "y", "floor"])
+
+# 楼层计算结果中的一条边：(端点1, 端点2, 距离(米))，端点为地点ID或新道路点的 key
+Edge = Tuple[Hashable, Hashable, float]
+
+
+def location_records(db, floors: Optional[Iterable[int]] = None) -> Dict[int, List[LocationRecord]]:
+    """按楼层读取地点快照"""
+    query = db.query(Location)
+    if floors is not None:
+        query = query.filter(Location.floor.in_(list(floors)))
+    records: Dict[int, List[LocationRecord]] = {}
+    for loc in query.order_by(Location.id):
+        records.setdefault(loc.floor, []).append(
+            LocationRecord(loc.id, loc.name, loc.type, loc.x, loc.y, loc.floor))
+    return records
+
+
+def load_edge_set(db) -> Set[Tuple[int, int]]:
+    """数据库中已有的 (start_id, end_id)，一次查询读入内存"""
+    return {(start_id, end_id) for start_id, end_id in db.query(Path.start_id, Path.end_id)}
+
+
+def new_path_rows(edges: Iterable[Edge], existing: Set[Tuple[int, int]],
+                  path_type: str = "corridor") -> List[Dict]:
+    """把尚不存在的边展开成双向的 Path 行，并记入 existing"""
+    rows = []
+    for id1, id2, distance in edges:
+        if (id1, id2) in existing or (id2, id1) in existing:
+            continue
+        existing.add((id1, id2))
+        existing.add((id2, id1))
+        rows.append({"start_id": id1, "end_id": id2, "distance": distance, "type": path_type})
+        rows.append({"start_id": id2, "end_id": id1, "distance": distance, "type": path_type})
+    return rows
+
+
+def write_floor_paths(db, new_nodes: List[Dict], edges: List[Edge],
+                      existing: Set[Tuple[int, int]]) -> int:
+    """
+    写入一层的计算结果（不提交）：先插入新道路点换回ID，再批量插入边，返回新增的路径条数
+    new_nodes 中每项为 Location 字段加上 "key"，edges 中的端点可以是这些 key
+    """
+    ids = {}
+    if new_nodes:
+        created = [(node["key"], Location(**{k: v for k, v in node.items() if k != "key"}))
+                   for node in new_nodes]
+        db.add_all([loc for _, loc in created])
+        db.flush()
+        ids = {key: loc.id for key, loc in created}
+
+    resolved = [(ids.get(a, a), ids.get(b, b), distance) for a, b, distance in edges]
+    rows = new_path_rows(resolved, existing)
+    db.bulk_insert_mappings(Path, rows)
+    return len(rows)
+
+
+def add_vertical_connections(db, existing: Optional[Set[Tuple[int, int]]] = None, commit=True):
+    """添加垂直连接（楼梯和电梯）；existing 为已有边集合，为空时从数据库读取"""
+    print("\n处理垂直连接...")
+
+    # 获取所有楼梯和电梯
+    vertical_locs = db.query(Location).filter(Location.type.in_(["stairs", "elevator"])).all()
+
+    if existing is None:
+        existing = load_edge_set(db)
+
+    # 按类型和大致位置分组
+    rows = []
+    for loc_type in ["stairs", "elevator"]:
+        type_locs = [loc for loc in vertical_locs if loc.type == loc_type]
+
+        # 按坐标的整数部分分组（同一部楼梯/电梯）
+        groups = {}
+        for loc in type_locs:
+            key = f"{round(loc.x)}_{round(loc.y)}"
+            if key not in groups:
+                groups[key] = []
+            groups[key].append(loc)
+
+        # 每组内连接所有楼层
+        for key, group in groups.items():
+            group.sort(key=lambda x: x.floor)
+            for i in range(len(group)-1):
+                loc1 = group[i]
+                loc2 = group[i+1]
+
+                distance = 3.0  # 层高
+                added = new_path_rows([(loc1.id, loc2.id, distance)], existing, loc_type)
+                if added:
+                    rows.extend(added)
+                    print(f"  添加: {loc1.name} ↔ {loc2.name}")
+
+    db.bulk_insert_mappings(Path, rows)
+    if commit:
+        db.commit()
+    print(f"  ✅ 添加了 {len(rows)} 条垂直连接")
+    return len(rows)
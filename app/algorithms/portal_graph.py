@@ -0,0 +1,149 @@
+"""
+跨楼层分层规划
+楼梯/电梯口（垂直通道口）作为抽象图的节点：每个通道口预先算好整层的距离场并缓存，
+同层通道口之间的网格距离直接从距离场读取，同一部楼梯/电梯的相邻楼层之间按层高连接。
+跨楼层查询时，起终点各从距离场读出到本层通道口的距离，在抽象图上做一次小规模Dijkstra，
+选出全局最优的通道口序列；各段局部路径沿对应通道口的距离场下降得到，不需要再做网格搜索
+"""
+
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import FLOOR_HEIGHT, PATH_TYPE_COSTS, PORTAL_GRAPH_CACHE_SIZE
+from app.core.graph import graph_registry
+from app.models import Location
+from app.algorithms.grid_search import distance_field, field_value
+
+PORTAL_TYPES = ("stairs", "elevator")
+
+
+class Portal:
+    """一个楼层上的楼梯/电梯口"""
+
+    __slots__ = ("id", "name", "type", "floor", "x", "y", "index")
+
+    def __init__(self, location: Location, index: int):
+        self.id = location.id
+        self.name = location.name
+        self.type = location.type
+        self.floor = location.floor
+        self.x = location.x
+        self.y = location.y
+        self.index = index  # 补边网格中的展平下标
+
+
+class PortalGraph:
+    """
+    通道口抽象图
+    fields: 通道口ID -> 本层距离场（补边展平，单位为格子）
+    edges: 通道口ID -> [(相邻通道口ID, 代价(米)), ...]
+    """
+
+    def __init__(self, finder, locations: List[Location]):
+        self.cell_size = finder.cell_size
+        self.padded = {}
+        self.portals: Dict[int, Portal] = {}
+        self.by_floor: Dict[int, List[Portal]] = {}
+        for loc in locations:
+            if loc.floor not in self.padded:
+                finder.load_grid(loc.floor)
+                self.padded[loc.floor] = finder._padded_grid(loc.floor)
+            portal = Portal(loc, finder.locate(loc))
+            self.portals[portal.id] = portal
+            self.by_floor.setdefault(portal.floor, []).append(portal)
+
+        self.fields: Dict[int, np.ndarray] = {}
+        self.edges: Dict[int, List[Tuple[int, float]]] = {pid: [] for pid in self.portals}
+        for floor, portals in self.by_floor.items():
+            padded = self.padded[floor]
+            for portal in portals:
+                field = distance_field(padded, portal.index)
+                self.fields[portal.id] = field
+                for other in portals:
+                    if other.id == portal.id:
+                        continue
+                    cells = field_value(padded, field, other.index)
+                    if cells < math.inf:
+                        self.edges[portal.id].append((other.id, cells * self.cell_size))
+
+        # 同一部楼梯/电梯：按类型和坐标取整分组（与 add_vertical_connections 一致），相邻楼层相连
+        shafts: Dict[Tuple[str, int, int], List[Portal]] = {}
+        for portal in self.portals.values():
+            shafts.setdefault((portal.type, round(portal.x), round(portal.y)), []).append(portal)
+        for (portal_type, _, _), group in shafts.items():
+            group.sort(key=lambda p: p.floor)
+            for lower, upper in zip(group, group[1:]):
+                cost = FLOOR_HEIGHT * (upper.floor - lower.floor) * PATH_TYPE_COSTS.get(portal_type, 1.0)
+                self.edges[lower.id].append((upper.id, cost))
+                self.edges[upper.id].append((lower.id, cost))
+
+    def nbytes(self) -> int:
+        return sum(field.nbytes for field in self.fields.values())
+
+    def distance_to(self, portal_id: int, index: int) -> float:
+        """同层某格子到通道口的网格距离（米）"""
+        portal = self.portals[portal_id]
+        return field_value(self.padded[portal.floor], self.fields[portal_id], index) * self.cell_size
+
+    def route(self, start_floor: int, start_index: int,
+              end_floor: int, end_index: int) -> Optional[Tuple[float, List[int]]]:
+        """
+        在抽象图上求起点到终点的最优通道口序列
+        返回 (总代价(米), [通道口ID, ...])，不可达时返回 None
+        """
+        dist: Dict[int, float] = {}
+        parent: Dict[int, int] = {}
+        open_set = []
+        for portal in self.by_floor.get(start_floor, []):
+            d = self.distance_to(portal.id, start_index)
+            if d < math.inf:
+                dist[portal.id] = d
+                heapq.heappush(open_set, (d, portal.id))
+
+        exits = {}
+        for portal in self.by_floor.get(end_floor, []):
+            d = self.distance_to(portal.id, end_index)
+            if d < math.inf:
+                exits[portal.id] = d
+
+        best_total, best_exit = math.inf, None
+        while open_set:
+            d, pid = heapq.heappop(open_set)
+            if d > dist[pid]:
+                continue
+            if d >= best_total:
+                break
+            if pid in exits and d + exits[pid] < best_total:
+                best_total, best_exit = d + exits[pid], pid
+            for nid, cost in self.edges[pid]:
+                nd = d + cost
+                if nd < dist.get(nid, math.inf):
+                    dist[nid] = nd
+                    parent[nid] = pid
+                    heapq.heappush(open_set, (nd, nid))
+
+        if best_exit is None:
+            return None
+        sequence = [best_exit]
+        while sequence[-1] in parent:
+            sequence.append(parent[sequence[-1]])
+        sequence.reverse()
+        return best_total, sequence
+
+
+# 键为 (网格大小, 地图版本)：地图数据变化后调用 /graph/refresh 使地图版本递增，抽象图随之重建
+# （拥挤度更新只影响边代价，不影响网格距离，不会触发重建）
+_portal_graphs = LRUCache(PORTAL_GRAPH_CACHE_SIZE)
+
+
+def get_portal_graph(finder) -> PortalGraph:
+    """获取（必要时构建）当前图版本对应的通道口抽象图"""
+    def build():
+        locations = finder.db.query(Location).filter(Location.type.in_(PORTAL_TYPES)).all()
+        return PortalGraph(finder, locations)
+
+    return _portal_graphs.get_or_create((finder.cell_size, graph_registry.map_version), build)
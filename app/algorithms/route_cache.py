@@ -0,0 +1,20 @@
+"""
+路径结果缓存
+同一起终点、同一用户画像的规划结果在TTL内直接复用；
+缓存键包含图版本号，图重建（地图或拥挤度变化）后旧结果自然失效
+"""
+
+from typing import Hashable, List, Optional, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL
+from app.algorithms.cost_tables import profile_key
+
+route_cache = LRUCache(ROUTE_CACHE_SIZE, ttl=ROUTE_CACHE_TTL)
+
+
+def route_cache_key(kind: str, graph_version: int, start_id: int, end_id: int,
+                    user_type: str = "normal",
+                    preferences: Optional[List[str]] = None) -> Tuple[Hashable, ...]:
+    """构造缓存键：(规划器类型, 图版本, 起点, 终点, 用户类型, 归一化偏好)"""
+    return (kind, graph_version, start_id, end_id, *profile_key(user_type, preferences))
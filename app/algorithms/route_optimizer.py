@@ -0,0 +1,180 @@
+"""
+多目的地访问顺序优化
+患者通常有一组无序的检查点（抽血、B超、取药），第一个点（当前位置）固定，最后一个点可选固定。
+先一次性算出所有检查点两两之间的代价矩阵（每个点在CSR图上做一次一对多 dijkstra_many，小图直接查全源路径表），
+再求访问顺序：不超过 EXACT_ORDER_MAX_STOPS 个点用 Held-Karp 动态规划求精确解，
+更多时用最近邻构造 + 2-opt 局部改进
+有检查点无法从其他任何检查点到达，或找不到代价有限的顺序时抛出 ValueError
+"""
+
+import math
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.algorithms.route_table import get_route_table
+
+EXACT_ORDER_MAX_STOPS = 10
+
+
+def cost_matrix(finder, stop_ids: List[int], user_type: str = "normal",
+                preferences: Optional[List[str]] = None) -> np.ndarray:
+    """
+    检查点两两之间的最小代价矩阵，matrix[i, j] 为 stop_ids[i] -> stop_ids[j]，不可达为 inf
+    finder 为 PathFinder，使用它的共享图和用户画像代价表
+    """
+    finder.initialize_graph()
+    graph = finder.graph
+    n = len(stop_ids)
+    matrix = np.full((n, n), np.inf)
+
+    table = get_route_table(graph, user_type, preferences) if finder.use_route_table else None
+    if table is not None:
+        rows = [table.index_of.get(sid) for sid in stop_ids]
+        for i, ri in enumerate(rows):
+            for j, rj in enumerate(rows):
+                if ri is not None and rj is not None:
+                    matrix[i, j] = table.dist[ri, rj]
+        return matrix
+
+    costs = finder.get_cost_table(user_type, preferences or [])
+    csr = graph.to_csr()
+    for i, sid in enumerate(stop_ids):
+        found = csr.dijkstra_many(sid, stop_ids, costs)
+        for j, tid in enumerate(stop_ids):
+            if tid in found:
+                matrix[i, j] = found[tid][1]
+    return matrix
+
+
+def _tour_cost(matrix: np.ndarray, order: List[int]) -> float:
+    return float(sum(matrix[a, b] for a, b in zip(order, order[1:])))
+
+
+def _unreachable_stop(matrix: np.ndarray) -> Optional[int]:
+    """第一个无法从其他任何检查点到达的检查点下标（起点除外），都可到达时返回 None"""
+    n = len(matrix)
+    for k in range(1, n):
+        if not any(math.isfinite(matrix[i, k]) for i in range(n) if i != k):
+            return k
+    return None
+
+
+def _held_karp(matrix: np.ndarray, fix_last: bool) -> List[int]:
+    """
+    精确求解：从 0 出发访问全部点的最小代价顺序（fix_last 时最后一个点固定为 n-1）
+    dp[(mask, j)] 为访问了 mask 中的点且停在 j 的最小代价
+    """
+    n = len(matrix)
+    free = list(range(1, n - 1)) if fix_last else list(range(1, n))
+    if not free:
+        return [0, n - 1] if fix_last and n > 1 else [0]
+
+    bit = {node: 1 << k for k, node in enumerate(free)}
+    dp: Dict[Tuple[int, int], float] = {}
+    parent: Dict[Tuple[int, int], int] = {}
+    for node in free:
+        dp[(bit[node], node)] = matrix[0, node]
+        parent[(bit[node], node)] = 0
+
+    for size in range(2, len(free) + 1):
+        for subset in combinations(free, size):
+            mask = 0
+            for node in subset:
+                mask |= bit[node]
+            for last in subset:
+                prev_mask = mask ^ bit[last]
+                best, best_prev = math.inf, -1
+                for prev in subset:
+                    if prev == last:
+                        continue
+                    cost = dp[(prev_mask, prev)] + matrix[prev, last]
+                    if cost < best:
+                        best, best_prev = cost, prev
+                dp[(mask, last)] = best
+                parent[(mask, last)] = best_prev
+
+    full = (1 << len(free)) - 1
+    tail_cost = (lambda j: matrix[j, n - 1]) if fix_last else (lambda j: 0.0)
+    last = min(free, key=lambda j: dp[(full, j)] + tail_cost(j))
+    if not math.isfinite(dp[(full, last)] + tail_cost(last)):
+        # 各点单独可达，但不存在走完全部检查点的顺序（此时回溯会遇到没有前驱的状态）
+        raise ValueError("找不到能依次到达全部检查点的顺序")
+
+    order = []
+    mask = full
+    while last != 0:
+        order.append(last)
+        prev = parent[(mask, last)]
+        mask ^= bit[last]
+        last = prev
+    order.append(0)
+    order.reverse()
+    if fix_last:
+        order.append(n - 1)
+    return order
+
+
+def _nearest_neighbor_2opt(matrix: np.ndarray, fix_last: bool) -> List[int]:
+    """启发式：最近邻构造初始顺序，再做 2-opt（代价可能不对称，每次按整条路线重新计算）"""
+    n = len(matrix)
+    unvisited = set(range(1, n - 1) if fix_last else range(1, n))
+    order = [0]
+    while unvisited:
+        current = order[-1]
+        nxt = min(unvisited, key=lambda j: (matrix[current, j], j))
+        order.append(nxt)
+        unvisited.discard(nxt)
+    if fix_last:
+        order.append(n - 1)
+
+    # 起点固定；fix_last 时终点也固定
+    hi = len(order) - 1 if fix_last else len(order)
+    best = _tour_cost(matrix, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, hi - 1):
+            for j in range(i + 1, hi):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = _tour_cost(matrix, candidate)
+                if cost < best - 1e-9:
+                    order, best = candidate, cost
+                    improved = True
+    return order
+
+
+def solve_order(matrix: np.ndarray, fix_last: bool = False,
+                labels: Optional[List] = None) -> Tuple[List[int], float]:
+    """
+    根据代价矩阵求访问顺序（下标列表，第一个固定为 0），返回 (顺序, 总代价)
+    有检查点不可达时抛出 ValueError，labels 为错误信息中检查点的名称（默认用下标）
+    """
+    n = len(matrix)
+    unreachable = _unreachable_stop(matrix)
+    if unreachable is not None:
+        name = labels[unreachable] if labels is not None else unreachable
+        raise ValueError(f"检查点 {name} 无法从其他检查点到达")
+    if n <= 2:
+        order = list(range(n))
+    elif n <= EXACT_ORDER_MAX_STOPS:
+        order = _held_karp(matrix, fix_last)
+    else:
+        order = _nearest_neighbor_2opt(matrix, fix_last)
+    total = _tour_cost(matrix, order)
+    if not math.isfinite(total):
+        raise ValueError("找不到能依次到达全部检查点的顺序")
+    return order, total
+
+
+def optimize_order(finder, stop_ids: List[int], user_type: str = "normal",
+                   preferences: Optional[List[str]] = None,
+                   fix_last: bool = False) -> Tuple[List[int], float]:
+    """
+    优化检查点的访问顺序：stop_ids[0] 为起点（固定），fix_last 时 stop_ids[-1] 也固定
+    返回 (按访问顺序排列的位置ID, 总代价)；有检查点不可达时抛出 ValueError
+    """
+    matrix = cost_matrix(finder, stop_ids, user_type, preferences)
+    order, total = solve_order(matrix, fix_last, labels=stop_ids)
+    return [stop_ids[i] for i in order], total
@@ -0,0 +1,153 @@
+"""
+全源最短路表
+地点数量只有几百个时，按用户画像预先计算所有点对的距离矩阵和下一跳矩阵，
+查询时沿下一跳回溯即可，复杂度为 O(路径长度)
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import (
+    USER_WEIGHTS, ROUTE_TABLE_MAX_NODES, ROUTE_TABLE_DIR, ROUTE_TABLE_CACHE_SIZE
+)
+from app.core.graph import HospitalGraph
+from app.algorithms.cost_tables import get_cost_table, profile_key
+
+# 启动时预计算的用户画像：各用户类型的无偏好画像 + 导航任务的默认偏好
+DEFAULT_PROFILES = [(user_type, prefs)
+                    for user_type in USER_WEIGHTS
+                    for prefs in ([], ["avoid_crowds", "use_elevator"])]
+
+
+class RouteTable:
+    """某个用户画像下的距离矩阵 + 下一跳矩阵"""
+
+    def __init__(self, node_ids: np.ndarray, dist: np.ndarray,
+                 next_hop: np.ndarray, fingerprint: str):
+        self.node_ids = node_ids
+        self.dist = dist
+        self.next_hop = next_hop
+        self.fingerprint = fingerprint
+        self.index_of = {int(nid): i for i, nid in enumerate(node_ids)}
+
+    def lookup(self, start_id: int, end_id: int) -> Tuple[List[int], float]:
+        """查询最短路径，返回 (节点ID列表, 总代价)；不可达时返回 ([], inf)"""
+        i = self.index_of.get(start_id)
+        j = self.index_of.get(end_id)
+        if i is None or j is None:
+            return [], float('inf')
+        cost = float(self.dist[i, j])
+        if cost == float('inf'):
+            return [], cost
+
+        path_ids = [start_id]
+        while i != j:
+            i = int(self.next_hop[i, j])
+            if i < 0:
+                return [], float('inf')
+            path_ids.append(int(self.node_ids[i]))
+        return path_ids, cost
+
+    def save(self, file_path: str):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        np.savez_compressed(file_path, node_ids=self.node_ids, dist=self.dist,
+                            next_hop=self.next_hop, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, file_path: str) -> "RouteTable":
+        with np.load(file_path) as data:
+            return cls(data["node_ids"], data["dist"], data["next_hop"], str(data["fingerprint"]))
+
+
+def build_route_table(graph: HospitalGraph, user_type: str,
+                      preferences=None) -> RouteTable:
+    """用向量化的 Floyd–Warshall 计算全源最短路"""
+    costs = get_cost_table(graph, user_type, preferences)
+    node_ids = np.array(sorted(graph.adjacency), dtype=np.int64)
+    index_of = {int(nid): i for i, nid in enumerate(node_ids)}
+    n = len(node_ids)
+
+    dist = np.full((n, n), np.inf)
+    next_hop = np.full((n, n), -1, dtype=np.int32)
+    np.fill_diagonal(dist, 0.0)
+    np.fill_diagonal(next_hop, np.arange(n, dtype=np.int32))
+
+    for start_id, neighbors in graph.adjacency.items():
+        i = index_of[start_id]
+        for to_id, _, edge_index in neighbors:
+            j = index_of.get(to_id)
+            if j is None or edge_index < 0:
+                continue
+            cost = costs[edge_index]
+            if cost < dist[i, j]:
+                dist[i, j] = cost
+                next_hop[i, j] = j
+
+    # 预分配临时矩阵，循环内全部原地运算
+    via_k = np.empty_like(dist)
+    better = np.empty((n, n), dtype=bool)
+    for k in range(n):
+        np.add(dist[:, k, None], dist[None, k, :], out=via_k)
+        np.less(via_k, dist, out=better)
+        np.copyto(dist, via_k, where=better)
+        np.copyto(next_hop, next_hop[:, k, None], where=better)
+
+    return RouteTable(node_ids, dist, next_hop, graph.fingerprint())
+
+
+def _table_file(user_type: str, preferences, directory: str) -> str:
+    user_type, prefs = profile_key(user_type, preferences)
+    name = "__".join([user_type, *prefs])
+    return os.path.join(directory, f"{name}.npz")
+
+
+# 内存中的路径表，键为 (图指纹, 用户画像)
+_route_tables = LRUCache(ROUTE_TABLE_CACHE_SIZE)
+
+
+def get_route_table(graph: HospitalGraph, user_type: str,
+                    preferences=None, build: bool = True) -> Optional[RouteTable]:
+    """获取当前图的路径表；图太大时返回 None，由调用方回退到A*"""
+    if len(graph.adjacency) > ROUTE_TABLE_MAX_NODES:
+        return None
+    key = (graph.fingerprint(), profile_key(user_type, preferences))
+    table = _route_tables.get(key)
+    if table is None and build:
+        table = build_route_table(graph, user_type, preferences)
+        _route_tables.put(key, table)
+    return table
+
+
+def precompute_route_tables(graph: HospitalGraph,
+                            profiles: Optional[List[Tuple[str, List[str]]]] = None,
+                            directory: str = ROUTE_TABLE_DIR) -> int:
+    """
+    启动时调用：优先从磁盘加载，指纹不一致（paths 已变化）时重新计算并覆盖
+    返回重新计算的表数量
+    """
+    if len(graph.adjacency) > ROUTE_TABLE_MAX_NODES:
+        print(f"⚠️ 地点数 {len(graph.adjacency)} 超过 {ROUTE_TABLE_MAX_NODES}，跳过全源路径表")
+        return 0
+
+    profiles = profiles or DEFAULT_PROFILES
+    fingerprint = graph.fingerprint()
+    rebuilt = 0
+    for user_type, preferences in profiles:
+        file_path = _table_file(user_type, preferences, directory)
+        table = None
+        if os.path.exists(file_path):
+            try:
+                table = RouteTable.load(file_path)
+            except Exception as e:
+                print(f"❌ 路径表读取失败 {file_path}: {e}")
+        if table is None or table.fingerprint != fingerprint:
+            table = build_route_table(graph, user_type, preferences)
+            table.save(file_path)
+            rebuilt += 1
+        _route_tables.put((fingerprint, profile_key(user_type, preferences)), table)
+
+    print(f"✅ 全源路径表就绪：{len(profiles)}个画像，重新计算{rebuilt}个")
+    return rebuilt
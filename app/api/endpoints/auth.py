@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
@@ -8,7 +10,7 @@ from fastapi.security import OAuth2PasswordBearer
 
 from app.models import User
 from app.schemas import UserResponse
-from app.database import get_db
+from app.database import get_async_db
 
 router = APIRouter()
 
@@ -48,7 +50,7 @@ def get_password_hash(password):
 # ============ 认证依赖 ============
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,7 +69,7 @@ async def get_current_user(
     except (JWTError, ValueError) as e:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
     
@@ -77,13 +79,13 @@ async def get_current_user(
 @router.post("/auth/login")
 async def login_user(
     user: UserCreate,
-    db: Session = Depends(get_db)  # 🔧 修复1：使用依赖注入
+    db: AsyncSession = Depends(get_async_db)  # 🔧 修复1：使用依赖注入
 ):
     # 1. 根据用户名查找用户
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user.username))
     
-    # 2. 验证用户是否存在和密码是否正确
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    # 2. 验证用户是否存在和密码是否正确（bcrypt 校验较慢，放到线程池执行）
+    if not db_user or not await run_in_threadpool(verify_password, user.password, db_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -103,10 +105,10 @@ async def login_user(
 @router.post("/auth/register")
 async def register_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -116,13 +118,13 @@ async def register_user(
     # 创建新用户
     new_user = User(
         username=user.username,
-        hashed_password=get_password_hash(user.password)
+        hashed_password=await run_in_threadpool(get_password_hash, user.password)
     )
     
     # 保存到数据库
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return {
         "message": "用户注册成功",
@@ -135,7 +137,7 @@ async def register_user(
 async def get_user_info(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户信息（需要登录）
@@ -147,7 +149,7 @@ async def get_user_info(
             detail="只能查看自己的用户信息"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
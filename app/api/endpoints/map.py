@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import math
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import Location
-from app.schemas import LocationResponse, PathPlanRequest
-from app.algorithms.grid_pathfinder import GridPathFinder
+from app.schemas import LocationResponse, PathPlanRequest, CongestionBatchRequest
+from app.algorithms.grid_pathfinder import GridPathFinder, GRID_ALGORITHMS
+from app.core.graph import graph_registry
+from app.algorithms.route_table import precompute_route_tables
+from app.algorithms.contraction import precompute_contraction_hierarchy
+from app.core.config import CH_ENABLED, ROUTE_TABLE_MAX_NODES
+from app.algorithms.route_cache import route_cache, route_cache_key
+from app.algorithms.distance_fields import field_stats
+from app.algorithms.congestion import apply_congestion_updates, congestion_writer
 
 router = APIRouter()
 
@@ -14,28 +23,76 @@ router = APIRouter()
 async def get_locations(
     floor: Optional[int] = None,
     type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Location)
+    query = select(Location)
     if floor:
-        query = query.filter(Location.floor == floor)
+        query = query.where(Location.floor == floor)
     if type:
-        query = query.filter(Location.type == type)
-    return query.all()
+        query = query.where(Location.type == type)
+    return (await db.scalars(query)).all()
 
 @router.get("/locations/{location_id}", response_model=LocationResponse)
-async def get_location_detail(location_id: int, db: Session = Depends(get_db)):
-    location = db.query(Location).filter(Location.id == location_id).first()
+async def get_location_detail(location_id: int, db: AsyncSession = Depends(get_async_db)):
+    location = await db.get(Location, location_id)
     if not location:
         raise HTTPException(status_code=404, detail="位置不存在")
     return location
 
+# 以下接口主要是CPU密集的路径规划，使用普通 def：FastAPI 放到线程池执行，不占用事件循环
+@router.get("/nearest")
+def find_nearest(
+    type: str,
+    from_id: int = Query(..., alias="from"),
+    user_type: str = "normal",
+    limit: int = Query(1, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """
+    查找离某位置最近的指定类型地点（如 ?type=restroom&from=12）
+    在共享图上做一次一对多Dijkstra，确定 limit 个最近目标后即停止
+    """
+    origin = db.query(Location).filter(Location.id == from_id).first()
+    if not origin:
+        raise HTTPException(status_code=404, detail="位置不存在")
+    candidates = {loc.id: loc for loc in db.query(Location).filter(Location.type == type).all()}
+    # 起点本身是该类型时不算作结果（否则总是以代价0返回自己）
+    candidates.pop(from_id, None)
+    if not candidates:
+        raise HTTPException(status_code=404, detail=f"没有类型为 {type} 的地点")
+
+    from app.algorithms import create_path_finder
+    finder = create_path_finder(db)
+    costs = finder.get_cost_table(user_type, [])
+    found = finder.graph.dijkstra_many(from_id, candidates, costs, limit=limit)
+
+    results = []
+    for loc_id, (path_ids, cost) in sorted(found.items(), key=lambda item: item[1][1]):
+        loc = candidates[loc_id]
+        results.append({
+            "location_id": loc.id,
+            "name": loc.name,
+            "floor": loc.floor,
+            "cost": round(cost, 2),
+            "path_ids": path_ids
+        })
+    return {"from": from_id, "type": type, "user_type": user_type, "results": results}
+
 @router.post("/plan")
-async def plan_path(request: PathPlanRequest, db: Session = Depends(get_db)):
+def plan_path(request: PathPlanRequest, db: Session = Depends(get_db)):
     try:
         print(f"🔍 收到请求: start_id={request.start_id}, end_id={request.end_id}")
+        if request.algorithm is not None and request.algorithm not in GRID_ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"algorithm 只支持 {', '.join(GRID_ALGORITHMS)}")
+        cache_key = route_cache_key(f"grid_{request.algorithm or 'auto'}", graph_registry.map_version,
+                                    request.start_id, request.end_id,
+                                    request.user_type, request.preferences)
+        cached = route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         finder = GridPathFinder(db)
-        path = finder.find_path(request.start_id, request.end_id)
+        path = finder.find_path(request.start_id, request.end_id, request.algorithm)
         print(f"🔍 find_path 返回: {path}")
         
         if not path:
@@ -70,7 +127,7 @@ async def plan_path(request: PathPlanRequest, db: Session = Depends(get_db)):
             x2, y2, _ = path[i+1]
             total_distance += math.sqrt((x2-x1)**2 + (y2-y1)**2)
         
-        return {
+        response = {
             "success": True,
             "path": path_points,
             "total_distance": round(total_distance, 2),
@@ -78,8 +135,51 @@ async def plan_path(request: PathPlanRequest, db: Session = Depends(get_db)):
             "floor_changes": 0,
             "instructions": []
         }
+        route_cache.put(cache_key, response)
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/graph/status")
+async def get_graph_status():
+    """查看共享路径图的版本和构建状态"""
+    return graph_registry.status()
+
+@router.post("/graph/refresh")
+def refresh_graph(db: Session = Depends(get_db)):
+    """地图数据（locations/paths）变化后调用，使共享图失效并立即重建"""
+    graph_registry.invalidate()
+    graph = graph_registry.get_graph(db)
+    # paths 变化后图指纹改变，旧的全源路径表自动失效，这里重新计算并落盘
+    precompute_route_tables(graph)
+    if CH_ENABLED and len(graph.adjacency) > ROUTE_TABLE_MAX_NODES:
+        precompute_contraction_hierarchy(graph)
+    return {"success": True, **graph_registry.status()}
+
+@router.post("/paths/congestion")
+def update_congestion(request: CongestionBatchRequest, db: Session = Depends(get_db)):
+    """批量更新路径实时拥挤度：原地修补内存中的边代价并递增图版本，数据库由后台分批写回"""
+    updates = {}
+    for item in request.updates:
+        if item.crowdedness is not None and not 0 <= item.crowdedness <= 1:
+            raise HTTPException(status_code=400, detail=f"路径 {item.path_id} 的 crowdedness 应在 0~1 之间")
+        if item.average_wait_time is not None and item.average_wait_time < 0:
+            raise HTTPException(status_code=400, detail=f"路径 {item.path_id} 的 average_wait_time 不能为负")
+        updates.setdefault(item.path_id, {}).update(
+            {"crowdedness": item.crowdedness, "average_wait_time": item.average_wait_time})
+    return {"success": True, **apply_congestion_updates(db, updates)}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """路径结果缓存、热门目的地距离场缓存的命中/未命中统计"""
+    return {
+        "graph_version": graph_registry.version,
+        "route_cache": route_cache.stats(),
+        "distance_fields": field_stats(),
+        "congestion_writer": congestion_writer.stats()
+    }
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 import json
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import NavigationTask, User, Location, Robot
 from app.schemas import NavigationTaskResponse, NavigationRequestCreate, PathPoint
 import requests
@@ -42,9 +44,10 @@ class NavigateResponse(BaseModel):
 
 
 @router.post("/navigate", response_model=NavigateResponse)
-async def navigate(request: NavigateRequest, db: Session = Depends(get_db)):
+def navigate(request: NavigateRequest, db: Session = Depends(get_db)):
     """
     硬件语音导航接口（接入大模型）
+    调用大模型和路径规划都是阻塞操作，使用普通 def 由线程池执行
     """
     query = request.query
     current_name = request.current_location
@@ -115,7 +118,7 @@ async def navigate(request: NavigateRequest, db: Session = Depends(get_db)):
     # 路径规划
     from app.algorithms import create_path_finder
     finder = create_path_finder(db)
-    result = finder.find_path(start_loc.id, end_loc.id, "normal")
+    result, _ = finder.plan_route(start_loc.id, end_loc.id, "normal")
 
     if not result.path_ids:
         return NavigateResponse(
@@ -141,12 +144,13 @@ async def navigate(request: NavigateRequest, db: Session = Depends(get_db)):
 # ============ 原有任务管理接口 ============
 
 @router.post("/tasks", response_model=NavigationTaskResponse, status_code=status.HTTP_201_CREATED)
-async def create_navigation_task(
+def create_navigation_task(
     request: NavigationRequestCreate,
     db: Session = Depends(get_db)
 ):
     """
     创建新的导航任务 - 支持用户类型和偏好
+    路径规划是CPU密集操作，使用普通 def 由线程池执行
     """
     try:
         user = db.query(User).filter(User.id == request.user_id).first()
@@ -174,16 +178,32 @@ async def create_navigation_task(
 
         from app.algorithms import create_path_finder
         finder = create_path_finder(db)
+        preferences = list(request.preferences.keys()) if request.preferences else []
+
+        if request.optimize_order and len(locations) > 2:
+            from app.algorithms.route_optimizer import optimize_order
+            try:
+                ordered_ids, _ = optimize_order(
+                    finder, [loc.id for loc in locations], request.user_type,
+                    preferences, fix_last=request.fix_last_stop
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"无法优化访问顺序: {e}"
+                )
+            by_id = {loc.id: loc for loc in locations}
+            locations = [by_id[loc_id] for loc_id in ordered_ids]
 
         all_path_points = []
         total_distance = 0
 
         for i in range(len(locations) - 1):
-            path_result = finder.find_path(
+            path_result, segment_points = finder.plan_route(
                 start_id=locations[i].id,
                 end_id=locations[i+1].id,
                 user_type=request.user_type,
-                preferences=list(request.preferences.keys()) if request.preferences else []
+                preferences=preferences
             )
 
             if not path_result.path_ids:
@@ -192,7 +212,6 @@ async def create_navigation_task(
                     detail=f"无法从位置{locations[i].id}到{locations[i+1].id}规划路径"
                 )
 
-            segment_points = finder.get_path_details(path_result.path_ids)
             total_distance += path_result.total_distance
 
             if i == 0:
@@ -237,9 +256,9 @@ async def create_navigation_task(
 @router.get("/tasks/{task_id}", response_model=NavigationTaskResponse)
 async def get_navigation_task(
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    task = db.query(NavigationTask).filter(NavigationTask.id == task_id).first()
+    task = await db.get(NavigationTask, task_id)
 
     if not task:
         raise HTTPException(
@@ -256,7 +275,7 @@ async def get_navigation_task(
 
     assigned_robot = None
     if task.assigned_robot_id:
-        assigned_robot = db.query(Robot).filter(Robot.id == task.assigned_robot_id).first()
+        assigned_robot = await db.get(Robot, task.assigned_robot_id)
 
     return format_task_response(task, path_coordinates, assigned_robot)
 
@@ -265,20 +284,21 @@ async def get_navigation_task(
 async def get_user_navigation_tasks(
     user_id: int,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"用户ID {user_id} 不存在"
         )
 
-    tasks = db.query(NavigationTask)\
-        .filter(NavigationTask.user_id == user_id)\
-        .order_by(NavigationTask.created_at.desc())\
-        .limit(limit)\
-        .all()
+    tasks = (await db.scalars(
+        select(NavigationTask)
+        .where(NavigationTask.user_id == user_id)
+        .order_by(NavigationTask.created_at.desc())
+        .limit(limit)
+    )).all()
 
     results = []
     for task in tasks:
@@ -291,7 +311,7 @@ async def get_user_navigation_tasks(
 
         assigned_robot = None
         if task.assigned_robot_id:
-            assigned_robot = db.query(Robot).filter(Robot.id == task.assigned_robot_id).first()
+            assigned_robot = await db.get(Robot, task.assigned_robot_id)
 
         results.append(format_task_response(task, path_coordinates, assigned_robot))
 
@@ -301,9 +321,9 @@ async def get_user_navigation_tasks(
 @router.post("/tasks/{task_id}/cancel", response_model=NavigationTaskResponse)
 async def cancel_navigation_task(
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    task = db.query(NavigationTask).filter(NavigationTask.id == task_id).first()
+    task = await db.get(NavigationTask, task_id)
 
     if not task:
         raise HTTPException(
@@ -320,13 +340,13 @@ async def cancel_navigation_task(
     task.status = TASK_STATUS["CANCELLED"]
 
     if task.assigned_robot_id:
-        robot = db.query(Robot).filter(Robot.id == task.assigned_robot_id).first()
+        robot = await db.get(Robot, task.assigned_robot_id)
         if robot:
             robot.status = "idle"
             robot.current_task_id = None
 
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     return await get_navigation_task(task_id, db)
 
@@ -334,12 +354,30 @@ async def cancel_navigation_task(
 # ============ 辅助函数 ============
 
 def assign_available_robot(near_location_id: int, db: Session) -> Optional[Robot]:
-    robot = db.query(Robot).filter(
+    """
+    分配离起点最近的空闲小车：从起点沿反向边做一次一对多Dijkstra，取第一个确定的小车位置
+    反向搜索得到的是小车走到起点的代价（单向通道下与起点到小车不同）
+    """
+    robots = db.query(Robot).filter(
         Robot.status == "idle",
         Robot.is_online == True,
         Robot.battery_level > 20
-    ).first()
-    return robot
+    ).all()
+    if not robots:
+        return None
+
+    by_location = {}
+    for robot in robots:
+        if robot.current_location_id is not None:
+            by_location.setdefault(robot.current_location_id, robot)
+    if by_location:
+        from app.core.graph import get_shared_graph
+        graph = get_shared_graph(db)
+        found = graph.dijkstra_many(near_location_id, by_location, limit=1, reverse=True)
+        if found:
+            return by_location[next(iter(found))]
+    # 小车都没有位置信息或与起点不连通时，退回到任意一台空闲小车
+    return robots[0]
 
 
 def estimate_total_time(total_distance: float, sequence: List[Location], user_type: str = "normal") -> int:
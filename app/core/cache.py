@@ -0,0 +1,138 @@
+"""
+通用缓存工具
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    线程安全的LRU缓存（基于OrderedDict），记录命中/未命中/淘汰次数
+    ttl 不为空时条目在写入 ttl 秒后过期
+    max_bytes 不为空时按 sizeof(value) 统计总占用，超出预算也按LRU淘汰
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._building: Dict[Hashable, list] = {}  # key -> [构建锁, 等待/构建中的线程数]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key, count=False) is not _MISSING
+
+    def _lookup(self, key: Hashable, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            if count:
+                self.misses += 1
+            return _MISSING
+
+    def _remove(self, key: Hashable):
+        value, _ = self._data.pop(key)
+        if self.sizeof is not None:
+            self.nbytes -= self.sizeof(value)
+
+    def _over_budget(self) -> bool:
+        return self.max_bytes is not None and self.nbytes > self.max_bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at)
+            if self.sizeof is not None:
+                self.nbytes += self.sizeof(value)
+            while self._data and (len(self._data) > self.maxsize or self._over_budget()):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        命中则返回缓存值，否则调用 factory 生成并写入
+        factory 在缓存锁之外执行，只持有该 key 的构建锁：同一个 key 只构建一次，
+        构建期间其他 key 的读写不受影响
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            building = self._building.get(key)
+            if building is None:
+                building = self._building[key] = [threading.Lock(), 0]
+            building[1] += 1
+        try:
+            with building[0]:
+                # 等待期间可能已由其他线程构建完成
+                value = self._lookup(key, count=False)
+                if value is _MISSING:
+                    value = factory()
+                    self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                building[1] -= 1
+                if building[1] == 0:
+                    del self._building[key]
+
+    def values(self):
+        with self._lock:
+            return [value for value, _ in self._data.values()]
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._data.items()]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+        if self.sizeof is not None:
+            stats["bytes"] = self.nbytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
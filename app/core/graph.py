@@ -2,39 +2,155 @@
 图数据结构，用于路径规划
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
+from dataclasses import dataclass, field
+from array import array
+import hashlib
 import heapq
+import json
+import threading
+import time
+
+from app.core.cache import LRUCache
+from app.core.config import COST_TABLE_CACHE_SIZE
+
+
+@dataclass
+class EdgeInfo:
+    """内存中的路径边（与 Path 表字段对应，搜索时无需再查库）"""
+    start_id: int
+    end_id: int
+    distance: float
+    type: str = "corridor"
+    attributes: Dict = field(default_factory=dict)
+    path_id: Optional[int] = None
+
 
 class HospitalGraph:
     """医院地图图结构"""
     
     def __init__(self):
-        self.adjacency: Dict[int, List[Tuple[int, float]]] = {}
+        # 邻接表：location_id -> [(邻居ID, 距离, 边序号)]，边序号指向 self.edges
+        self.adjacency: Dict[int, List[Tuple[int, float, int]]] = {}
         self.locations: Dict[int, Dict] = {}
+        self.edges: List[EdgeInfo] = []
+        # 按用户画像编译的边代价表（随图版本一起失效）
+        self.cost_tables = LRUCache(COST_TABLE_CACHE_SIZE)
+        self.version = 0       # 构建时对应的注册表版本号
+        self.frozen = False    # 冻结后为只读快照
+        self._csr: Optional["CSRGraph"] = None
+        self._reverse: Optional[Dict[int, List[Tuple[int, float, int]]]] = None
+        self._edges_by_path: Optional[Dict[int, int]] = None
+        self._fingerprint: Optional[str] = None
+    
+    def freeze(self):
+        """冻结为只读快照，供多个PathFinder共享"""
+        self.frozen = True
+    
+    def _check_writable(self):
+        if self.frozen:
+            raise RuntimeError("图快照为只读，请通过 graph_registry.invalidate() 重建")
     
     def add_location(self, location_id: int, location_info: Dict):
+        self._check_writable()
         if location_id not in self.adjacency:
             self.adjacency[location_id] = []
         self.locations[location_id] = location_info
     
-    def add_edge(self, start_id: int, end_id: int, weight: float):
+    def add_edge(self, start_id: int, end_id: int, weight: float, edge_index: int = -1):
+        self._check_writable()
         if start_id not in self.adjacency:
             self.adjacency[start_id] = []
-        self.adjacency[start_id].append((end_id, weight))
+        self.adjacency[start_id].append((end_id, weight, edge_index))
     
     def add_path(self, start_id: int, end_id: int, 
-                 distance: float, path_type: str, attributes: Dict):
-        self.add_edge(start_id, end_id, distance)
+                 distance: float, path_type: str, attributes: Dict,
+                 path_id: Optional[int] = None):
+        self._check_writable()
         if attributes is None:
            attributes = {}
+        edge_index = len(self.edges)
+        self.edges.append(EdgeInfo(start_id, end_id, distance,
+                                   path_type or "corridor", attributes, path_id))
+        self.add_edge(start_id, end_id, distance, edge_index)
         if attributes.get("is_bidirectional", True):
-            self.add_edge(end_id, start_id, distance)
+            self.add_edge(end_id, start_id, distance, edge_index)
+    
+    def fingerprint(self) -> str:
+        """图内容（位置ID + 全部边）的哈希，用于判断持久化的派生数据是否过期"""
+        if self._fingerprint is not None:
+            return self._fingerprint
+        digest = hashlib.sha1()
+        digest.update(json.dumps(sorted(self.locations)).encode())
+        for edge in self.edges:
+            digest.update(json.dumps(
+                [edge.start_id, edge.end_id, edge.distance, edge.type, edge.attributes],
+                sort_keys=True, default=str
+            ).encode())
+        fingerprint = digest.hexdigest()
+        if self.frozen:
+            self._fingerprint = fingerprint
+        return fingerprint
+    
+    def patch_edge_attributes(self, updates: Dict[int, Dict]) -> List[int]:
+        """
+        按 Path.id 原地合并边属性（如实时拥挤度），返回被修改的边序号
+        只改属性不改拓扑，冻结的快照也允许修补；每条边换成新的属性字典，并发读取的搜索看到的要么是旧值要么是新值。
+        指纹在旧指纹上链式更新，以指纹为键的派生数据（路径表、地标表等）随之失效
+        """
+        if self._edges_by_path is None:
+            self._edges_by_path = {edge.path_id: i for i, edge in enumerate(self.edges)
+                                   if edge.path_id is not None}
+        changed = []
+        for path_id, attributes in updates.items():
+            edge_index = self._edges_by_path.get(path_id)
+            if edge_index is None:
+                continue
+            edge = self.edges[edge_index]
+            edge.attributes = {**edge.attributes, **attributes}
+            changed.append(edge_index)
+        if changed and self._fingerprint is not None:
+            digest = hashlib.sha1(self._fingerprint.encode())
+            digest.update(json.dumps(sorted(updates.items()), sort_keys=True, default=str).encode())
+            self._fingerprint = digest.hexdigest()
+        return changed
+    
+    def to_csr(self) -> "CSRGraph":
+        """转换为紧凑的CSR表示（冻结后的快照只转换一次）"""
+        if self._csr is not None:
+            return self._csr
+        csr = CSRGraph(self)
+        if self.frozen:
+            self._csr = csr
+        return csr
+    
+    def reverse_adjacency(self) -> Dict[int, List[Tuple[int, float, int]]]:
+        """
+        反向邻接表：location_id -> [(前驱ID, 距离, 边序号)]，供反向搜索使用
+        单向通行的边只出现在一个方向上（冻结后的快照只构建一次）
+        """
+        if self._reverse is not None:
+            return self._reverse
+        reverse: Dict[int, List[Tuple[int, float, int]]] = {nid: [] for nid in self.adjacency}
+        for from_id, neighbors in self.adjacency.items():
+            for to_id, weight, edge_index in neighbors:
+                reverse.setdefault(to_id, []).append((from_id, weight, edge_index))
+        if self.frozen:
+            self._reverse = reverse
+        return reverse
+    
+    def get_edge(self, start_id: int, end_id: int) -> Optional[EdgeInfo]:
+        """查找两个位置之间的边（不访问数据库）"""
+        for nid, _, edge_index in self.adjacency.get(start_id, ()):
+            if nid == end_id and edge_index >= 0:
+                return self.edges[edge_index]
+        return None
     
     def get_neighbors(self, location_id: int) -> List[Dict]:
         if location_id not in self.adjacency:
             return []
-        return [{"to_id": nid, "distance": w, "weight": w} 
-                for nid, w in self.adjacency[location_id]]
+        return [{"to_id": nid, "distance": w, "weight": w, "edge_index": idx}
+                for nid, w, idx in self.adjacency[location_id]]
     
     def dijkstra(self, start_id: int, end_id: int) -> Tuple[List[int], float]:
         if start_id not in self.adjacency or end_id not in self.adjacency:
@@ -52,7 +168,7 @@ class HospitalGraph:
             if node == end_id:
                 break
             
-            for neighbor, weight in self.adjacency.get(node, []):
+            for neighbor, weight, _ in self.adjacency.get(node, []):
                 new_dist = dist + weight
                 if new_dist < distances[neighbor]:
                     distances[neighbor] = new_dist
@@ -70,6 +186,228 @@ class HospitalGraph:
         
         return path[::-1], distances[end_id]
 
+    def dijkstra_many(self, start_id: int, target_ids: Iterable[int],
+                      costs: Optional[List[float]] = None,
+                      limit: Optional[int] = None,
+                      reverse: bool = False) -> Dict[int, Tuple[List[int], float]]:
+        """
+        一对多最短路：一次搜索得到起点到多个目标的路径和代价
+        所有目标都确定（或已确定 limit 个最近目标）后提前结束
+        costs 为按边序号排列的用户画像代价表，为空时使用边的原始权重
+        reverse 时沿反向邻接表搜索，得到的是各目标走到 start_id 的代价（单向边、不对称代价下与正向不同），
+        路径也按 目标 -> start_id 的顺序返回
+        返回 {目标ID: (路径ID列表, 代价)}，不可达的目标不出现在结果中
+        """
+        adjacency = self.reverse_adjacency() if reverse else self.adjacency
+        remaining = set(target_ids)
+        if start_id not in adjacency or not remaining:
+            return {}
+        wanted = len(remaining) if limit is None else min(limit, len(remaining))
+
+        distances = {start_id: 0.0}
+        previous = {start_id: None}
+        settled = set()
+        found = []
+        pq = [(0.0, start_id)]
+
+        while pq and len(found) < wanted:
+            dist, node = heapq.heappop(pq)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in remaining:
+                found.append(node)
+
+            for neighbor, weight, edge_index in adjacency.get(node, ()):
+                if neighbor in settled:
+                    continue
+                if costs is not None:
+                    if edge_index < 0:
+                        continue
+                    weight = costs[edge_index]
+                new_dist = dist + weight
+                if new_dist < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = new_dist
+                    previous[neighbor] = node
+                    heapq.heappush(pq, (new_dist, neighbor))
+
+        results = {}
+        for target in found:
+            path = []
+            current = target
+            while current is not None:
+                path.append(current)
+                current = previous[current]
+            results[target] = (path if reverse else path[::-1], distances[target])
+        return results
+
+# 路径类型编码（CSR中按字节存储）
+EDGE_TYPE_CODES = {
+    "corridor": 0,
+    "elevator": 1,
+    "stairs": 2,
+    "ramp": 3,
+    "escalator": 4,
+    "door": 5
+}
+OTHER_EDGE_TYPE = 127
+
+
+class CSRGraph:
+    """
+    紧凑的CSR（压缩稀疏行）图表示
+    Location.id 映射为连续的稠密下标，节点 i 的出边位于
+    targets/weights/edge_ids/edge_types 的 [offsets[i], offsets[i+1]) 区间，
+    遍历邻居只需按下标取值，不分配任何临时对象
+    """
+    
+    def __init__(self, graph: HospitalGraph):
+        self.version = graph.version
+        node_set = set(graph.adjacency)
+        for neighbors in graph.adjacency.values():
+            node_set.update(nid for nid, _, _ in neighbors)
+        self.node_ids = array('q', sorted(node_set))
+        self.index_of: Dict[int, int] = {nid: i for i, nid in enumerate(self.node_ids)}
+        n = len(self.node_ids)
+        
+        self.offsets = array('l', [0] * (n + 1))
+        self.targets = array('l')
+        self.weights = array('d')
+        self.edge_ids = array('l')
+        self.edge_types = array('b')
+        
+        # 节点坐标（供启发式函数使用）
+        self.xs = array('d', [0.0] * n)
+        self.ys = array('d', [0.0] * n)
+        self.floors = array('l', [0] * n)
+        
+        index_of = self.index_of
+        for i, nid in enumerate(self.node_ids):
+            info = graph.locations.get(nid)
+            if info:
+                self.xs[i] = info.get("x") or 0.0
+                self.ys[i] = info.get("y") or 0.0
+                self.floors[i] = info.get("floor") or 0
+            for to_id, weight, edge_index in graph.adjacency.get(nid, ()):
+                self.targets.append(index_of[to_id])
+                self.weights.append(weight)
+                self.edge_ids.append(edge_index)
+                path_type = graph.edges[edge_index].type if edge_index >= 0 else "corridor"
+                self.edge_types.append(EDGE_TYPE_CODES.get(path_type.lower(), OTHER_EDGE_TYPE))
+            self.offsets[i + 1] = len(self.targets)
+    
+    def __len__(self) -> int:
+        return len(self.node_ids)
+    
+    def nbytes(self) -> int:
+        """数组部分占用的字节数"""
+        arrays = [self.node_ids, self.offsets, self.targets, self.weights,
+                  self.edge_ids, self.edge_types, self.xs, self.ys, self.floors]
+        return sum(a.itemsize * len(a) for a in arrays)
+    
+    def neighbors(self, node_index: int) -> range:
+        """节点出边在CSR数组中的下标区间"""
+        return range(self.offsets[node_index], self.offsets[node_index + 1])
+    
+    def dijkstra(self, start_id: int, end_id: int) -> Tuple[List[int], float]:
+        """与 HospitalGraph.dijkstra 接口一致的最短路搜索"""
+        index_of = self.index_of
+        if start_id not in index_of or end_id not in index_of:
+            return [], float('inf')
+        
+        source = index_of[start_id]
+        target = index_of[end_id]
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        
+        n = len(self.node_ids)
+        distances = [float('inf')] * n
+        previous = [-1] * n
+        distances[source] = 0
+        pq = [(0, source)]
+        
+        while pq:
+            dist, node = heapq.heappop(pq)
+            if dist > distances[node]:
+                continue
+            if node == target:
+                break
+            
+            for pos in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[pos]
+                new_dist = dist + weights[pos]
+                if new_dist < distances[neighbor]:
+                    distances[neighbor] = new_dist
+                    previous[neighbor] = node
+                    heapq.heappush(pq, (new_dist, neighbor))
+        
+        if distances[target] == float('inf'):
+            return [], float('inf')
+        
+        path = []
+        current = target
+        while current != -1:
+            path.append(self.node_ids[current])
+            current = previous[current]
+        
+        return path[::-1], distances[target]
+
+    def dijkstra_many(self, start_id: int, target_ids: Iterable[int],
+                      costs: Optional[List[float]] = None,
+                      limit: Optional[int] = None) -> Dict[int, Tuple[List[int], float]]:
+        """与 HospitalGraph.dijkstra_many 接口一致的一对多最短路"""
+        index_of = self.index_of
+        if start_id not in index_of:
+            return {}
+        remaining = {index_of[t] for t in target_ids if t in index_of}
+        if not remaining:
+            return {}
+        wanted = len(remaining) if limit is None else min(limit, len(remaining))
+
+        source = index_of[start_id]
+        offsets, targets, weights, edge_ids = self.offsets, self.targets, self.weights, self.edge_ids
+        n = len(self.node_ids)
+        distances = [float('inf')] * n
+        previous = [-1] * n
+        closed = bytearray(n)
+        distances[source] = 0.0
+        found = []
+        pq = [(0.0, source)]
+
+        while pq and len(found) < wanted:
+            dist, node = heapq.heappop(pq)
+            if closed[node]:
+                continue
+            closed[node] = 1
+            if node in remaining:
+                found.append(node)
+
+            for pos in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[pos]
+                if closed[neighbor]:
+                    continue
+                if costs is None:
+                    weight = weights[pos]
+                else:
+                    edge_index = edge_ids[pos]
+                    if edge_index < 0:
+                        continue
+                    weight = costs[edge_index]
+                new_dist = dist + weight
+                if new_dist < distances[neighbor]:
+                    distances[neighbor] = new_dist
+                    previous[neighbor] = node
+                    heapq.heappush(pq, (new_dist, neighbor))
+
+        results = {}
+        for target in found:
+            path = []
+            current = target
+            while current != -1:
+                path.append(self.node_ids[current])
+                current = previous[current]
+            results[self.node_ids[target]] = (path[::-1], distances[target])
+        return results
+
 def build_graph_from_db(db_session):
     """从数据库构建图结构"""
     from app.models import Location, Path
@@ -97,7 +435,8 @@ def build_graph_from_db(db_session):
                 end_id=path.end_id,
                 distance=path.distance,
                 path_type=path.type,
-                attributes=path.attributes
+                attributes=path.attributes,
+                path_id=path.id
             )
         
         print(f"✅ 图构建完成：{len(locations)}个位置，{len(paths)}条路径")
@@ -105,4 +444,133 @@ def build_graph_from_db(db_session):
         
     except Exception as e:
         print(f"❌ 图构建失败：{e}")
-        return graph
\ No newline at end of file
+        return graph
+
+
+class GraphRegistry:
+    """
+    进程级图注册表
+    启动时构建一次 HospitalGraph，所有 PathFinder 共享同一个只读快照；
+    地图数据变化后调用 invalidate() 递增版本号，下次访问时重建。
+    实时拥挤度通过 patch_attributes() 原地修补当前快照并递增版本号（不重建），
+    尚未写回数据库的属性保存在注册表中，期间若重建图会重新叠加上去
+    """
+    
+    def __init__(self):
+        self._graph: Optional[HospitalGraph] = None
+        self._version = 0
+        self._map_version = 0
+        self._lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._build_count = 0
+        self._pending: Dict[int, Dict] = {}    # Path.id -> 待写回的属性
+        self._in_flight: Dict[int, Dict] = {}  # 正在写回的属性
+    
+    @property
+    def version(self) -> int:
+        """任何影响路径代价的变化（地图数据或拥挤度）都会递增"""
+        return self._version
+    
+    @property
+    def map_version(self) -> int:
+        """只在地图数据（位置/路径拓扑）变化时递增，供与边代价无关的缓存（网格、通道口抽象图）使用"""
+        return self._map_version
+    
+    def get_graph(self, db_session) -> HospitalGraph:
+        """获取当前版本的图快照（过期时重建）"""
+        graph = self._graph
+        if graph is not None and graph.version == self._version:
+            return graph
+        
+        with self._lock:
+            # 双重检查，避免并发请求重复构建
+            return self._current_graph_locked(db_session)
+    
+    def _current_graph_locked(self, db_session) -> HospitalGraph:
+        """持锁状态下返回当前版本的图，过期时重建并叠加尚未写回的属性"""
+        if self._graph is None or self._graph.version != self._version:
+            version = self._version
+            graph = build_graph_from_db(db_session)
+            overlay = {**self._in_flight, **self._pending}
+            if overlay:
+                graph.patch_edge_attributes(overlay)
+            graph.version = version
+            graph.freeze()
+            self._graph = graph
+            self._built_at = time.time()
+            self._build_count += 1
+        return self._graph
+    
+    def invalidate(self) -> int:
+        """标记图数据已变化，返回新的版本号"""
+        with self._lock:
+            self._version += 1
+            self._map_version += 1
+            return self._version
+    
+    def patch_attributes(self, db_session, updates: Dict[int, Dict],
+                         on_patched: Optional[Callable[[HospitalGraph, List[int], str], None]] = None
+                         ) -> Tuple[int, List[int]]:
+        """
+        原地修补当前快照的边属性并递增版本号，返回 (新版本号, 被修改的边序号)
+        on_patched(图, 被修改的边序号, 修补前的指纹) 在持锁状态下调用，用于同步修补派生数据（如边代价表）
+        取图和修补在同一次持锁内完成：否则两者之间若有 invalidate()，修补的会是失效前构建的旧图，
+        而它会被标上最新版本号，之后一直被当作当前快照使用
+        """
+        with self._lock:
+            graph = self._current_graph_locked(db_session)
+            old_fingerprint = graph.fingerprint()
+            changed = graph.patch_edge_attributes(updates)
+            if changed:
+                for edge_index in changed:
+                    edge = graph.edges[edge_index]
+                    self._pending[edge.path_id] = edge.attributes
+                if on_patched is not None:
+                    on_patched(graph, changed, old_fingerprint)
+                self._version += 1
+                graph.version = self._version
+            return self._version, changed
+    
+    def take_pending(self, limit: int) -> Dict[int, Dict]:
+        """取出最多 limit 条待写回的属性，转入写回中状态"""
+        with self._lock:
+            batch = {}
+            for path_id in list(self._pending)[:limit]:
+                batch[path_id] = self._in_flight[path_id] = self._pending.pop(path_id)
+            return batch
+    
+    def finish_pending(self, batch: Dict[int, Dict], written: bool):
+        """写回结束：成功则丢弃；失败则放回待写回（期间已有更新的以新值为准）"""
+        with self._lock:
+            for path_id, attributes in batch.items():
+                if self._in_flight.get(path_id) is attributes:
+                    del self._in_flight[path_id]
+                if not written:
+                    self._pending.setdefault(path_id, attributes)
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending) + len(self._in_flight)
+    
+    def status(self) -> Dict:
+        graph = self._graph
+        return {
+            "version": self._version,
+            "map_version": self._map_version,
+            "pending_writes": self.pending_count,
+            "built": graph is not None,
+            "stale": graph is None or graph.version != self._version,
+            "locations": len(graph.locations) if graph else 0,
+            "edges": sum(len(v) for v in graph.adjacency.values()) if graph else 0,
+            "built_at": self._built_at,
+            "build_count": self._build_count
+        }
+
+
+# 全局图注册表（整个进程共享）
+graph_registry = GraphRegistry()
+
+
+def get_shared_graph(db_session) -> HospitalGraph:
+    """获取进程共享的图快照"""
+    return graph_registry.get_graph(db_session)
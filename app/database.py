@@ -1,17 +1,89 @@
-from sqlalchemy import create_engine
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-# SQLite数据库连接
-SQLALCHEMY_DATABASE_URL = "sqlite:///./hospital_guide.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+from app.core.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, SQLITE_PRAGMAS
 )
 
+# 数据库连接（默认 SQLite，见 config.DATABASE_URL）
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+
+# 同步驱动 -> 异步驱动：本地用 aiosqlite，PostgreSQL 用 asyncpg
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """同一个数据库的异步连接串"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)) \
+        .render_as_string(hide_password=False)
+
+
+def _engine_options(url: str, pool_size: int, max_overflow: int) -> Dict:
+    """连接池参数：内存SQLite只能用单连接池，不设置池大小"""
+    parsed = make_url(url)
+    pool = {"pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": DB_POOL_TIMEOUT}
+    if parsed.get_backend_name() != "sqlite":
+        return {**pool, "pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": True}
+    options = {}
+    if not parsed.drivername.endswith("aiosqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    if parsed.database not in (None, "", ":memory:"):
+        options.update(pool)
+    return options
+
+
+def _install_sqlite_pragmas(sync_engine, pragmas: Dict):
+    """每个新连接执行 PRAGMA（同步与异步引擎共用，异步引擎传入其 sync_engine）"""
+    if sync_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, pragmas: Optional[Dict] = None):
+    """按配置创建同步引擎；pragmas 为空时使用 SQLITE_PRAGMAS（传入 {} 则不设置）"""
+    engine = create_engine(url, **_engine_options(url, DB_POOL_SIZE, DB_MAX_OVERFLOW))
+    _install_sqlite_pragmas(engine, SQLITE_PRAGMAS if pragmas is None else pragmas)
+    return engine
+
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL, pragmas: Optional[Dict] = None):
+    """按配置创建异步引擎，url 为同步连接串，驱动自动替换"""
+    async_url = async_database_url(url)
+    options = _engine_options(async_url, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW)
+    engine = create_async_engine(async_url, **options)
+    _install_sqlite_pragmas(engine.sync_engine, SQLITE_PRAGMAS if pragmas is None else pragmas)
+    return engine
+
+
+engine = create_db_engine()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_db_engine()
+
+# expire_on_commit=False：提交后仍可读取对象属性，避免在异步会话里触发隐式IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 依赖注入函数
 def get_db():
     db = SessionLocal()
@@ -19,8 +91,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """异步会话依赖：async def 接口中查询数据库不会阻塞事件循环"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # app/database.py 中添加初始化函数
 def init_database():
     """初始化数据库表"""
     Base.metadata.create_all(bind=engine)
-    print("✅ 数据库表创建完成")
\ No newline at end of file
+    print("✅ 数据库表创建完成")
@@ -2,6 +2,15 @@ from fastapi import FastAPI
 from app.api.endpoints import health  # 导入我们即将编写的健康检查路由
 from app.api.endpoints import auth,health, map, robots 
 from app.api.endpoints import navigation,speech
+from app.database import SessionLocal, async_engine
+from app.core.graph import graph_registry
+from app.algorithms.route_table import precompute_route_tables
+from app.algorithms.navigation_grid import preload_floor_grids
+from app.algorithms.grid_pathfinder import GridPathFinder
+from app.algorithms.portal_graph import get_portal_graph
+from app.algorithms.contraction import precompute_contraction_hierarchy
+from app.algorithms.congestion import congestion_writer
+from app.core.config import CH_ENABLED, ROUTE_TABLE_MAX_NODES
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -32,4 +41,33 @@ app.include_router(speech.router, prefix="/api/v1/speech", tags=["语音服务"]
 # 一个最简单的根路径路由，用于快速验证服务是否存活
 @app.get("/")
 async def root():
-    return {"message": "Server is alive and ready for Hospital Guide!"}
\ No newline at end of file
+    return {"message": "Server is alive and ready for Hospital Guide!"}
+
+@app.on_event("startup")
+def warm_up_graph():
+    """启动时构建一次共享路径图，加载/预计算全源路径表（大图可选收缩层次），映射楼层网格并构建楼梯/电梯抽象图"""
+    preload_floor_grids()
+    db = SessionLocal()
+    try:
+        graph = graph_registry.get_graph(db)
+        precompute_route_tables(graph)
+        if CH_ENABLED and len(graph.adjacency) > ROUTE_TABLE_MAX_NODES:
+            ch = precompute_contraction_hierarchy(graph)
+            print(f"✅ 收缩层次：{len(ch)}条上行弧，已定制 {len(ch.metrics)} 个用户画像")
+        portal_graph = get_portal_graph(GridPathFinder(db))
+        print(f"✅ 楼梯/电梯抽象图：{len(portal_graph.portals)}个通道口，"
+              f"距离场 {portal_graph.nbytes() / 1024:.0f}KB")
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+def flush_congestion():
+    """退出前把尚未写回的拥挤度更新写入数据库"""
+    congestion_writer.stop()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """关闭异步连接池"""
+    await async_engine.dispose()
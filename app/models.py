@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String,Float, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String,Float, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,6 +18,9 @@ class User(Base):
 
 class Location(Base):
     __tablename__ = "locations"
+    __table_args__ = (
+        Index("ix_locations_floor_type", "floor", "type"),  # 按楼层/类型筛选（建网格、找楼梯电梯）
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True)  # 我也加上长度限制，保持统一
@@ -35,6 +38,9 @@ class Location(Base):
 
 class Robot(Base):
     __tablename__ = "robots"
+    __table_args__ = (
+        Index("ix_robots_status_online_battery", "status", "is_online", "battery_level"),  # 查找可用小车
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, index=True)
@@ -50,6 +56,9 @@ class Robot(Base):
 
 class NavigationTask(Base):
     __tablename__ = "navigation_tasks"
+    __table_args__ = (
+        Index("ix_navigation_tasks_user_created", "user_id", "created_at"),  # 用户任务列表按时间倒序
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -83,6 +92,10 @@ Location.incoming_paths = relationship(
 # 2. 添加新的 Path 模型（智能路径所需）
 class Path(Base):
     __tablename__ = "paths"
+    __table_args__ = (
+        # 边查找：(start_id, end_id) OR (end_id, start_id) 两个分支都能走这个索引
+        Index("ix_paths_start_end", "start_id", "end_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -80,12 +80,34 @@ class PathPoint(BaseModel):
             }
         }
 
+class CongestionUpdate(BaseModel):
+    """单条路径的实时拥挤情况（只更新给出的字段）"""
+    path_id: int
+    crowdedness: Optional[float] = None  # 0~1
+    average_wait_time: Optional[float] = None  # 秒
+
+
+class CongestionBatchRequest(BaseModel):
+    """批量更新路径拥挤度"""
+    updates: List[CongestionUpdate]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "updates": [
+                    {"path_id": 12, "crowdedness": 0.8},
+                    {"path_id": 30, "average_wait_time": 90}
+                ]
+            }
+        }
+
 class PathPlanRequest(BaseModel):
     """路径规划请求"""
     start_id: int
     end_id: int
     user_type: str = "normal"  # wheelchair, emergency, elderly, normal, staff
     preferences: List[str] = []  # avoid_crowds, use_elevator, avoid_stairs, fastest_route
+    algorithm: Optional[str] = None  # 网格搜索算法：astar, jps；不指定时热门目的地走距离场，其余用 astar
     
     class Config:
         json_schema_extra = {
@@ -175,6 +197,8 @@ class NavigationRequestCreate(BaseModel):
         "avoid_crowds": False,
         "use_elevator": True
     }
+    optimize_order: bool = False  # 优化访问顺序（第一个地点为起点，固定不动）
+    fix_last_stop: bool = False  # 优化顺序时最后一个地点也固定
     
     class Config:
         json_schema_extra = {
@@ -185,7 +209,9 @@ class NavigationRequestCreate(BaseModel):
                 "preferences": {
                     "avoid_crowds": True,
                     "use_elevator": True
-                }
+                },
+                "optimize_order": False,
+                "fix_last_stop": False
             }
         }
 
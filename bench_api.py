@@ -0,0 +1,305 @@
+"""
+API 并发吞吐基准测试
+在临时SQLite文件中生成合成医院地图、小车和导航任务，用 httpx.AsyncClient 直接调用 ASGI 应用，
+同时发起大量只读请求，对比两种写法的吞吐量：
+- 移植前：async def 接口里调用同步 Session，每次查询都阻塞事件循环，并发请求只能排队
+- 移植后：async def 接口使用 get_async_db（aiosqlite），查询在驱动线程中执行，事件循环可以交替处理请求
+--latency 给每条SQL加上固定延迟，模拟部署到 PostgreSQL 时的网络往返
+
+注意：移植前的写法在默认连接池（5+10）下并发超过15时会卡死——事件循环阻塞在取连接上，
+而归还连接的 get_db 清理代码也要等事件循环调度。这里两种写法都把连接池放大到并发数，只比较吞吐
+
+readwrite：导航接口读写混合（取消任务 + 查询任务列表/小车），对比默认引擎（rollback journal、
+synchronous=FULL、默认连接池）与 app.database 按配置创建的引擎（WAL、synchronous=NORMAL、调优后的连接池）
+
+用法：
+    python bench_api.py                        # 运行全部基准，默认每条SQL 2ms 延迟
+    python bench_api.py concurrency --latency 0  # 只运行指定基准，本地SQLite无额外延迟
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import SQLITE_PRAGMAS, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW
+from app.database import get_db, get_async_db, create_async_db_engine
+from app.main import app
+from app.api.endpoints.navigation import format_task_response
+from app.models import Base, Location, NavigationTask, Robot, User
+from app.schemas import LocationResponse, RobotResponse
+from bench_path_finder import build_synthetic_hospital
+
+CONCURRENCY = 32
+REQUESTS = 320
+READWRITE_REQUESTS = 600  # 其中 1/3 为写请求
+READWRITE_ROUNDS = 3
+COMMIT_SAMPLES = 100
+ENDPOINTS = [
+    "/api/v1/locations?floor=2",
+    "/api/v1/robots",
+    "/api/v1/navigation/tasks/user/1",
+]
+
+
+def seed_database(session_factory, robots=20, tasks=200, pending_tasks=0):
+    """合成地图 + 小车 + 一个用户的导航任务（已完成的 tasks 个，待执行的 pending_tasks 个）"""
+    db = session_factory()
+    try:
+        build_synthetic_hospital(db)
+        location_ids = [loc_id for (loc_id,) in db.query(Location.id).all()]
+        db.add(User(id=1, username="bench", hashed_password="-"))
+        for i in range(robots):
+            db.add(Robot(id=i + 1, name=f"robot_{i + 1}", status="idle" if i % 3 else "busy",
+                         current_location_id=location_ids[i * 7 % len(location_ids)],
+                         battery_level=30 + i * 3))
+        for i in range(tasks):
+            db.add(NavigationTask(user_id=1, start_location_id=location_ids[i % len(location_ids)],
+                                  target_location_id=location_ids[(i * 13) % len(location_ids)],
+                                  assigned_robot_id=i % robots + 1, status="completed",
+                                  path_coordinates=json.dumps([]), estimated_duration=120))
+        for i in range(pending_tasks):
+            db.add(NavigationTask(user_id=1, start_location_id=location_ids[i % len(location_ids)],
+                                  target_location_id=location_ids[(i * 17) % len(location_ids)],
+                                  assigned_robot_id=i % robots + 1, status="pending",
+                                  path_coordinates=json.dumps([]), estimated_duration=120))
+        db.commit()
+    finally:
+        db.close()
+
+
+def add_latency(engine, latency_ms: float, is_async: bool):
+    """每条SQL在执行它的线程里额外等待 latency_ms（同步引擎即事件循环线程，aiosqlite 为驱动线程）"""
+    if latency_ms <= 0:
+        return
+    delay = latency_ms / 1000
+
+    def trace(_statement):
+        time.sleep(delay)
+
+    sync_engine = engine.sync_engine if is_async else engine
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, _record):
+        if is_async:
+            dbapi_connection.run_async(lambda conn: conn.set_trace_callback(trace))
+        else:
+            dbapi_connection.set_trace_callback(trace)
+
+
+def legacy_app(session_factory) -> FastAPI:
+    """与移植前写法一致：async def 接口中直接使用同步 Session"""
+    legacy = FastAPI()
+
+    def get_sync_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @legacy.get("/api/v1/locations", response_model=List[LocationResponse])
+    async def get_locations(floor: Optional[int] = None, db: Session = Depends(get_sync_db)):
+        query = db.query(Location)
+        if floor:
+            query = query.filter(Location.floor == floor)
+        return query.all()
+
+    @legacy.get("/api/v1/robots", response_model=List[RobotResponse])
+    async def get_robots(db: Session = Depends(get_sync_db)):
+        return db.query(Robot).all()
+
+    @legacy.get("/api/v1/navigation/tasks/user/{user_id}")
+    async def get_user_navigation_tasks(user_id: int, limit: int = 10, db: Session = Depends(get_sync_db)):
+        db.query(User).filter(User.id == user_id).first()
+        tasks = db.query(NavigationTask).filter(NavigationTask.user_id == user_id)\
+            .order_by(NavigationTask.created_at.desc()).limit(limit).all()
+        results = []
+        for task in tasks:
+            robot = db.query(Robot).filter(Robot.id == task.assigned_robot_id).first()
+            results.append(format_task_response(task, json.loads(task.path_coordinates), robot))
+        return results
+
+    return legacy
+
+
+async def load_test(asgi_app, path: str):
+    """CONCURRENCY 个请求同时在途，共 REQUESTS 个；返回 (吞吐 req/s, p50 ms, p95 ms)"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                assert response.status_code == 200, response.text
+
+        await client.get(path)  # 预热
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(REQUESTS)))
+        elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return REQUESTS / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+async def bench_concurrency(latency_ms: float):
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    db_path = os.path.join(workdir, "bench.db")
+    sync_engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False},
+                                pool_size=CONCURRENCY)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=CONCURRENCY)
+    Base.metadata.create_all(bind=sync_engine)
+    seed_database(sessionmaker(bind=sync_engine))
+
+    add_latency(sync_engine, latency_ms, is_async=False)
+    add_latency(async_engine, latency_ms, is_async=True)
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    def bench_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_async_db] = bench_async_db
+    app.dependency_overrides[get_db] = bench_db
+    legacy = legacy_app(SyncSession)
+
+    print(f"\n=== 并发只读请求（并发 {CONCURRENCY}，共 {REQUESTS} 个，每条SQL延迟 {latency_ms:g}ms）===")
+    print(f"{'接口':<38}{'移植前(req/s)':<16}{'移植后(req/s)':<16}{'p95 前/后(ms)':<20}{'提升'}")
+    try:
+        for path in ENDPOINTS:
+            before, _, before_p95 = await load_test(legacy, path)
+            after, _, after_p95 = await load_test(app, path)
+            print(f"{path:<38}{before:<16.0f}{after:<16.0f}"
+                  f"{f'{before_p95:.0f} / {after_p95:.0f}':<20}{after / before:.1f}x")
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+
+async def mixed_load(asgi_app, requests):
+    """requests 为 [(method, path), ...]，CONCURRENCY 个同时在途；返回 (吞吐, 读p95, 写p95, 失败数)"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    reads, writes = [], []
+    failures = 0
+    transport = httpx.ASGITransport(app=asgi_app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(method, path):
+            nonlocal failures
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await client.request(method, path)
+                (writes if method == "POST" else reads).append((time.perf_counter() - t0) * 1000)
+                failures += response.status_code != 200
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(method, path) for method, path in requests))
+        elapsed = time.perf_counter() - t0
+
+    def p95(values):
+        values.sort()
+        return values[int(len(values) * 0.95)] if values else 0.0
+
+    return len(requests) / elapsed, p95(reads), p95(writes), failures
+
+
+async def readwrite_round(make_engine, latency_ms: float):
+    """新建并填充一个数据库文件，用 make_engine(url) 创建的异步引擎跑一轮读写混合负载"""
+    writes = READWRITE_REQUESTS // 3
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    seed_engine = create_engine(url)
+    Base.metadata.create_all(bind=seed_engine)
+    seed_database(sessionmaker(bind=seed_engine), pending_tasks=writes)
+    db = sessionmaker(bind=seed_engine)()
+    pending_ids = [task_id for (task_id,) in
+                   db.query(NavigationTask.id).filter(NavigationTask.status == "pending").all()]
+    db.close()
+    seed_engine.dispose()
+
+    async_engine = make_engine(url)
+    add_latency(async_engine, latency_ms, is_async=True)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    requests = []
+    for task_id in pending_ids:
+        requests.append(("POST", f"/api/v1/navigation/tasks/{task_id}/cancel"))
+        requests.append(("GET", "/api/v1/navigation/tasks/user/1"))
+        requests.append(("GET", "/api/v1/robots"))
+
+    # 单独测一次提交的耗时：rollback journal + FULL 每次提交都要多次刷盘
+    commit_ms = []
+    async with AsyncSession() as db:
+        robot = await db.get(Robot, 1)
+        for level in range(COMMIT_SAMPLES):
+            robot.battery_level = level
+            t0 = time.perf_counter()
+            await db.commit()
+            commit_ms.append((time.perf_counter() - t0) * 1000)
+
+    app.dependency_overrides[get_async_db] = bench_async_db
+    try:
+        return (*await mixed_load(app, requests), statistics.median(commit_ms))
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+
+
+async def bench_readwrite(latency_ms: float):
+    print(f"\n=== 导航接口读写混合（并发 {CONCURRENCY}，共 {READWRITE_REQUESTS} 个，1/3 为取消任务写入，"
+          f"{READWRITE_ROUNDS}轮取中位数）===")
+    print(f"{'引擎配置':<34}{'吞吐(req/s)':<14}{'读p95(ms)':<12}{'写p95(ms)':<12}{'单次提交(ms)':<14}{'失败'}")
+    configs = [
+        ("默认（rollback journal，池5+10）",
+         lambda url: create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))),
+        (f"WAL + synchronous=NORMAL，池{DB_ASYNC_POOL_SIZE}+{DB_ASYNC_MAX_OVERFLOW}",
+         lambda url: create_async_db_engine(url, SQLITE_PRAGMAS)),
+    ]
+    results = {label: [] for label, _ in configs}
+    for _ in range(READWRITE_ROUNDS):
+        # 两种配置交替运行，减少机器负载波动的影响
+        for label, make_engine in configs:
+            results[label].append(await readwrite_round(make_engine, latency_ms))
+    for label, rounds in results.items():
+        throughput, read_p95, write_p95, commit_ms = (statistics.median(r[i] for r in rounds) for i in (0, 1, 2, 4))
+        failures = sum(r[3] for r in rounds)
+        print(f"{label:<34}{throughput:<14.0f}{read_p95:<12.0f}{write_p95:<12.0f}{commit_ms:<14.3f}{failures}")
+
+
+BENCHMARKS = {
+    "concurrency": bench_concurrency,
+    "readwrite": bench_readwrite,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help=f"要运行的基准（{', '.join(BENCHMARKS)}），默认全部")
+    parser.add_argument("--latency", type=float, default=2.0, help="每条SQL额外延迟（毫秒）")
+    args = parser.parse_args()
+    for name in args.names or list(BENCHMARKS):
+        asyncio.run(BENCHMARKS[name](args.latency))
@@ -0,0 +1,237 @@
+"""
+导航网格性能基准测试
+统计四个楼层JSON在不同网格大小下的栅格化耗时和同层网格搜索耗时；
+另外把墙体和科室绕原点旋转，得到任意（非轴对齐）多边形构成的、带障碍的楼层
+
+用法：
+    python bench_grid.py                # 运行全部基准
+    python bench_grid.py search         # 只运行指定基准
+"""
+
+import contextlib
+import io
+import math
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from app.algorithms.navigation_grid import (
+    FLOORS, load_floor_data, floor_json_path, create_navigation_grid
+)
+from app.algorithms.grid_pathfinder import GridPathFinder
+
+CELL_SIZES = [0.5, 0.25, 0.1]
+ROTATION_DEGREES = 15
+REPEAT = 5
+SEARCH_PAIRS = 30
+NETWORK_LOCATIONS = 36
+NETWORK_MAX_METERS = 25
+
+
+def rotate_polygon(polygon, degrees):
+    """绕原点旋转多边形"""
+    rad = math.radians(degrees)
+    cos_a, sin_a = math.cos(rad), math.sin(rad)
+    return [[x * cos_a - y * sin_a, x * sin_a + y * cos_a] for x, y in polygon]
+
+
+def rotated_inputs(data, degrees):
+    """把墙体和科室都转成旋转后的任意多边形（科室用 polygon 字段表示）"""
+    holes = [rotate_polygon(hole, degrees) for hole in data["walkable_area"]["holes"]]
+    obstacles = []
+    for obs in data.get("obstacles", []):
+        bounds = obs.get("bounds", {})
+        if not bounds:
+            continue
+        rect = [[bounds["x_min"], bounds["z_min"]], [bounds["x_max"], bounds["z_min"]],
+                [bounds["x_max"], bounds["z_max"]], [bounds["x_min"], bounds["z_max"]]]
+        holes.append(rotate_polygon(rect, degrees))
+    return data["walkable_area"]["boundary"], holes, obstacles
+
+
+def time_rasterise(boundary, holes, obstacles, cell_size):
+    """返回 (中位耗时ms, 网格)"""
+    timings = []
+    grid = None
+    for _ in range(REPEAT):
+        # 屏蔽 create_navigation_grid 内部的打印
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            grid, _, _ = create_navigation_grid(boundary, holes, obstacles, cell_size)
+            timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings), grid
+
+
+def bench_rasterise():
+    print("\n=== 楼层网格栅格化耗时（中位数）===")
+    print(f"{'楼层':<6}{'网格(米)':<10}{'尺寸':<12}{'轴对齐(ms)':<14}{'旋转多边形(ms)':<16}{'可走比例'}")
+    for floor in FLOORS:
+        data = load_floor_data(floor_json_path(floor))
+        original = (data["walkable_area"]["boundary"], data["walkable_area"]["holes"],
+                    data.get("obstacles", []))
+        rotated = rotated_inputs(data, ROTATION_DEGREES)
+        for cell_size in CELL_SIZES:
+            t_rect, grid = time_rasterise(*original, cell_size)
+            t_poly, rotated_grid = time_rasterise(*rotated, cell_size)
+            shape = f"{grid.shape[1]}x{grid.shape[0]}"
+            print(f"{floor}F    {cell_size:<10g}{shape:<12}{t_rect:<14.2f}{t_poly:<16.2f}"
+                  f"{grid.mean():.1%} / {rotated_grid.mean():.1%}")
+
+
+def grid_finder(floor, cell_size, rotated=False):
+    """不经数据库，直接把栅格化结果装进 GridPathFinder"""
+    data = load_floor_data(floor_json_path(floor))
+    if rotated:
+        inputs = rotated_inputs(data, ROTATION_DEGREES)
+    else:
+        inputs = (data["walkable_area"]["boundary"], data["walkable_area"]["holes"],
+                  data.get("obstacles", []))
+    with contextlib.redirect_stdout(io.StringIO()):
+        grid, x_min, y_min = create_navigation_grid(*inputs, cell_size)
+    finder = GridPathFinder(None, cell_size)
+    finder.grids[floor] = grid
+    finder.origins[floor] = (x_min, y_min, cell_size)
+    return finder
+
+
+def sample_cells(grid, count, seed=42):
+    """随机抽取可走格子对 (gx, gy)"""
+    rng = random.Random(seed)
+    ys, xs = np.nonzero(grid)
+    cells = list(zip(xs.tolist(), ys.tolist()))
+    return [(rng.choice(cells), rng.choice(cells)) for _ in range(count)]
+
+
+def run_searches(finder, floor, pairs, search):
+    """返回 (平均耗时ms, 平均扩展格子数, 可达数)"""
+    latencies = []
+    expansions = []
+    found = 0
+    for start, end in pairs:
+        t0 = time.perf_counter()
+        cells = search(floor, start, end)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        expansions.append(finder.expanded)
+        found += cells is not None
+    return statistics.mean(latencies), statistics.mean(expansions), found
+
+
+def bench_search():
+    print("\n=== 同层网格A*（随机可走格子对，旋转多边形楼层）===")
+    print(f"{'楼层':<6}{'网格(米)':<10}{'尺寸':<12}{'耗时(ms)':<12}{'扩展格子':<12}{'可达'}")
+    for floor in FLOORS:
+        for cell_size in CELL_SIZES:
+            finder = grid_finder(floor, cell_size, rotated=True)
+            grid = finder.grids[floor]
+            pairs = sample_cells(grid, SEARCH_PAIRS)
+            elapsed, expanded, found = run_searches(finder, floor, pairs, finder._astar)
+            shape = f"{grid.shape[1]}x{grid.shape[0]}"
+            print(f"{floor}F    {cell_size:<10g}{shape:<12}{elapsed:<12.2f}{expanded:<12.0f}"
+                  f"{found}/{len(pairs)}")
+
+
+def bench_jps():
+    """A* 与跳点搜索对比：扩展节点数（出堆次数）和耗时"""
+    for rotated, title in [(False, "原始楼层"), (True, "旋转多边形楼层")]:
+        print(f"\n=== A* vs JPS（{title}）===")
+        print(f"{'楼层':<6}{'网格(米)':<10}{'A*(ms)':<10}{'JPS(ms)':<10}{'A*扩展':<10}{'JPS扩展':<10}{'加速比'}")
+        for floor in FLOORS:
+            for cell_size in CELL_SIZES:
+                finder = grid_finder(floor, cell_size, rotated=rotated)
+                pairs = sample_cells(finder.grids[floor], SEARCH_PAIRS)
+                t_astar, e_astar, _ = run_searches(finder, floor, pairs, finder._astar)
+                t_jps, e_jps, _ = run_searches(finder, floor, pairs, finder._jps)
+                print(f"{floor}F    {cell_size:<10g}{t_astar:<10.2f}{t_jps:<10.2f}"
+                      f"{e_astar:<10.0f}{e_jps:<10.0f}{t_astar / t_jps:.1f}x")
+
+
+def bench_fields():
+    """到热门目的地：A* / JPS 与缓存距离场下降的对比（旋转多边形楼层，每层4个目的地）"""
+    from app.algorithms.distance_fields import distance_fields, get_destination_field, field_stats
+    from app.algorithms.grid_search import descend_field
+
+    print("\n=== 热门目的地：A* / JPS vs 距离场下降 ===")
+    print(f"{'楼层':<6}{'网格(米)':<10}{'A*(ms)':<10}{'JPS(ms)':<10}{'下降(ms)':<10}{'建场(ms)':<10}{'场大小'}")
+    distance_fields.clear()
+    for floor in FLOORS:
+        for cell_size in CELL_SIZES:
+            finder = grid_finder(floor, cell_size, rotated=True)
+            padded = finder._padded_grid(floor)
+            pairs = sample_cells(finder.grids[floor], SEARCH_PAIRS)
+            destinations = [end for _, end in pairs[:4]]
+            queries = [(start, destinations[i % 4]) for i, (start, _) in enumerate(pairs)]
+
+            build_times = []
+            for end in destinations:
+                t0 = time.perf_counter()
+                get_destination_field(padded, floor, cell_size, padded.index(end))
+                build_times.append((time.perf_counter() - t0) * 1000)
+
+            def descend(floor, start, end):
+                field = get_destination_field(padded, floor, cell_size, padded.index(end))
+                return descend_field(padded, field, padded.index(start))
+
+            t_astar, _, _ = run_searches(finder, floor, queries, finder._astar)
+            t_jps, _, _ = run_searches(finder, floor, queries, finder._jps)
+            t_field, _, _ = run_searches(finder, floor, queries, descend)
+            field_kb = get_destination_field(padded, floor, cell_size, padded.index(destinations[0])).nbytes / 1024
+            print(f"{floor}F    {cell_size:<10g}{t_astar:<10.2f}{t_jps:<10.2f}{t_field:<10.3f}"
+                  f"{statistics.mean(build_times):<10.1f}{field_kb:.0f}KB")
+    stats = field_stats()
+    print(f"缓存：{stats['size']}个距离场，{stats['bytes'] / 1024 / 1024:.2f}MB，命中率 {stats['hit_rate']:.1%}")
+
+
+def bench_network():
+    """建路网：每个地点一次堆Dijkstra距离场 vs pairwise_distances（双队列）求两两距离"""
+    from app.algorithms.grid_search import distance_field, pairwise_distances
+
+    print(f"\n=== 建路网：{NETWORK_LOCATIONS}个地点两两网格距离（25米内）===")
+    print(f"{'楼层':<6}{'网格(米)':<10}{'尺寸':<12}{'距离场(ms)':<12}{'两两距离(ms)':<14}{'加速比':<8}{'结果一致'}")
+    for floor in FLOORS:
+        for cell_size in CELL_SIZES:
+            finder = grid_finder(floor, cell_size)
+            grid = finder.grids[floor]
+            padded = finder._padded_grid(floor)
+            cells = [padded.index(cell) for cell, _ in sample_cells(grid, NETWORK_LOCATIONS)]
+            max_offset = round(NETWORK_MAX_METERS / cell_size)
+            coords = [divmod(cell, padded.width) for cell in cells]
+
+            t0 = time.perf_counter()
+            expected = np.full((len(cells), len(cells)), np.inf)
+            for i, source in enumerate(cells):
+                near = [j for j in range(i + 1, len(cells))
+                        if abs(coords[i][0] - coords[j][0]) <= max_offset
+                        and abs(coords[i][1] - coords[j][1]) <= max_offset]
+                if near:
+                    field = distance_field(padded, source, [cells[j] for j in near])
+                    for j in near:
+                        expected[i, j] = field[cells[j]]
+            t_field = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            distances = pairwise_distances(padded, cells, max_offset)
+            t_pairwise = (time.perf_counter() - t0) * 1000
+
+            upper = np.triu_indices(len(cells), 1)
+            same = np.allclose(expected[upper], distances[upper].astype(np.float32), equal_nan=True)
+            shape = f"{grid.shape[1]}x{grid.shape[0]}"
+            print(f"{floor}F    {cell_size:<10g}{shape:<12}{t_field:<12.1f}{t_pairwise:<14.1f}"
+                  f"{t_field / t_pairwise:<8.1f}{'✅' if same else '❌'}")
+
+
+BENCHMARKS = {
+    "rasterise": bench_rasterise,
+    "search": bench_search,
+    "jps": bench_jps,
+    "fields": bench_fields,
+    "network": bench_network,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
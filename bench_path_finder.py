@@ -0,0 +1,433 @@
+"""
+PathFinder 性能基准测试
+在内存SQLite中生成合成医院地图，统计每次路径规划的SQL查询数和耗时
+
+用法：
+    python bench_path_finder.py            # 运行全部基准
+    python bench_path_finder.py queries    # 只运行指定基准
+"""
+
+import sys
+import time
+import random
+import statistics
+import tracemalloc
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Location, Path
+from app.core.graph import graph_registry, build_graph_from_db
+from app.algorithms.path_finder import PathFinder
+
+
+def create_session():
+    """创建独立的内存数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)()
+
+
+def build_synthetic_hospital(db, floors=4, rows=10, cols=10, spacing=3.0, buildings=1, seed=7):
+    """
+    生成合成医院地图：每栋楼每层一个 rows x cols 的走廊网格，
+    四角设楼梯、中心设电梯，相邻楼层的楼梯/电梯互相连通，
+    多栋楼之间在1楼通过连廊相连
+    """
+    rng = random.Random(seed)
+    location_rows = []
+    grid_ids = {}
+    next_id = 1
+    for b in range(buildings):
+        x_offset = b * (cols + 2) * spacing
+        for floor in range(1, floors + 1):
+            for r in range(rows):
+                for c in range(cols):
+                    if (r, c) in [(0, 0), (0, cols - 1), (rows - 1, 0), (rows - 1, cols - 1)]:
+                        loc_type = "stairs"
+                    elif (r, c) == (rows // 2, cols // 2):
+                        loc_type = "elevator"
+                    elif (r * cols + c) % 7 == 3:
+                        loc_type = "department"
+                    else:
+                        loc_type = "path_node"
+                    location_rows.append({
+                        "id": next_id,
+                        "name": f"B{b}_{floor}F_{r}_{c}",
+                        "type": loc_type,
+                        "x": x_offset + c * spacing,
+                        "y": r * spacing,
+                        "z": floor - 1,
+                        "floor": floor,
+                        "is_accessible": True
+                    })
+                    grid_ids[(b, floor, r, c)] = (next_id, loc_type)
+                    next_id += 1
+
+    path_rows = []
+
+    def connect(id1, id2, distance, path_type):
+        attributes = {
+            "wheelchair_accessible": True,
+            "slope": 0.0,
+            "crowdedness": round(rng.random(), 2),
+            "average_wait_time": 30 if path_type == "elevator" else 0,
+            "is_bidirectional": True
+        }
+        path_rows.append({"start_id": id1, "end_id": id2, "distance": distance,
+                          "type": path_type, "attributes": attributes})
+        path_rows.append({"start_id": id2, "end_id": id1, "distance": distance,
+                          "type": path_type, "attributes": dict(attributes)})
+
+    for (b, floor, r, c), (loc_id, loc_type) in grid_ids.items():
+        if c + 1 < cols:
+            connect(loc_id, grid_ids[(b, floor, r, c + 1)][0], spacing, "corridor")
+        if r + 1 < rows:
+            connect(loc_id, grid_ids[(b, floor, r + 1, c)][0], spacing, "corridor")
+        if loc_type in ("stairs", "elevator") and floor < floors:
+            connect(loc_id, grid_ids[(b, floor + 1, r, c)][0],
+                    4.0 if loc_type == "stairs" else 3.0, loc_type)
+    for b in range(buildings - 1):
+        connect(grid_ids[(b, 1, rows // 2, cols - 1)][0],
+                grid_ids[(b + 1, 1, rows // 2, 0)][0], 3 * spacing, "corridor")
+
+    db.bulk_insert_mappings(Location, location_rows)
+    db.bulk_insert_mappings(Path, path_rows)
+    db.commit()
+    return len(location_rows), len(path_rows)
+
+
+def sample_queries(db, count=50, seed=42):
+    """随机抽取起终点对"""
+    rng = random.Random(seed)
+    ids = [row[0] for row in db.query(Location.id).all()]
+    return [(rng.choice(ids), rng.choice(ids)) for _ in range(count)]
+
+
+class QueryCounter:
+    """统计引擎上执行的SQL语句数"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def bench_queries():
+    """每次路径规划的SQL查询数（图预热后）"""
+    print("\n=== 每次规划的SQL查询数 ===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    finder = PathFinder(db)
+    finder.initialize_graph()
+
+    counter = QueryCounter(engine)
+    queries = sample_queries(db)
+    per_plan = []
+    latencies = []
+    for start_id, end_id in queries:
+        before = counter.count
+        t0 = time.perf_counter()
+        result = finder.find_path(start_id, end_id, "normal", ["avoid_crowds"])
+        finder.get_path_details(result.path_ids)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        per_plan.append(counter.count - before)
+
+    print(f"查询数/次：平均 {statistics.mean(per_plan):.1f}，最大 {max(per_plan)}")
+    print(f"耗时/次：平均 {statistics.mean(latencies):.2f}ms，"
+          f"中位数 {statistics.median(latencies):.2f}ms")
+    db.close()
+
+
+def bench_search():
+    """10k节点合成医院上的A*搜索耗时与峰值内存"""
+    print("\n=== 10k节点图上的A*搜索 ===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=50, cols=50)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    finder = PathFinder(db)
+    finder.initialize_graph()
+    finder.get_cost_table("normal", [])  # 代价表预编译不计入单次搜索
+
+    queries = sample_queries(db, count=20)
+    latencies = []
+    peaks = []
+    for start_id, end_id in queries:
+        tracemalloc.start()
+        finder.find_path(start_id, end_id, "normal")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # 耗时单独再测一次，避免 tracemalloc 的开销
+        t0 = time.perf_counter()
+        finder.find_path(start_id, end_id, "normal")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        peaks.append(peak / 1024)
+
+    print(f"耗时/次：平均 {statistics.mean(latencies):.1f}ms，最大 {max(latencies):.1f}ms")
+    print(f"峰值内存/次：平均 {statistics.mean(peaks):.0f}KB，最大 {max(peaks):.0f}KB")
+    db.close()
+
+
+def bench_csr():
+    """多栋楼合成图上字典邻接表与CSR表示的内存和速度对比"""
+    print("\n=== 字典邻接表 vs CSR（3栋楼 x 4层 x 30x30）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=30, cols=30, buildings=3)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    tracemalloc.start()
+    graph = build_graph_from_db(db)
+    db.expunge_all()
+    dict_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    graph.freeze()
+
+    tracemalloc.start()
+    csr = graph.to_csr()
+    csr_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"内存：字典图(含边属性) {dict_current / 1024 / 1024:.1f}MB，"
+          f"CSR数组 {csr.nbytes() / 1024 / 1024:.2f}MB（含索引映射 {csr_current / 1024 / 1024:.2f}MB）")
+
+    queries = sample_queries(db, count=30)
+    for name, search in [("dict", graph.dijkstra), ("csr", csr.dijkstra)]:
+        t0 = time.perf_counter()
+        for start_id, end_id in queries:
+            search(start_id, end_id)
+        elapsed = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"dijkstra[{name}]：{elapsed:.1f}ms/次")
+
+    graph_registry.invalidate()
+    for use_csr in (False, True):
+        # 合成地图在路径表规模内，关闭路径表才能比较两种图表示上的搜索
+        finder = PathFinder(db, use_csr=use_csr, use_route_table=False)
+        finder.initialize_graph()
+        finder.get_cost_table("normal", [])
+        if use_csr:
+            finder.graph.to_csr()
+        t0 = time.perf_counter()
+        for start_id, end_id in queries:
+            finder.find_path(start_id, end_id, "normal")
+        elapsed = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"PathFinder[{'csr' if use_csr else 'dict'}]：{elapsed:.1f}ms/次")
+    db.close()
+
+
+def bench_route_table():
+    """全源路径表：预计算耗时、持久化加载耗时、查询耗时与A*对比"""
+    import tempfile
+    from app.algorithms.route_table import build_route_table, precompute_route_tables
+
+    print("\n=== 全源路径表 vs A*（4层 x 10x10）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    astar = PathFinder(db, use_route_table=False)
+    astar.initialize_graph()
+    graph = astar.graph
+
+    t0 = time.perf_counter()
+    build_route_table(graph, "normal", ["avoid_crowds"])
+    print(f"单个画像 Floyd–Warshall：{(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        t0 = time.perf_counter()
+        precompute_route_tables(graph, directory=directory)
+        print(f"首次启动（计算并落盘）：{(time.perf_counter() - t0) * 1000:.0f}ms")
+        t0 = time.perf_counter()
+        precompute_route_tables(graph, directory=directory)
+        print(f"再次启动（从磁盘加载）：{(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    table_finder = PathFinder(db)
+    queries = sample_queries(db, count=200)
+    profile = ("normal", ["avoid_crowds", "use_elevator"])
+    table_finder.find_path(queries[0][0], queries[0][1], *profile)
+    for name, finder in [("A*", astar), ("路径表", table_finder)]:
+        t0 = time.perf_counter()
+        for start_id, end_id in queries:
+            finder.find_path(start_id, end_id, *profile)
+        elapsed = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"{name}：{elapsed:.3f}ms/次")
+    db.close()
+
+
+def bench_order():
+    """多目的地访问顺序：批量代价矩阵 vs 两两A*，以及优化前后的路线总代价"""
+    from app.algorithms.route_optimizer import cost_matrix, solve_order, _tour_cost
+
+    print("\n=== 多目的地访问顺序优化（10k节点图）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=50, cols=50)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    finder = PathFinder(db)
+    finder.initialize_graph()
+    finder.get_cost_table("normal", [])
+    ids = [row[0] for row in db.query(Location.id).all()]
+    rng = random.Random(42)
+
+    print(f"{'地点数':<8}{'两两A*(ms)':<14}{'批量矩阵(ms)':<14}{'求解(ms)':<10}{'原顺序代价':<12}{'优化后代价'}")
+    for n_stops in (4, 8, 10, 15, 20):
+        stops = rng.sample(ids, n_stops)
+        t0 = time.perf_counter()
+        for a in stops:
+            for b in stops:
+                if a != b:
+                    finder.find_path(a, b, "normal")
+        t_pairwise = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        matrix = cost_matrix(finder, stops, "normal", [])
+        t_matrix = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        order, total = solve_order(matrix)
+        t_solve = (time.perf_counter() - t0) * 1000
+        given = _tour_cost(matrix, list(range(n_stops)))
+        print(f"{n_stops:<8}{t_pairwise:<14.0f}{t_matrix:<14.0f}{t_solve:<10.1f}{given:<12.0f}{total:.0f}")
+    db.close()
+
+
+def bench_bidirectional():
+    """跨楼层长路径（1F -> 4F，跨楼栋）：单向A*与双向A*的扩展节点数、耗时和路径代价"""
+    print("\n=== 单向A* vs 双向A*（3栋楼 x 4层 x 30x30，1F -> 4F）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=30, cols=30, buildings=3)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    finder = PathFinder(db, use_route_table=False)
+    finder.initialize_graph()
+    graph = finder.graph
+    graph.reverse_adjacency()
+
+    rng = random.Random(5)
+    first = [row[0] for row in db.query(Location.id).filter(Location.floor == 1).all()]
+    top = [row[0] for row in db.query(Location.id).filter(Location.floor == 4).all()]
+    queries = [(rng.choice(first), rng.choice(top)) for _ in range(40)]
+
+    print(f"{'用户画像':<28}{'单向(ms)':<10}{'双向(ms)':<10}{'单向扩展':<10}{'双向扩展':<10}{'代价比(单向/双向，相对最优)'}")
+    for user_type, preferences in [("normal", []), ("wheelchair", ["avoid_crowds"]),
+                                   ("emergency", []), ("elderly", ["avoid_stairs"])]:
+        costs = finder.get_cost_table(user_type, preferences)
+        optimal = sum(graph.dijkstra_many(s, [t], costs)[t][1] for s, t in queries)
+        row = []
+        for bidirectional in (False, True):
+            expanded = []
+            total = 0.0
+            t0 = time.perf_counter()
+            for start_id, end_id in queries:
+                total += finder.find_path(start_id, end_id, user_type, preferences,
+                                          bidirectional=bidirectional).total_cost
+                expanded.append(finder.expanded)
+            elapsed = (time.perf_counter() - t0) * 1000 / len(queries)
+            row.append((elapsed, statistics.mean(expanded), total / optimal))
+        (t_uni, e_uni, r_uni), (t_bi, e_bi, r_bi) = row
+        profile = "+".join([user_type, *preferences])
+        print(f"{profile:<28}{t_uni:<10.1f}{t_bi:<10.1f}{e_uni:<10.0f}{e_bi:<10.0f}{r_uni:.4f} / {r_bi:.4f}")
+    db.close()
+
+
+def bench_landmarks():
+    """ALT地标启发式：预处理耗时/内存，以及与直线距离启发式相比扩展节点数的减少"""
+    from app.algorithms.landmarks import get_landmark_table
+
+    print("\n=== 直线距离启发式 vs ALT地标（3栋楼 x 4层 x 30x30，随机起终点）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=30, cols=30, buildings=3)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    queries = sample_queries(db, count=60, seed=5)
+    variants = [
+        ("A*", PathFinder(db, use_route_table=False), False),
+        ("A*+ALT", PathFinder(db, use_route_table=False, use_landmarks=True), False),
+        ("双向A*", PathFinder(db, use_route_table=False), True),
+        ("双向A*+ALT", PathFinder(db, use_route_table=False, use_landmarks=True), True),
+    ]
+    for user_type, preferences in [("normal", []), ("wheelchair", ["avoid_crowds"]), ("emergency", [])]:
+        finder = variants[0][1]
+        finder.initialize_graph()
+        costs = finder.get_cost_table(user_type, preferences)
+        t0 = time.perf_counter()
+        table = get_landmark_table(finder.graph, user_type, preferences, costs)
+        print(f"\n[{'+'.join([user_type, *preferences])}] 预处理 {len(table.landmark_ids)}个地标："
+              f"{(time.perf_counter() - t0) * 1000:.0f}ms，{table.nbytes() / 1024 / 1024:.1f}MB")
+
+        baseline = None
+        for name, variant, bidirectional in variants:
+            expanded = []
+            t0 = time.perf_counter()
+            for start_id, end_id in queries:
+                variant.find_path(start_id, end_id, user_type, preferences, bidirectional=bidirectional)
+                expanded.append(variant.expanded)
+            elapsed = (time.perf_counter() - t0) * 1000 / len(queries)
+            mean_expanded = statistics.mean(expanded)
+            baseline = baseline or mean_expanded
+            print(f"  {name:<12}{elapsed:6.2f}ms/次  扩展 {mean_expanded:6.0f}（{mean_expanded / baseline:.0%}）")
+    db.close()
+
+
+def bench_ch():
+    """收缩层次：节点排序/收缩、每个画像定制的耗时，以及与A*、双向A*+ALT的查询耗时对比"""
+    from app.algorithms.contraction import ContractionHierarchy
+
+    print("\n=== 收缩层次 vs A*（3栋楼 x 4层 x 30x30，随机起终点）===")
+    engine, db = create_session()
+    n_locations, n_paths = build_synthetic_hospital(db, floors=4, rows=30, cols=30, buildings=3)
+    print(f"合成地图：{n_locations}个位置，{n_paths}条路径")
+
+    graph_registry.invalidate()
+    astar = PathFinder(db, use_route_table=False)
+    astar.initialize_graph()
+    t0 = time.perf_counter()
+    ch = ContractionHierarchy(astar.graph)
+    print(f"排序与收缩：{(time.perf_counter() - t0) * 1000:.0f}ms，{len(ch)}条上行弧")
+
+    queries = sample_queries(db, count=200, seed=5)
+    alt = PathFinder(db, use_route_table=False, use_landmarks=True)
+    ch_finder = PathFinder(db, use_route_table=False, use_ch=True)
+    for user_type, preferences in [("normal", []), ("wheelchair", ["avoid_crowds"]), ("elderly", ["avoid_stairs"])]:
+        costs = astar.get_cost_table(user_type, preferences)
+        t0 = time.perf_counter()
+        ch.customise(costs)
+        t_custom = (time.perf_counter() - t0) * 1000
+        alt.find_path(*queries[0], user_type, preferences)
+        ch_finder.find_path(*queries[0], user_type, preferences)
+
+        row = []
+        for finder, bidirectional in [(astar, False), (alt, True), (ch_finder, False)]:
+            t0 = time.perf_counter()
+            for start_id, end_id in queries:
+                finder.find_path(start_id, end_id, user_type, preferences, bidirectional=bidirectional)
+            row.append((time.perf_counter() - t0) * 1000 / len(queries))
+        print(f"[{'+'.join([user_type, *preferences])}] 定制 {t_custom:.0f}ms；"
+              f"A* {row[0]:.2f}ms/次，双向A*+ALT {row[1]:.2f}ms/次，CH {row[2]:.2f}ms/次")
+    db.close()
+
+
+BENCHMARKS = {
+    "queries": bench_queries,
+    "search": bench_search,
+    "csr": bench_csr,
+    "route_table": bench_route_table,
+    "order": bench_order,
+    "bidirectional": bench_bidirectional,
+    "landmarks": bench_landmarks,
+    "ch": bench_ch,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
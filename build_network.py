@@ -0,0 +1,121 @@
+"""
+统一的路网构建入口
+各楼层的计算（读JSON、建网格/匹配道路点、求边）互不依赖，分发到进程池并行执行，子进程只返回边列表；
+主进程是唯一的写入方：删除所选楼层的旧路径（含连到这些楼层的垂直连接），按楼层顺序写入，
+最后补回垂直连接，整个重建在一个事务里提交；其他楼层的路径保持不变
+
+用法：
+    python build_network.py grid              # 网格最短路建路（build_navigation_grid）
+    python build_network.py nodes --jobs 2    # 预埋道路点建路（build_correct_paths）
+    python build_network.py grid --floors 1 2 # 只重建部分楼层，其他楼层的路径保留
+"""
+
+import argparse
+import importlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from app.database import SessionLocal
+from app.models import Location, Path
+from app.algorithms.navigation_grid import FLOORS, floor_json_path
+from app.algorithms.path_network import (
+    location_records, load_edge_set, write_floor_paths, add_vertical_connections
+)
+
+# 建路方式 -> 提供 compute_floor_paths(floor, json_file, locations) 的模块
+BUILDERS = {
+    "grid": "build_navigation_grid",
+    "nodes": "build_correct_paths",
+}
+
+
+def _compute(builder, floor, json_file, locations):
+    """子进程中计算一层，输出先缓存起来，由主进程按楼层顺序打印"""
+    start = time.perf_counter()
+    log = io.StringIO()
+    with redirect_stdout(log):
+        module = importlib.import_module(BUILDERS[builder])
+        new_nodes, edges = module.compute_floor_paths(floor, json_file, locations)
+    return floor, new_nodes, edges, log.getvalue(), time.perf_counter() - start
+
+
+def compute_floors(builder, floors, records, jobs):
+    """计算各楼层，按楼层顺序返回结果；jobs 为 1 时在当前进程中依次计算"""
+    tasks = [(builder, floor, floor_json_path(floor), records.get(floor, [])) for floor in floors]
+    if jobs == 1:
+        return [_compute(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_compute, *zip(*tasks)))
+
+
+def delete_floor_paths(db, floors) -> int:
+    """删除至少一端在所选楼层的路径（楼层内的路径和连到这些楼层的垂直连接），返回删除条数"""
+    floor_locations = db.query(Location.id).filter(Location.floor.in_(list(floors)))
+    return db.query(Path).filter(
+        Path.start_id.in_(floor_locations.scalar_subquery()) |
+        Path.end_id.in_(floor_locations.scalar_subquery())
+    ).delete(synchronize_session=False)
+
+
+def build(builder, floors=FLOORS, jobs=None):
+    """重建路网，返回数据库最终路径数"""
+    jobs = jobs or min(len(floors), os.cpu_count() or 1)
+    total_start = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        records = location_records(db, floors)
+
+        compute_start = time.perf_counter()
+        results = compute_floors(builder, floors, records, jobs)
+        compute_time = time.perf_counter() - compute_start
+
+        write_start = time.perf_counter()
+        deleted = delete_floor_paths(db, floors)
+        print(f"删除 {', '.join(f'{floor}楼' for floor in floors)} 的现有路径 {deleted} 条...")
+        existing = load_edge_set(db)
+
+        total_paths = 0
+        for floor, new_nodes, edges, log, seconds in results:
+            print(log, end="")
+            paths = write_floor_paths(db, new_nodes, edges, existing)
+            total_paths += paths
+            print(f"  ✅ 为 {floor}楼添加了 {paths} 条路径（计算 ⏱️ {seconds:.2f}s）")
+
+        total_paths += add_vertical_connections(db, existing, commit=False)
+        db.commit()
+        write_time = time.perf_counter() - write_start
+
+        print(f"\n🎉 总共添加了 {total_paths} 条路径")
+        print(f"⏱️ 计算 {compute_time:.2f}s（{jobs} 个进程），写入 {write_time:.2f}s，"
+              f"总计 {time.perf_counter() - total_start:.2f}s")
+
+        # 最终统计
+        final_count = db.query(Path).count()
+        print(f"数据库最终路径数: {final_count}")
+        return final_count
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重建医院路网")
+    parser.add_argument("builder", choices=sorted(BUILDERS), help="grid：网格最短路；nodes：预埋道路点")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="并行计算的进程数（默认取楼层数与CPU核数的较小值，1 为不使用进程池）")
+    parser.add_argument("--floors", type=int, nargs="+", default=FLOORS,
+                        help="要重建的楼层（其他楼层的路径保留）")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs 至少为 1")
+    build(args.builder, args.floors, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
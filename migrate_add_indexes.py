@@ -0,0 +1,79 @@
+"""
+数据库索引迁移
+为已有数据库补建复合索引（新建的数据库由 create_all 直接建好），然后用 EXPLAIN QUERY PLAN
+检查常用查询确实走了对应索引，有查询没走索引时以非零状态退出
+
+用法：
+    python migrate_add_indexes.py           # 建索引并检查查询计划
+    python migrate_add_indexes.py --check   # 只检查查询计划
+"""
+
+import sys
+
+from sqlalchemy import select, text
+
+from app.database import engine
+from app.models import Location, NavigationTask, Path, Robot
+
+INDEXED_MODELS = [Path, Location, NavigationTask, Robot]
+
+# (说明, 查询, 应使用的索引)：与路径图构建、建网格脚本、任务列表、小车分配中的查询形式一致
+PLAN_CHECKS = [
+    ("路径边查找（双向）",
+     select(Path).where(((Path.start_id == 1) & (Path.end_id == 2)) |
+                        ((Path.start_id == 2) & (Path.end_id == 1))),
+     "ix_paths_start_end"),
+    ("按楼层和类型筛选位置",
+     select(Location).where(Location.floor == 1, Location.type == "department"),
+     "ix_locations_floor_type"),
+    ("用户任务列表（按时间倒序）",
+     select(NavigationTask).where(NavigationTask.user_id == 1)
+     .order_by(NavigationTask.created_at.desc()).limit(10),
+     "ix_navigation_tasks_user_created"),
+    ("可用小车",
+     select(Robot).where(Robot.status == "idle", Robot.is_online == True, Robot.battery_level > 20),
+     "ix_robots_status_online_battery"),
+]
+
+
+def migrate():
+    """创建缺失的索引（已存在的跳过），并更新SQLite的统计信息"""
+    for model in INDEXED_MODELS:
+        for index in model.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+        print(f"✅ {model.__tablename__}：{', '.join(sorted(i.name for i in model.__table__.indexes))}")
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+
+def query_plan(conn, statement) -> str:
+    """SQLite 查询计划（每行一个步骤）"""
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    return "\n".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def check_plans() -> bool:
+    """逐条检查查询计划是否使用了预期索引"""
+    if engine.dialect.name != "sqlite":
+        print(f"⚠️ 查询计划检查只支持SQLite，当前为 {engine.dialect.name}，跳过")
+        return True
+
+    ok = True
+    with engine.connect() as conn:
+        for name, statement, index in PLAN_CHECKS:
+            plan = query_plan(conn, statement)
+            if index in plan:
+                print(f"✅ {name}：使用 {index}")
+            else:
+                ok = False
+                print(f"❌ {name}：未使用 {index}")
+                for line in plan.splitlines():
+                    print(f"     {line}")
+    return ok
+
+
+if __name__ == "__main__":
+    if "--check" not in sys.argv[1:]:
+        migrate()
+    sys.exit(0 if check_plans() else 1)
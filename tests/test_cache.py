@@ -0,0 +1,69 @@
+"""LRU缓存：get_or_create 的并发构建"""
+
+import threading
+import time
+
+from app.core.cache import LRUCache
+
+
+def test_factory_runs_outside_cache_lock():
+    cache = LRUCache(8)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_factory():
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    builder = threading.Thread(target=cache.get_or_create, args=("slow", slow_factory))
+    builder.start()
+    assert started.wait(5)
+    try:
+        # 另一个 key 的构建与读写不等待正在进行的慢构建
+        t0 = time.perf_counter()
+        assert cache.get_or_create("fast", lambda: "fast") == "fast"
+        assert cache.get("fast") == "fast"
+        assert time.perf_counter() - t0 < 1
+    finally:
+        release.set()
+        builder.join(5)
+    assert cache.get("slow") == "slow"
+
+
+def test_same_key_built_once():
+    cache = LRUCache(8)
+    calls = []
+    gate = threading.Event()
+
+    def factory():
+        calls.append(1)
+        gate.wait(5)
+        return len(calls)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("k", factory)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == [1] * 8
+    assert not cache._building
+
+
+def test_failed_factory_is_not_cached():
+    cache = LRUCache(8)
+
+    def broken():
+        raise RuntimeError("build failed")
+
+    try:
+        cache.get_or_create("k", broken)
+    except RuntimeError:
+        pass
+    assert "k" not in cache
+    assert cache.get_or_create("k", lambda: 42) == 42
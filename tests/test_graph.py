@@ -0,0 +1,28 @@
+"""共享图：一对多Dijkstra的正向与反向搜索"""
+
+from app.core.graph import HospitalGraph
+
+ONE_WAY = {"is_bidirectional": False}
+
+
+def one_way_graph():
+    """起点 1；2 可从 1 直达但只能绕 3 回到 1；4 与 1 双向相连"""
+    graph = HospitalGraph()
+    for location_id in (1, 2, 3, 4):
+        graph.add_location(location_id, {"x": 0, "y": 0, "floor": 1})
+    graph.add_path(1, 2, 1.0, "corridor", ONE_WAY)
+    graph.add_path(2, 3, 5.0, "corridor", ONE_WAY)
+    graph.add_path(3, 1, 5.0, "corridor", ONE_WAY)
+    graph.add_path(4, 1, 3.0, "corridor", {})
+    return graph
+
+
+def test_forward_search_measures_start_to_target():
+    found = one_way_graph().dijkstra_many(1, [2, 4], limit=1)
+    assert found == {2: ([1, 2], 1.0)}
+
+
+def test_reverse_search_measures_target_to_start():
+    graph = one_way_graph()
+    assert graph.dijkstra_many(1, [2, 4], limit=1, reverse=True) == {4: ([4, 1], 3.0)}
+    assert graph.dijkstra_many(1, [2], reverse=True) == {2: ([2, 3, 1], 10.0)}
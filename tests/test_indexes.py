@@ -0,0 +1,22 @@
+"""复合索引：常用查询的 EXPLAIN QUERY PLAN 必须使用对应索引"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.models import Base
+from migrate_add_indexes import PLAN_CHECKS, query_plan
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, statement, index", PLAN_CHECKS, ids=[check[0] for check in PLAN_CHECKS])
+def test_query_uses_index(engine, name, statement, index):
+    with engine.connect() as conn:
+        plan = query_plan(conn, statement)
+    assert index in plan, f"{name} 未使用 {index}：\n{plan}"
@@ -0,0 +1,131 @@
+"""楼层栅格化：细长斜墙不能被穿过"""
+
+import contextlib
+import io
+import math
+
+import pytest
+
+from app.algorithms.grid_pathfinder import GridPathFinder
+from app.algorithms.navigation_grid import create_navigation_grid
+
+CELL_SIZE = 0.5
+
+
+def rotated_wall(length, thickness, degrees):
+    """以原点为中心、旋转 degrees 度的细长矩形墙"""
+    rad = math.radians(degrees)
+    cos_a, sin_a = math.cos(rad), math.sin(rad)
+    rect = [[-length / 2, -thickness / 2], [length / 2, -thickness / 2],
+            [length / 2, thickness / 2], [-length / 2, thickness / 2]]
+    return [[x * cos_a - y * sin_a, x * sin_a + y * cos_a] for x, y in rect]
+
+
+def wall_finder(wall):
+    boundary = [[-5, -5], [5, -5], [5, 5], [-5, 5]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        grid, x_min, y_min = create_navigation_grid(boundary, [wall], [], CELL_SIZE)
+    finder = GridPathFinder(None, CELL_SIZE)
+    finder.grids[1] = grid
+    finder.origins[1] = (x_min, y_min, CELL_SIZE)
+    return finder, x_min, y_min
+
+
+def to_cell(x, y, x_min, y_min):
+    return int((x - x_min) / CELL_SIZE), int((y - y_min) / CELL_SIZE)
+
+
+@pytest.mark.parametrize("degrees", [15, 30, 45, 70])
+def test_thin_diagonal_wall_blocks_search(degrees):
+    # 0.1 米厚、贯穿整个楼层的斜墙，两侧的格子互不可达
+    finder, x_min, y_min = wall_finder(rotated_wall(30, 0.1, degrees))
+    rad = math.radians(degrees)
+    normal = (-math.sin(rad), math.cos(rad))
+    above = to_cell(2 * normal[0], 2 * normal[1], x_min, y_min)
+    below = to_cell(-2 * normal[0], -2 * normal[1], x_min, y_min)
+    grid = finder.grids[1]
+    assert grid[above[1], above[0]] and grid[below[1], below[0]]
+
+    assert finder._astar(1, above, below) is None
+    assert finder._jps(1, above, below) is None
+
+
+def test_short_thin_wall_cells_are_connected():
+    # 8 米长、0.1 米厚、旋转 15° 的墙：被标记的格子连成一串，不能从缝隙中穿过
+    finder, _, _ = wall_finder(rotated_wall(8, 0.1, 15))
+    blocked = {(int(x), int(y)) for y, x in zip(*(finder.grids[1] == 0).nonzero())}
+    assert len(blocked) >= 16
+
+    start = next(iter(blocked))
+    seen = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                cell = (x + dx, y + dy)
+                if cell in blocked and cell not in seen:
+                    seen.add(cell)
+                    stack.append(cell)
+    assert seen == blocked
+
+
+def test_explicit_algorithm_skips_distance_field(monkeypatch):
+    # 热门目的地：不指定算法时沿距离场下降，指定 jps/astar 时必须实际运行该搜索
+    import app.algorithms.grid_pathfinder as grid_pathfinder
+    from app.algorithms.grid_search import distance_field
+    from app.models import Location
+
+    finder, _, _ = wall_finder(rotated_wall(4, 0.1, 30))
+    used = []
+    monkeypatch.setattr(grid_pathfinder, "is_hot_destination", lambda loc: True)
+    monkeypatch.setattr(grid_pathfinder, "get_destination_field",
+                        lambda padded, floor, cell_size, target:
+                        used.append("field") or distance_field(padded, target))
+    for name in ("_astar", "_jps"):
+        search = getattr(finder, name)
+        monkeypatch.setattr(finder, name, lambda *args, _name=name, _search=search:
+                            used.append(_name.lstrip("_")) or _search(*args))
+
+    start = Location(id=1, name="起点", floor=1, x=-3.0, y=-3.0)
+    end = Location(id=2, name="终点", floor=1, x=3.0, y=3.0)
+    for algorithm, planner in ((None, "field"), ("jps", "jps"), ("astar", "astar")):
+        used.clear()
+        path = finder._find_path_same_floor(start, end, algorithm)
+        assert path and used == [planner]
+
+
+def test_concurrent_grid_writes_do_not_clash(tmp_path):
+    # 多个进程/线程同时写同一楼层的网格文件：各用各的临时文件，结果总是完整的数组
+    import os
+    import threading
+
+    import numpy as np
+
+    from app.algorithms.navigation_grid import _write_atomically
+
+    target = str(tmp_path / "m1F_grid_0.5.npy")
+    grids = [np.full((200, 300), i, dtype=np.uint8) for i in range(8)]
+    errors = []
+
+    def write(grid):
+        try:
+            for _ in range(5):
+                _write_atomically(target, lambda f: np.save(f, grid))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(grid,)) for grid in grids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    result = np.load(target)
+    assert result.shape == (200, 300) and len(np.unique(result)) == 1
+    assert os.listdir(tmp_path) == ["m1F_grid_0.5.npy"]
+
+    with pytest.raises(RuntimeError):
+        _write_atomically(target, lambda f: (_ for _ in ()).throw(RuntimeError("写入失败")))
+    assert os.listdir(tmp_path) == ["m1F_grid_0.5.npy"]
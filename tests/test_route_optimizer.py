@@ -0,0 +1,47 @@
+"""多目的地访问顺序优化：不可达检查点"""
+
+import numpy as np
+import pytest
+
+from app.algorithms.route_optimizer import EXACT_ORDER_MAX_STOPS, solve_order
+
+INF = np.inf
+
+
+def test_unreachable_stop_is_named():
+    matrix = np.array([[0, 1, 1, INF],
+                       [1, 0, 1, INF],
+                       [1, 1, 0, INF],
+                       [1, 1, 1, 0.]])
+    for fix_last in (False, True):
+        with pytest.raises(ValueError, match="检查点 303"):
+            solve_order(matrix, fix_last, labels=[300, 301, 302, 303])
+
+
+def test_no_feasible_order_exact():
+    # 每个点都能从某个点到达，但 1、2 互不可达，走不完全部检查点
+    matrix = np.full((4, 4), INF)
+    np.fill_diagonal(matrix, 0)
+    matrix[0, 1] = matrix[0, 2] = matrix[1, 3] = matrix[2, 3] = 1
+    with pytest.raises(ValueError):
+        solve_order(matrix)
+
+
+def test_unreachable_stop_heuristic():
+    n = EXACT_ORDER_MAX_STOPS + 2
+    matrix = np.ones((n, n))
+    np.fill_diagonal(matrix, 0)
+    matrix[:, n - 2] = INF
+    matrix[n - 2, n - 2] = 0
+    with pytest.raises(ValueError, match=f"检查点 {n - 2}"):
+        solve_order(matrix)
+
+
+def test_reachable_stops_still_solved():
+    matrix = np.array([[0, 1, 5, 9],
+                       [1, 0, 1, 5],
+                       [5, 1, 0, 1],
+                       [9, 5, 1, 0.]])
+    order, total = solve_order(matrix)
+    assert order == [0, 1, 2, 3]
+    assert total == 3